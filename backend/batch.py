@@ -0,0 +1,179 @@
+import asyncio
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+
+from .concurrency import run_blocking
+from .pipeline import analyze_image
+from .telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# =========================
+# CONFIG
+# =========================
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "1000"))
+BATCH_MAX_IMAGE_BYTES = int(os.getenv("BATCH_MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif", ".heic")
+
+# =========================
+# INPUT
+# =========================
+
+def is_archive(filename: str) -> bool:
+    name = (filename or "").lower()
+    return name.endswith((".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz"))
+
+class ImageTooLarge(ValueError):
+    """
+    Stands in for the bytes of an image over BATCH_MAX_IMAGE_BYTES, which is
+    never read.
+    """
+
+def _too_large(size: int) -> ImageTooLarge:
+    return ImageTooLarge(f"Image is {size} bytes, over the {BATCH_MAX_IMAGE_BYTES} byte limit")
+
+def iter_archive(filename: str, fileobj):
+    """
+    Yields (member_name, image_bytes) for every image inside a zip or tar archive.
+    Members are read one at a time so the whole archive is never held in memory;
+    oversized members are checked from the archive header and not extracted.
+    """
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(fileobj) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    if info.file_size > BATCH_MAX_IMAGE_BYTES:
+                        yield info.filename, _too_large(info.file_size)
+                    else:
+                        yield info.filename, zf.read(info)
+    else:
+        with tarfile.open(fileobj=fileobj, mode="r|*") as tf:
+            for member in tf:
+                if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                    if member.size > BATCH_MAX_IMAGE_BYTES:
+                        yield member.name, _too_large(member.size)
+                    else:
+                        yield member.name, tf.extractfile(member).read()
+
+# =========================
+# EXECUTION
+# =========================
+
+async def _run_one(index, name, data, profile):
+    try:
+        result = await analyze_image(data, profile)
+        return {"index": index, "filename": name, "result": result}
+    except Exception as e:
+        logger.error("Batch item failed: %s", e, extra={"index": index, "upload": name})
+        return {"index": index, "filename": name, "error": str(e)}
+
+async def _next_upload(images):
+    # Reading uploads and extracting archives is blocking file I/O
+    return await run_blocking(next, images, None)
+
+async def run_batch(images, profile: str = "General", concurrency: int = BATCH_CONCURRENCY):
+    """
+    images: iterator of (filename, image_bytes), read on the blocking pool.
+    Yields one NDJSON line per image as soon as it finishes, then a summary line.
+    At most `concurrency` images are in flight (and held in memory) at once.
+    A failing image is reported in its own line and never aborts the batch.
+    If the client goes away, images still in flight are cancelled.
+    """
+    concurrency = max(1, concurrency)
+    pending = set()
+    total = failed = 0
+
+    async def drain():
+        nonlocal pending, failed
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        lines = []
+        for task in done:
+            item = task.result()
+            if "error" in item:
+                failed += 1
+            lines.append(json.dumps(item) + "\n")
+        return lines
+
+    images = iter(images)
+    index = 0
+    try:
+        while (upload := await _next_upload(images)) is not None:
+            name, data = upload
+            error = None
+            if index >= BATCH_MAX_IMAGES:
+                error = f"Batch limit of {BATCH_MAX_IMAGES} images exceeded"
+            elif isinstance(data, ImageTooLarge):
+                error = str(data)
+
+            if error:
+                failed += 1
+                total += 1
+                yield json.dumps({"index": index, "filename": name, "error": error}) + "\n"
+                index += 1
+                continue
+
+            if len(pending) >= concurrency:
+                for line in await drain():
+                    yield line
+
+            pending.add(asyncio.create_task(_run_one(index, name, data, profile)))
+            total += 1
+            index += 1
+
+        while pending:
+            for line in await drain():
+                yield line
+
+        yield json.dumps({"summary": {"total": total, "succeeded": total - failed, "failed": failed}}) + "\n"
+    finally:
+        for task in pending:
+            task.cancel()
+        if hasattr(images, "close"):
+            await run_blocking(images.close)
+
+def detach_upload(fileobj):
+    """
+    Copies an upload into a temp file we own. The framework may close request
+    files as soon as the handler returns, before a streamed response is consumed.
+    """
+    copy = tempfile.TemporaryFile()
+    fileobj.seek(0)
+    shutil.copyfileobj(fileobj, copy)
+    copy.seek(0)
+    return copy
+
+def collect_uploads(files):
+    """
+    files: list of (filename, fileobj). Archives are expanded, plain images passed through.
+    Yields (filename, image_bytes); an unreadable archive yields an empty payload so it
+    is reported as a per-image error instead of failing the request, and an image over
+    BATCH_MAX_IMAGE_BYTES yields ImageTooLarge without being read.
+    Each fileobj is closed once it has been consumed (or the generator is closed).
+    """
+    files = list(files)
+    try:
+        for filename, fileobj in files:
+            try:
+                if is_archive(filename):
+                    try:
+                        yield from iter_archive(filename, fileobj)
+                    except (zipfile.BadZipFile, tarfile.TarError) as e:
+                        logger.error("Could not read archive: %s", e, extra={"upload": filename})
+                        yield filename, b""
+                else:
+                    size = fileobj.seek(0, os.SEEK_END)
+                    fileobj.seek(0)
+                    yield filename, _too_large(size) if size > BATCH_MAX_IMAGE_BYTES else fileobj.read()
+            finally:
+                fileobj.close()
+    finally:
+        # Uploads not reached yet (client disconnected)
+        for _, fileobj in files:
+            fileobj.close()
@@ -0,0 +1,209 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .telemetry import metrics
+
+# =========================
+# CONFIG
+# =========================
+
+# memory | sqlite | off
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory")
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "data/cache/results.sqlite3")
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
+
+# =========================
+# BACKENDS
+# =========================
+
+class MemoryCache:
+    """
+    In-process LRU cache with a TTL. Values must be JSON-serializable so
+    both backends behave the same.
+    """
+
+    def __init__(self, name: str, ttl: float = RESULT_CACHE_TTL, max_entries: int = RESULT_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return json.loads(entry[1])
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._data[key] = (time.time(), json.dumps(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def keys(self):
+        with self._lock:
+            return list(self._data)
+
+    def __contains__(self, key: str):
+        # Existence check that does not touch the hit/miss counters or LRU order
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and time.time() - entry[0] <= self.ttl
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None
+        }
+
+class SQLiteCache:
+    """
+    On-disk LRU cache with a TTL. One table per cache name in a shared
+    SQLite file, so entries survive restarts.
+    """
+
+    def __init__(self, name: str, path: str = RESULT_CACHE_PATH, ttl: float = RESULT_CACHE_TTL, max_entries: int = RESULT_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._table = "cache_" + "".join(c if c.isalnum() else "_" for c in name)
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self._table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self._table}_accessed ON {self._table} (accessed)")
+        # SQLite connections must not cross fork() (gunicorn --preload); each worker opens its own
+        os.register_at_fork(after_in_child=self._reconnect)
+
+    def _reconnect(self):
+        # The inherited handle is kept, never closed: closing it in the child could disturb the parent's locks
+        self._inherited = self._conn
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created FROM {self._table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self._table} SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self._table} (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now: float):
+        self._conn.execute(f"DELETE FROM {self._table} WHERE created < ?", (now - self.ttl,))
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                f"DELETE FROM {self._table} WHERE key IN "
+                f"(SELECT key FROM {self._table} ORDER BY accessed ASC LIMIT ?)", (excess,)
+            )
+
+    def keys(self):
+        with self._lock:
+            return [r[0] for r in self._conn.execute(f"SELECT key FROM {self._table}")]
+
+    def __contains__(self, key: str):
+        # Existence check that does not touch the hit/miss counters or LRU order
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT 1 FROM {self._table} WHERE key = ? AND created >= ?", (key, time.time() - self.ttl)
+            ).fetchone()
+            return row is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None
+        }
+
+# =========================
+# FACTORY
+# =========================
+
+_caches = {}
+
+def get_cache(name: str, **kwargs):
+    """
+    Returns the process-wide cache for `name` using RESULT_CACHE_BACKEND,
+    or None when caching is off.
+    """
+    if RESULT_CACHE_BACKEND == "off":
+        return None
+    if name not in _caches:
+        if RESULT_CACHE_BACKEND == "sqlite":
+            _caches[name] = SQLiteCache(name, **kwargs)
+        else:
+            _caches[name] = MemoryCache(name, **kwargs)
+    return _caches[name]
+
+def cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+def _cache_metrics() -> list:
+    stats = cache_stats()
+    lines = []
+    for metric, kind, key, help_text in (
+        ("safebite_cache_hits_total", "counter", "hits", "Result cache hits."),
+        ("safebite_cache_misses_total", "counter", "misses", "Result cache misses."),
+        ("safebite_cache_entries", "gauge", "entries", "Entries currently in the result cache."),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        lines += [f'{metric}{{cache="{name}"}} {s[key]}' for name, s in sorted(stats.items())]
+    return lines
+
+metrics.add_collector(_cache_metrics)
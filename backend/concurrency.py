@@ -0,0 +1,22 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# =========================
+# BOUNDED BLOCKING EXECUTOR
+# =========================
+
+# Blocking work (file I/O, SDK calls without an async variant) runs here so it
+# never stalls the event loop. The pool is bounded so a burst of requests
+# queues instead of spawning unbounded threads.
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "16"))
+
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="blocking")
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Runs fn(*args, **kwargs) on the bounded executor and awaits the result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,39 @@
+from google import genai
+from google.genai import types
+import httpx
+import os
+
+# =========================
+# CONFIG
+# =========================
+
+# GEMINI_BASE_URL lets load tests point the SDK at a local stub server
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+# Default per-call timeout; callers can pass a tighter one (see models.generate_content)
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+# Connection pool shared by every request in this process
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "32"))
+GEMINI_KEEPALIVE_SECONDS = float(os.getenv("GEMINI_KEEPALIVE_SECONDS", "30"))
+
+# =========================
+# CLIENT
+# =========================
+
+_limits = httpx.Limits(
+    max_connections=GEMINI_MAX_CONNECTIONS,
+    max_keepalive_connections=GEMINI_MAX_CONNECTIONS,
+    keepalive_expiry=GEMINI_KEEPALIVE_SECONDS
+)
+
+# Single Gemini Client shared by OCR, filtering and explanation. Both the sync
+# and async transports keep TLS connections alive across calls. Retries are
+# not left to the SDK: models.py retries with jitter and falls back across models.
+client = genai.Client(
+    api_key=os.getenv("GEMINI_API_KEY"),
+    http_options=types.HttpOptions(
+        base_url=GEMINI_BASE_URL,
+        timeout=int(GEMINI_TIMEOUT_SECONDS * 1000),
+        httpx_client=httpx.Client(limits=_limits),
+        httpx_async_client=httpx.AsyncClient(limits=_limits)
+    )
+)
@@ -1,55 +1,28 @@
-from google import genai
-import os
 import json
 
-# Initialize the new Gemini Client forcing v1 stable API
-# Removing forced api_version to let SDK decide best default
-client = genai.Client(
-    api_key=os.getenv("GEMINI_API_KEY")
-)
+from ..concurrency import run_blocking
+from ..telemetry import get_logger
+from .knowledge import EXPLAINED_RISKS, knowledge_base, normalize_ingredient
+from .models import generate_content, generate_content_async, generate_content_stream_async
 
-def get_best_model(client):
-    """
-    Intelligently finds an available model for the user's key.
-    Solves 404 errors by picking what is actually enabled.
-    """
-    try:
-        models = [m.name for m in client.models.list()]
-        print(f"DEBUG: Available models for this key: {models}")
-        
-        # Priority list
-        priorities = [
-            "gemini-1.5-flash",
-            "gemini-1.5-flash-latest",
-            "gemini-2.0-flash-exp",
-            "gemini-1.5-pro",
-            "gemini-1.0-pro"
-        ]
-        
-        for p in priorities:
-            for m in models:
-                if p == m or f"models/{p}" == m:
-                    return m
-        
-        # Fallback to first compatible model
-        for m in models:
-            if "flash" in m.lower() or "pro" in m.lower():
-                return m
-                
-        return "gemini-1.5-flash" # Absolute fallback
-    except Exception as e:
-        print(f"DEBUG: Model auto-discovery failed: {e}")
-        return "gemini-1.5-flash"
+logger = get_logger(__name__)
 
-def explain_with_gemini(analysis: list, profile: str = "General"):
+def _ingredient_instruction(explain: list = None) -> str:
+    if explain is None:
+        return "Provide a brief (1-line) explanation for EVERY ingredient marked as 'Harmfull' or 'Moderate' in the input."
+    if not explain:
+        return 'Return "ingredient_explanations" as an empty object {}; these ingredients are already explained.'
+    return f"Provide a brief (1-line) explanation ONLY for these ingredients: {', '.join(explain)}."
+
+def build_explain_prompt(analysis: list, profile: str, explain: list = None) -> str:
     """
-    analysis: list of ML predictions
-    profile: User health profile (e.g., "Diabetic", "Child", "None")
+    explain: ingredients that still need a one-line explanation; None asks
+    for every Harmfull/Moderate ingredient.
     """
-
     structured_input = json.dumps(analysis, indent=2)
+    ingredient_instruction = _ingredient_instruction(explain)
 
-    prompt = f"""
+    return f"""
 You are a food safety and nutrition expert. Your goal is to provide a structured, profile-specific analysis.
 
 User Profile: {profile}
@@ -63,7 +36,7 @@ CRITICAL INSTRUCTIONS:
 3. **Risk Factors**: List exactly 3 specific risk factors found in the data.
 4. **Natural Alternatives**: Provide exactly **3** natural/homemade alternatives.
 5. **Commercial Alternatives**: Provide exactly **3** specific, healthier brand-name product suggestions available in market.
-6. **Ingredient Explanations**: Provide a brief (1-line) explanation for EVERY ingredient marked as 'Harmfull' or 'Moderate' in the input.
+6. **Ingredient Explanations**: {ingredient_instruction}
 
 RETURN JSON STRUCTURE:
 {{
@@ -91,30 +64,133 @@ STRICT RULES:
 4. Ensure exactly 3 items in 'alternatives' and 'commercial_alternatives'.
 """
 
-    try:
-        model_name = get_best_model(client)
-        print(f"DEBUG: Using model '{model_name}' for explanation.")
+def _parse_explanation(text: str) -> dict:
+    text = text.strip()
+    
+    if text.startswith("```json"):
+        text = text[7:-3].strip()
+    elif text.startswith("```"):
+        text = text[3:-3].strip()
         
-        response = client.models.generate_content(
-            model=model_name,
-            contents=prompt
-        )
+    return json.loads(text)
+
+def _failed_explanation(e: Exception) -> dict:
+    return {
+        "harm_explanation": f"Analysis failed: {str(e)}",
+        "risk_factors": [],
+        "alternatives": [],
+        "commercial_alternatives": [],
+        "ingredient_explanations": {}
+    }
+
+def is_failed_explanation(explanation: dict) -> bool:
+    return explanation.get("harm_explanation", "").startswith("Analysis failed:")
+
+# =========================
+# KNOWLEDGE BASE
+# =========================
+
+def _known_explanations(analysis: list, profile: str):
+    """
+    Splits the Harmfull/Moderate ingredients into those the knowledge base
+    already explains for this profile ({name: text}) and the rest, which
+    the prompt still has to ask about. Without a knowledge base the list is
+    None and the prompt asks about all of them.
+    """
+    if knowledge_base is None:
+        return {}, None
+
+    flagged = list(dict.fromkeys(
+        item["ingredient"] for item in analysis
+        if item.get("ingredient") and item.get("risk") in EXPLAINED_RISKS
+    ))
+    found = knowledge_base.lookup(flagged, profile)
+    known = {name: found[normalize_ingredient(name)] for name in flagged if normalize_ingredient(name) in found}
+    unknown = [name for name in flagged if name not in known]
+    return known, unknown
+
+def _merge_known(explanation: dict, known: dict, unknown: list, analysis: list, profile: str) -> dict:
+    """
+    Stores the newly generated explanations of the ingredients the prompt
+    asked about (unknown, all Harmfull/Moderate) and adds the known ones back,
+    so callers always get the full ingredient_explanations map. Anything
+    else in the reply is passed through but never stored.
+    """
+    generated = explanation.get("ingredient_explanations")
+    if not isinstance(generated, dict):
+        generated = {}
+
+    if knowledge_base is not None and generated and unknown:
+        requested = {normalize_ingredient(name) for name in unknown}
+        risks = {normalize_ingredient(item.get("ingredient", "")): item.get("risk") for item in analysis}
+        knowledge_base.store([
+            (name, risks[normalize_ingredient(name)], text)
+            for name, text in generated.items()
+            if normalize_ingredient(name) in requested
+        ], profile)
+
+    explanation["ingredient_explanations"] = {**generated, **known}
+    return explanation
+
+# =========================
+# EXPLAIN
+# =========================
+
+def explain_with_gemini(analysis: list, profile: str = "General"):
+    """
+    analysis: list of ML predictions
+    profile: User health profile (e.g., "Diabetic", "Child", "None")
+    """
+    known, unknown = _known_explanations(analysis, profile)
+    prompt = build_explain_prompt(analysis, profile, unknown)
+
+    try:
+        response = generate_content(prompt)
         
-        text = response.text.strip()
+        return _merge_known(_parse_explanation(response.text), known, unknown, analysis, profile)
+
+    except Exception as e:
+        logger.error("explain_with_gemini failed: %s", e)
+        return _failed_explanation(e)
+
+async def explain_with_gemini_async(analysis: list, profile: str = "General"):
+    """
+    Non-blocking variant of explain_with_gemini using the SDK's async client.
+    """
+    known, unknown = await run_blocking(_known_explanations, analysis, profile)
+    prompt = build_explain_prompt(analysis, profile, unknown)
+
+    try:
+        response = await generate_content_async(prompt)
         
-        if text.startswith("```json"):
-            text = text[7:-3].strip()
-        elif text.startswith("```"):
-            text = text[3:-3].strip()
-            
-        return json.loads(text)
+        explanation = _parse_explanation(response.text)
+        return await run_blocking(_merge_known, explanation, known, unknown, analysis, profile)
+
+    except Exception as e:
+        logger.error("explain_with_gemini failed: %s", e)
+        return _failed_explanation(e)
+
+async def explain_with_gemini_stream(analysis: list, profile: str = "General"):
+    """
+    Streaming variant of explain_with_gemini_async. Yields ("delta", text)
+    for each chunk of the reply as it is generated, then ("explanation", dict)
+    with the parsed result (or the failed-analysis shape on error).
+    """
+    known, unknown = await run_blocking(_known_explanations, analysis, profile)
+    prompt = build_explain_prompt(analysis, profile, unknown)
+    parts = []
+
+    try:
+        async for chunk in generate_content_stream_async(prompt):
+            text = chunk.text
+            if text:
+                parts.append(text)
+                yield "delta", text
+
+        explanation = await run_blocking(_merge_known, _parse_explanation("".join(parts)), known, unknown, analysis, profile)
 
     except Exception as e:
-        print(f"ERROR: explain_with_gemini failed: {e}")
-        return {
-            "harm_explanation": f"Analysis failed: {str(e)}",
-            "risk_factors": [],
-            "alternatives": [],
-            "commercial_alternatives": [],
-            "ingredient_explanations": {}
-        }
+        logger.error("explain_with_gemini failed: %s", e)
+        explanation = _failed_explanation(e)
+
+    yield "explanation", explanation
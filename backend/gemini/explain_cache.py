@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import json
+
+from ..cache import get_cache
+from ..concurrency import run_blocking
+from ..telemetry import get_logger
+from .explain import explain_with_gemini_async, explain_with_gemini_stream, is_failed_explanation
+from .knowledge import normalize_profile
+
+logger = get_logger(__name__)
+
+# Parsed explanations keyed on the canonical (ingredients, risks, profile) triple
+EXPLAIN_CACHE = get_cache("explain")
+
+# Calls currently in flight, keyed like the cache
+_inflight = {}
+
+RISK_LABELS = {
+    "harmfull": "Harmfull",  # Kept spelling to match frontend
+    "harmful": "Harmfull",
+    "high": "Harmfull",
+    "moderate": "Moderate",
+    "medium": "Moderate",
+    "safe": "Safe",
+    "low": "Safe"
+}
+
+# =========================
+# CANONICAL FORM
+# =========================
+
+def canonical_analysis(analysis: list) -> list:
+    """
+    Reduces ML results to what the prompt depends on: ingredient name and
+    risk label, normalized and sorted. Field order, confidences, casing and
+    duplicate rows no longer change the prompt or the cache key.
+    """
+    rows = set()
+    for item in analysis:
+        name = " ".join(str(item.get("ingredient", "")).lower().split())
+        if not name:
+            continue
+        risk = str(item.get("risk", "Safe")).strip().lower()
+        rows.add((name, RISK_LABELS.get(risk, "Safe")))
+    return [{"ingredient": name, "risk": risk} for name, risk in sorted(rows)]
+
+def canonical_profile(profile: str) -> str:
+    return normalize_profile(profile)
+
+def explanation_key(analysis: list, profile: str) -> str:
+    payload = json.dumps([analysis, profile], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+# =========================
+# CACHED + SINGLE-FLIGHT
+# =========================
+
+async def explain_cached(analysis: list, profile: str = "General") -> dict:
+    """
+    explain_with_gemini_async behind a canonicalized cache. Concurrent
+    identical requests share one upstream call.
+    """
+    analysis = canonical_analysis(analysis)
+    profile = canonical_profile(profile)
+    key = explanation_key(analysis, profile)
+
+    if EXPLAIN_CACHE is not None:
+        cached = await run_blocking(EXPLAIN_CACHE.get, key)
+        if cached is not None:
+            return cached
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_explain_and_store(key, analysis, profile))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        logger.debug("Joining in-flight explanation %s", key[:12])
+
+    # shield: one caller disconnecting must not cancel the shared call
+    return await asyncio.shield(task)
+
+async def _explain_and_store(key: str, analysis: list, profile: str) -> dict:
+    explanation = await explain_with_gemini_async(analysis, profile)
+    if EXPLAIN_CACHE is not None and not is_failed_explanation(explanation):
+        await run_blocking(EXPLAIN_CACHE.set, key, explanation)
+    return explanation
+
+async def explain_cached_stream(analysis: list, profile: str = "General"):
+    """
+    Streaming counterpart of explain_cached: yields ("delta", text) chunks
+    while the model writes, then ("explanation", dict). Cache hits and calls
+    already in flight yield only the final explanation. A streamed call is
+    not shared with concurrent callers, but its result is cached.
+    """
+    analysis = canonical_analysis(analysis)
+    profile = canonical_profile(profile)
+    key = explanation_key(analysis, profile)
+
+    if EXPLAIN_CACHE is not None:
+        cached = await run_blocking(EXPLAIN_CACHE.get, key)
+        if cached is not None:
+            yield "explanation", cached
+            return
+
+    task = _inflight.get(key)
+    if task is not None:
+        logger.debug("Joining in-flight explanation %s", key[:12])
+        yield "explanation", await asyncio.shield(task)
+        return
+
+    async for event, data in explain_with_gemini_stream(analysis, profile):
+        if event == "explanation" and EXPLAIN_CACHE is not None and not is_failed_explanation(data):
+            await run_blocking(EXPLAIN_CACHE.set, key, data)
+        yield event, data
@@ -0,0 +1,268 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from ..telemetry import get_logger, metrics
+
+logger = get_logger(__name__)
+
+# =========================
+# CONFIG
+# =========================
+
+# Set to 0 to always ask Gemini for every ingredient explanation
+INGREDIENT_KB = os.getenv("INGREDIENT_KB", "1") == "1"
+INGREDIENT_KB_PATH = os.getenv("INGREDIENT_KB_PATH", "data/knowledge/ingredients.sqlite3")
+# Bump when the explain prompt or model changes: entries stored under another
+# version are ignored (and regenerated on demand)
+INGREDIENT_KB_VERSION = os.getenv("INGREDIENT_KB_VERSION", "1")
+# Entries older than this many seconds are ignored too (0 = never expire)
+INGREDIENT_KB_MAX_AGE = float(os.getenv("INGREDIENT_KB_MAX_AGE", str(90 * 24 * 3600)))
+
+# Only these risk levels get a per-ingredient explanation (see build_explain_prompt)
+EXPLAINED_RISKS = ("Harmfull", "Moderate")
+
+_PERCENT = re.compile(r"\d+(?:[.,]\d+)?\s*%")
+_NON_WORD = re.compile(r"[^\w\s-]+")
+
+def normalize_ingredient(name: str) -> str:
+    """
+    Knowledge-base key: lowercase, percentages and punctuation dropped,
+    whitespace collapsed. "Sodium Benzoate (0.1%)." -> "sodium benzoate".
+    """
+    name = _NON_WORD.sub(" ", _PERCENT.sub(" ", str(name).lower()))
+    return " ".join(name.split())
+
+def normalize_profile(profile: str) -> str:
+    return " ".join((profile or "General").split()).title()
+
+# =========================
+# STORE
+# =========================
+
+class IngredientKnowledgeBase:
+    """
+    SQLite table of one-line ingredient explanations and risk labels, keyed
+    by (normalized ingredient, profile). Filled lazily from Gemini replies and
+    in bulk by `python -m backend.gemini.knowledge`, so explain prompts only
+    ask about ingredients the store has not seen for that profile. Only
+    entries written under the current version and within max_age are served.
+    """
+
+    def __init__(self, path: str = INGREDIENT_KB_PATH, version: str = INGREDIENT_KB_VERSION,
+                 max_age: float = INGREDIENT_KB_MAX_AGE):
+        self.path = path
+        self.version = version
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingredients ("
+            "name TEXT NOT NULL, profile TEXT NOT NULL, risk TEXT, explanation TEXT NOT NULL, "
+            "source TEXT NOT NULL, updated REAL NOT NULL, version TEXT, PRIMARY KEY (name, profile))"
+        )
+        # Stores created before entries were versioned; their rows (version NULL) are never served
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(ingredients)")]
+        if "version" not in columns:
+            self._conn.execute("ALTER TABLE ingredients ADD COLUMN version TEXT")
+        os.register_at_fork(after_in_child=self._reconnect)
+
+    def _reconnect(self):
+        # Same as SQLiteCache._reconnect: a forked worker gets its own connection and lock
+        self._inherited = self._conn
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+
+    def lookup(self, names: list, profile: str) -> dict:
+        """
+        Returns {normalized name: explanation} for the names already known
+        for this profile.
+        """
+        keys = sorted({normalize_ingredient(n) for n in names} - {""})
+        if not keys:
+            return {}
+        profile = normalize_profile(profile)
+        cutoff = time.time() - self.max_age if self.max_age else 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, explanation FROM ingredients WHERE profile = ? AND version = ? AND updated >= ? "
+                f"AND name IN ({','.join('?' * len(keys))})",
+                [profile, self.version, cutoff] + keys
+            ).fetchall()
+            found = dict(rows)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def store(self, entries: list, profile: str, source: str = "explain"):
+        """
+        entries: (name, risk, explanation) triples. Existing rows are replaced.
+        """
+        now = time.time()
+        profile = normalize_profile(profile)
+        rows = [
+            (normalize_ingredient(name), profile, risk, str(text).strip(), source, now, self.version)
+            for name, risk, text in entries
+            if normalize_ingredient(name) and text and str(text).strip()
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO ingredients (name, profile, risk, explanation, source, updated, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM ingredients").fetchone()[0]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None
+        }
+
+knowledge_base = IngredientKnowledgeBase() if INGREDIENT_KB else None
+
+def _knowledge_metrics() -> list:
+    if knowledge_base is None:
+        return []
+    stats = knowledge_base.stats()
+    lines = []
+    for metric, kind, key, help_text in (
+        ("safebite_ingredient_kb_hits_total", "counter", "hits", "Ingredient explanations served from the knowledge base."),
+        ("safebite_ingredient_kb_misses_total", "counter", "misses", "Ingredient explanations that had to be generated."),
+        ("safebite_ingredient_kb_entries", "gauge", "entries", "Entries in the ingredient knowledge base."),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}", f"{metric} {stats[key]}"]
+    return lines
+
+metrics.add_collector(_knowledge_metrics)
+
+# =========================
+# BULK WARM
+# =========================
+
+WARM_PROMPT = """You are a food safety and nutrition expert.
+
+User Profile: {profile}
+
+For EACH ingredient below, write a brief (1-line) explanation of why it matters for {profile}.
+
+Ingredients:
+{ingredients}
+
+RETURN ONLY JSON (no Markdown, no conversational text), one key per ingredient exactly as listed:
+{{"ingredient name": "Why it matters for {profile}"}}
+"""
+
+def _warm_vocabulary(paths: list = None) -> list:
+    """
+    (ingredient, risk) pairs to precompute. Defaults to the keyword lists.
+    Otherwise reads ingredient lists (one per line) or dataset shards from
+    generate_ingredient_risk_dataset.py (JSONL with "text" and "label");
+    unlabeled names get the keyword classifier's label.
+    """
+    from ..ml.inference import LABELS
+    from ..ml.predict import HARMFUL_KEYWORDS, MODERATE_KEYWORDS, predict_ingredient
+
+    if not paths:
+        return [(k, "Harmfull") for k in HARMFUL_KEYWORDS] + [(k, "Moderate") for k in MODERATE_KEYWORDS]
+
+    pairs = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith("{"):
+                    row = json.loads(line)
+                    name, risk = row.get("text", ""), LABELS.get(row.get("label"))
+                else:
+                    name, risk = line, None
+                key = normalize_ingredient(name)
+                if key and key not in pairs:
+                    pairs[key] = risk or predict_ingredient(key)["risk"]
+    return [(name, risk) for name, risk in pairs.items() if risk in EXPLAINED_RISKS]
+
+async def warm(profiles: list, vocabulary: list, batch_size: int = 25, concurrency: int = 4, force: bool = False):
+    """
+    Asks Gemini for explanations of every (ingredient, risk) pair not yet
+    stored for each profile, batch_size ingredients per call.
+    """
+    import asyncio
+
+    from ..concurrency import run_blocking
+    from .explain import _parse_explanation
+    from .models import generate_content_async
+
+    semaphore = asyncio.Semaphore(concurrency)
+    risks = {normalize_ingredient(name): risk for name, risk in vocabulary}
+    stored = 0
+
+    async def warm_batch(names: list, profile: str):
+        nonlocal stored
+        prompt = WARM_PROMPT.format(profile=profile, ingredients="\n".join(f"- {n}" for n in names))
+        async with semaphore:
+            try:
+                response = await generate_content_async(prompt)
+                reply = _parse_explanation(response.text)
+            except Exception as e:
+                logger.error("Warm batch failed: %s", e, extra={"profile": profile, "size": len(names)})
+                return
+        entries = [(name, risks.get(normalize_ingredient(name)), text) for name, text in reply.items()
+                   if normalize_ingredient(name) in risks]
+        await run_blocking(knowledge_base.store, entries, profile, "warm")
+        stored += len(entries)
+
+    tasks = []
+    for profile in profiles:
+        names = list(risks)
+        if not force:
+            known = knowledge_base.lookup(names, profile)
+            names = [n for n in names if n not in known]
+        for i in range(0, len(names), batch_size):
+            tasks.append(warm_batch(names[i:i + batch_size], profile))
+
+    logger.info("Warming ingredient knowledge base", extra={"profiles": profiles, "calls": len(tasks)})
+    await asyncio.gather(*tasks)
+    return stored
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Precompute ingredient explanations into the knowledge base")
+    parser.add_argument("--input", nargs="*", help="Ingredient lists (one per line) or dataset shards (*.jsonl); defaults to the keyword lists")
+    parser.add_argument("--profiles", default="General,Diabetic,Hypertension,Child,Allergy-Prone,Weight Loss")
+    parser.add_argument("--batch-size", type=int, default=25)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--force", action="store_true", help="Regenerate entries that already exist")
+    args = parser.parse_args()
+
+    if knowledge_base is None:
+        parser.error("INGREDIENT_KB=0; nothing to warm")
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    profiles = [normalize_profile(p) for p in args.profiles.split(",") if p.strip()]
+    vocabulary = _warm_vocabulary(args.input)
+    started = time.perf_counter()
+    stored = asyncio.run(warm(profiles, vocabulary, args.batch_size, args.concurrency, args.force))
+    print(f"Stored {stored} explanations for {len(vocabulary)} ingredients x {len(profiles)} profiles "
+          f"in {time.perf_counter() - started:.1f}s ({len(knowledge_base)} entries total)")
@@ -0,0 +1,304 @@
+import asyncio
+import os
+import threading
+import time
+
+from google.genai import types
+
+from ..concurrency import run_blocking
+from ..telemetry import get_logger, record_upstream
+from .client import client
+from .resilience import (
+    GEMINI_MAX_ATTEMPTS, UpstreamUnavailable, backoff_delay, breaker, is_transient_error, rate_limiter
+)
+
+logger = get_logger(__name__)
+
+# =========================
+# CONFIG
+# =========================
+
+# Priority list
+PRIORITIES = [
+    "gemini-1.5-flash",
+    "gemini-1.5-flash-latest",
+    "gemini-2.0-flash-exp",
+    "gemini-1.5-pro",
+    "gemini-1.0-pro"
+]
+
+DEFAULT_MODEL = "gemini-1.5-flash"  # Absolute fallback
+
+MODEL_CACHE_TTL = float(os.getenv("MODEL_CACHE_TTL", "3600"))
+# How long a model that returned 404/quota errors is skipped
+MODEL_FAILURE_COOLDOWN = float(os.getenv("MODEL_FAILURE_COOLDOWN", "300"))
+
+# =========================
+# RESOLVER
+# =========================
+
+def rank_models(available: list) -> list:
+    """
+    Orders the models enabled for this key: priority list first,
+    then any other flash/pro model.
+    """
+    ranked = []
+    for p in PRIORITIES:
+        for m in available:
+            if (p == m or f"models/{p}" == m) and m not in ranked:
+                ranked.append(m)
+    for m in available:
+        if ("flash" in m.lower() or "pro" in m.lower()) and m not in ranked:
+            ranked.append(m)
+    return ranked or [DEFAULT_MODEL]
+
+def is_fallback_error(e: Exception) -> bool:
+    """
+    True for errors that mean "try another model": not found or quota exhausted.
+    """
+    code = getattr(e, "code", None)
+    if code in (404, 429):
+        return True
+    message = str(e)
+    return "NOT_FOUND" in message or "RESOURCE_EXHAUSTED" in message
+
+class ModelResolver:
+    """
+    Process-wide cache of the models available to our API key.
+    models.list() runs once at startup and again in the background when the
+    cache is older than MODEL_CACHE_TTL; requests never wait on it after
+    the first resolution.
+    """
+
+    def __init__(self, ttl: float = MODEL_CACHE_TTL, cooldown: float = MODEL_FAILURE_COOLDOWN):
+        self.ttl = ttl
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._models = []
+        self._resolved_at = None
+        self._refreshing = False
+        self._failed = {}
+
+    def resolve(self) -> list:
+        try:
+            available = [m.name for m in client.models.list()]
+            logger.info("Available models for this key", extra={"models": available})
+            models = rank_models(available)
+        except Exception as e:
+            logger.warning("Model auto-discovery failed: %s", e)
+            # Keep the last good list if we have one
+            models = self._models or [DEFAULT_MODEL]
+
+        with self._lock:
+            self._models = models
+            self._resolved_at = time.monotonic()
+            self._refreshing = False
+        return models
+
+    def start(self):
+        """
+        Resolves in a background thread so startup is not blocked.
+        """
+        self._refresh_in_background()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.resolve, name="model-resolver", daemon=True).start()
+
+    def candidates(self) -> list:
+        """
+        Models to try, best first. Models in failure cooldown go to the back.
+        """
+        if self._resolved_at is None:
+            self.resolve()
+        elif time.monotonic() - self._resolved_at > self.ttl:
+            self._refresh_in_background()
+
+        with self._lock:
+            return self._ordered()
+
+    def _ordered(self) -> list:
+        now = time.monotonic()
+        healthy = [m for m in self._models if now - self._failed.get(m, -self.cooldown) >= self.cooldown]
+        cooling = [m for m in self._models if m not in healthy]
+        return healthy + cooling
+
+    @property
+    def resolved(self) -> bool:
+        return self._resolved_at is not None
+
+    def current(self) -> str:
+        return self.candidates()[0]
+
+    def report_failure(self, model: str, e: Exception) -> bool:
+        """
+        Records a failed call. Returns True if the caller should try the next model.
+        """
+        if not is_fallback_error(e):
+            return False
+        logger.warning("Model unavailable; falling back", extra={"model": model, "error": str(e)})
+        with self._lock:
+            self._failed[model] = time.monotonic()
+        return True
+
+    def status(self) -> dict:
+        with self._lock:
+            age = None if self._resolved_at is None else round(time.monotonic() - self._resolved_at, 1)
+            models = self._ordered()
+        model = models[0] if models else None
+        return {
+            "model": model,
+            "cache_age_seconds": age,
+            "cache_ttl_seconds": self.ttl,
+            "circuit": breaker.status()
+        }
+
+model_resolver = ModelResolver()
+
+# =========================
+# CALL HELPERS
+# =========================
+
+def _call_config(timeout: float = None):
+    if timeout is None:
+        return None
+    return types.GenerateContentConfig(http_options=types.HttpOptions(timeout=int(timeout * 1000)))
+
+def _next_step(model_name: str, e: Exception, models: list, index: int, attempt: int):
+    """
+    Decides what to do after a failed call. Returns (index, attempt, delay)
+    for the next try; raises when the call should not be retried.
+
+    404/429 move to the next model straight away; 429, 5xx and timeouts on
+    the last candidate are retried with jittered backoff up to
+    GEMINI_MAX_ATTEMPTS; any other error is raised as-is.
+    """
+    transient = is_transient_error(e)
+    if transient:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+    if model_resolver.report_failure(model_name, e) and index + 1 < len(models):
+        return index + 1, attempt, 0.0
+    if not transient:
+        raise e
+
+    attempt += 1
+    if attempt >= GEMINI_MAX_ATTEMPTS:
+        raise UpstreamUnavailable(f"Gemini failed after {attempt} attempts: {e}") from e
+    delay = backoff_delay(attempt - 1)
+    logger.warning("Transient Gemini error; retrying", extra={
+        "model": model_name, "attempt": attempt, "delay": round(delay, 2), "error": str(e)
+    })
+    return index, attempt, delay
+
+def generate_content(contents, timeout: float = None):
+    """
+    client.models.generate_content on the best available model, falling back
+    down the priority list on 404/quota errors and retrying transient
+    failures. Raises UpstreamUnavailable when the circuit breaker is open or
+    retries are exhausted. timeout (seconds) overrides GEMINI_TIMEOUT_SECONDS.
+    """
+    models = model_resolver.candidates()
+    config = _call_config(timeout)
+    index, attempt = 0, 0
+    while True:
+        model_name = models[index]
+        breaker.before_call()
+        rate_limiter.acquire()
+        start = time.perf_counter()
+        try:
+            response = client.models.generate_content(model=model_name, contents=contents, config=config)
+        except Exception as e:
+            record_upstream(model_name, time.perf_counter() - start, error=e)
+            index, attempt, delay = _next_step(model_name, e, models, index, attempt)
+            if delay:
+                time.sleep(delay)
+            continue
+        breaker.record_success()
+        record_upstream(model_name, time.perf_counter() - start, response)
+        return response
+
+async def generate_content_async(contents, timeout: float = None):
+    """
+    Async variant of generate_content using the SDK's async client.
+    """
+    if not model_resolver.resolved:
+        # Only reached if a request beats the startup resolution
+        await run_blocking(model_resolver.resolve)
+
+    models = model_resolver.candidates()
+    config = _call_config(timeout)
+    index, attempt = 0, 0
+    while True:
+        model_name = models[index]
+        breaker.before_call()
+        await rate_limiter.acquire_async()
+        start = time.perf_counter()
+        try:
+            response = await client.aio.models.generate_content(model=model_name, contents=contents, config=config)
+        except Exception as e:
+            record_upstream(model_name, time.perf_counter() - start, error=e)
+            index, attempt, delay = _next_step(model_name, e, models, index, attempt)
+            if delay:
+                await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        record_upstream(model_name, time.perf_counter() - start, response)
+        return response
+
+async def generate_content_stream_async(contents, timeout: float = None):
+    """
+    Streaming variant of generate_content_async: yields response chunks as
+    the model generates them. Fallback and retries apply until the first
+    chunk arrives; a failure after that is raised to the caller, which has
+    already consumed part of the reply.
+    """
+    if not model_resolver.resolved:
+        await run_blocking(model_resolver.resolve)
+
+    models = model_resolver.candidates()
+    config = _call_config(timeout)
+    index, attempt = 0, 0
+    while True:
+        model_name = models[index]
+        breaker.before_call()
+        await rate_limiter.acquire_async()
+        start = time.perf_counter()
+        stream = None
+        try:
+            # The request goes out on the first read, so that's where upstream errors surface
+            stream = await client.aio.models.generate_content_stream(model=model_name, contents=contents, config=config)
+            chunk = await stream.__anext__()
+        except StopAsyncIteration:
+            breaker.record_success()
+            record_upstream(model_name, time.perf_counter() - start)
+            return
+        except Exception as e:
+            if stream is not None:
+                await stream.aclose()
+            record_upstream(model_name, time.perf_counter() - start, error=e)
+            index, attempt, delay = _next_step(model_name, e, models, index, attempt)
+            if delay:
+                await asyncio.sleep(delay)
+            continue
+        break
+
+    breaker.record_success()
+    try:
+        yield chunk
+        async for chunk in stream:
+            yield chunk
+    except Exception as e:
+        if is_transient_error(e):
+            breaker.record_failure()
+        record_upstream(model_name, time.perf_counter() - start, error=e)
+        raise
+    finally:
+        await stream.aclose()
+    # Usage metadata arrives on the last chunk
+    record_upstream(model_name, time.perf_counter() - start, chunk)
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+import httpx
+
+# =========================
+# CONFIG
+# =========================
+
+# Attempts per call on 429 / 5xx / timeouts, including the first one
+GEMINI_MAX_ATTEMPTS = int(os.getenv("GEMINI_MAX_ATTEMPTS", "3"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "0.5"))
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "8"))
+# Consecutive transient failures that open the circuit, and how long it stays open
+GEMINI_BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5"))
+GEMINI_BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "30"))
+# Requests per minute allowed by our quota (0 = no client-side limit) and burst size
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "0"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "5"))
+
+# =========================
+# ERRORS
+# =========================
+
+class UpstreamUnavailable(Exception):
+    """
+    Gemini is unavailable right now (circuit open, or retries exhausted on
+    transient errors). Callers should fail fast instead of degrading.
+    """
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def error_code(e: Exception):
+    code = getattr(e, "code", None) or getattr(e, "status_code", None)
+    return code if isinstance(code, int) else None
+
+def is_transient_error(e: Exception) -> bool:
+    """
+    Rate limits, server errors, timeouts and dropped connections: worth a retry.
+    """
+    code = error_code(e)
+    if code is not None:
+        return code == 429 or code >= 500
+    # httpx.TransportError covers timeouts, connect and read errors
+    return isinstance(e, (TimeoutError, asyncio.TimeoutError, ConnectionError, httpx.TransportError))
+
+def backoff_delay(attempt: int, base: float = GEMINI_BACKOFF_BASE, cap: float = GEMINI_BACKOFF_MAX) -> float:
+    """
+    Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)].
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+# =========================
+# CIRCUIT BREAKER
+# =========================
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive transient failures; while open every
+    call fails fast. After `cooldown` seconds one trial call is let through
+    (half-open): success closes the circuit, failure re-opens it. A trial
+    that never reports back (e.g. a cancelled request) expires after another
+    cooldown so the circuit cannot get stuck.
+    """
+
+    def __init__(self, threshold: int = GEMINI_BREAKER_THRESHOLD, cooldown: float = GEMINI_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_at = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        """
+        Raises UpstreamUnavailable if the call must not go out.
+        """
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            now = time.monotonic()
+            if state == "half_open" and (self._trial_at is None or now - self._trial_at >= self.cooldown):
+                self._trial_at = now
+                return
+            retry_after = max(0.0, self.cooldown - (now - self._opened_at))
+        raise UpstreamUnavailable("Gemini circuit breaker is open", retry_after=retry_after)
+
+    def record_success(self):
+        """
+        Upstream answered (any non-transient response, including 4xx).
+        """
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_at is not None or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial_at = None
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"state": self._state(), "consecutive_failures": self._failures}
+
+# =========================
+# RATE LIMITER
+# =========================
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens/second up to `capacity`. reserve()
+    takes a token (possibly going into debt) and returns how long the caller
+    must wait for it, so the same bucket serves sync and async callers.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            # Negative balance = callers queued ahead of us
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+breaker = CircuitBreaker()
+rate_limiter = TokenBucket(GEMINI_RPM / 60.0, GEMINI_BURST)
@@ -0,0 +1,471 @@
+import asyncio
+import heapq
+import ipaddress
+import itertools
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import httpx
+
+from .concurrency import run_blocking
+from .gemini.resilience import UpstreamUnavailable, GEMINI_BREAKER_COOLDOWN
+from .pipeline import analyze_image
+from .telemetry import get_logger, metrics
+
+logger = get_logger(__name__)
+
+# =========================
+# CONFIG
+# =========================
+
+# memory | sqlite (survives restarts and is shared by every process on the host)
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "memory")
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "data/jobs/jobs.sqlite3")
+# Concurrent pipeline runs per process (0 = accept jobs but leave them to other processes)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# POST /jobs is rejected with 503 once this many jobs are waiting
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "1000"))
+# Jobs hitting a Gemini outage are re-queued after the breaker cooldown, up to this many runs
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# A running job not finished within this many seconds is assumed lost (crashed process) and re-run
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+# Finished jobs are kept this long for GET /jobs/{id}
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", str(24 * 3600)))
+# Idle workers re-check the queue this often (jobs submitted to another process)
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+JOB_CALLBACK_TIMEOUT = float(os.getenv("JOB_CALLBACK_TIMEOUT", "10"))
+# Comma-separated hosts callbacks may go to; when set, no other host is allowed.
+# When unset, any host resolving only to public addresses is allowed.
+JOB_CALLBACK_ALLOWED_HOSTS = {h.strip().lower() for h in os.getenv("JOB_CALLBACK_ALLOWED_HOSTS", "").split(",") if h.strip()}
+# Largest image POST /jobs accepts
+JOB_MAX_IMAGE_BYTES = int(os.getenv("JOB_MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+# Total image bytes the in-memory queue holds before rejecting new jobs
+JOB_MAX_QUEUED_BYTES = int(os.getenv("JOB_MAX_QUEUED_BYTES", str(256 * 1024 * 1024)))
+
+class QueueFull(Exception):
+    pass
+
+class InvalidCallback(ValueError):
+    pass
+
+def check_callback_url(url: str):
+    """
+    Raises InvalidCallback unless url is http(s) to an allowed host. Without
+    an allowlist the host must resolve to public addresses only, so a client
+    can't make the server POST to loopback, private ranges or cloud metadata
+    endpoints. Blocking (DNS); run it off the event loop.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise InvalidCallback("callback_url must be an http(s) URL")
+
+    host = parts.hostname.lower()
+    if JOB_CALLBACK_ALLOWED_HOSTS:
+        if host not in JOB_CALLBACK_ALLOWED_HOSTS:
+            raise InvalidCallback(f"callback host {host!r} is not allowed")
+        return
+
+    try:
+        infos = socket.getaddrinfo(host, parts.port or (443 if parts.scheme == "https" else 80), proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError) as e:
+        raise InvalidCallback(f"callback host {host!r} does not resolve") from e
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global:
+            raise InvalidCallback(f"callback host {host!r} resolves to a non-public address")
+
+def _public(job: dict) -> dict:
+    """
+    The client-facing view of a job (no image bytes).
+    """
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "profile": job["profile"],
+        "attempts": job["attempts"],
+        "created_at": job["created"],
+        "started_at": job["started"],
+        "finished_at": job["finished"],
+        "result": job["result"],
+        "error": job["error"]
+    }
+
+# =========================
+# QUEUES
+# =========================
+
+class MemoryJobQueue:
+    """
+    In-process queue. Jobs are lost on restart and only this process's
+    workers can claim them.
+    """
+
+    def __init__(self, max_queued: int = JOB_MAX_QUEUED, lease: float = JOB_LEASE_SECONDS,
+                 max_queued_bytes: int = JOB_MAX_QUEUED_BYTES):
+        self.max_queued = max_queued
+        self.max_queued_bytes = max_queued_bytes
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._jobs = {}
+        # Image bytes held by unfinished jobs
+        self._bytes = 0
+        # (available_at, seq, job_id) for queued jobs
+        self._ready = []
+        self._seq = itertools.count()
+
+    def put(self, job_id: str, image_bytes: bytes, profile: str, callback_url: str = None):
+        now = time.time()
+        with self._lock:
+            if len(self._ready) >= self.max_queued:
+                raise QueueFull(f"{len(self._ready)} jobs already queued")
+            if self._bytes + len(image_bytes) > self.max_queued_bytes:
+                raise QueueFull(f"{self._bytes} image bytes already queued")
+            self._bytes += len(image_bytes)
+            self._jobs[job_id] = {
+                "id": job_id, "status": "queued", "profile": profile, "callback_url": callback_url,
+                "image": image_bytes, "attempts": 0, "created": now, "started": None,
+                "finished": None, "result": None, "error": None
+            }
+            heapq.heappush(self._ready, (now, next(self._seq), job_id))
+
+    def claim(self):
+        """
+        Marks the oldest runnable job as running and returns it, or None.
+        """
+        now = time.time()
+        with self._lock:
+            if not self._ready or self._ready[0][0] > now:
+                return None
+            _, _, job_id = heapq.heappop(self._ready)
+            job = self._jobs[job_id]
+            job.update(status="running", started=now, attempts=job["attempts"] + 1)
+            return dict(job)
+
+    def finish(self, job_id: str, result: dict = None, error: str = None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                if job["image"] is not None:
+                    self._bytes -= len(job["image"])
+                job.update(
+                    status="failed" if error is not None else "done",
+                    result=result, error=error, finished=time.time(), image=None
+                )
+
+    def retry(self, job_id: str, delay: float, error: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(status="queued", error=error)
+                heapq.heappush(self._ready, (time.time() + delay, next(self._seq), job_id))
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return _public(job) if job is not None else None
+
+    def purge(self, ttl: float = JOB_RESULT_TTL):
+        cutoff = time.time() - ttl
+        with self._lock:
+            for job_id in [k for k, j in self._jobs.items() if j["finished"] and j["finished"] < cutoff]:
+                del self._jobs[job_id]
+
+    def counts(self) -> dict:
+        with self._lock:
+            counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+            return counts
+
+class SQLiteJobQueue:
+    """
+    Queue table in a SQLite file. Claims are a single UPDATE ... RETURNING,
+    so several processes (e.g. gunicorn workers) can share one queue
+    without handing the same job out twice. A job whose worker died is
+    claimed again once its lease expires.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, max_queued: int = JOB_MAX_QUEUED, lease: float = JOB_LEASE_SECONDS):
+        self.max_queued = max_queued
+        self.lease = lease
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, profile TEXT, callback_url TEXT, image BLOB, "
+            "attempts INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL, available_at REAL NOT NULL, "
+            "started REAL, finished REAL, result TEXT, error TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at)")
+        os.register_at_fork(after_in_child=self._reconnect)
+
+    def _reconnect(self):
+        # Same as SQLiteCache._reconnect: a forked worker gets its own connection and lock
+        self._inherited = self._conn
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+
+    def put(self, job_id: str, image_bytes: bytes, profile: str, callback_url: str = None):
+        now = time.time()
+        with self._lock:
+            queued = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= self.max_queued:
+                raise QueueFull(f"{queued} jobs already queued")
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, profile, callback_url, image, created, available_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, profile, callback_url, image_bytes, now, now)
+            )
+
+    def claim(self):
+        now = time.time()
+        with self._lock:
+            # Lost jobs that already used up their attempts (e.g. an image that
+            # crashes the worker) fail instead of being re-run forever
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, image = NULL, "
+                "error = 'Job was lost ' || attempts || ' times (worker crashed or timed out)' "
+                "WHERE status = 'running' AND started < ? AND attempts >= ?",
+                (now, now - self.lease, JOB_MAX_ATTEMPTS)
+            )
+            row = self._conn.execute(
+                "UPDATE jobs SET status = 'running', started = ?, attempts = attempts + 1 "
+                "WHERE id = (SELECT id FROM jobs WHERE (status = 'queued' AND available_at <= ?) "
+                "OR (status = 'running' AND started < ?) ORDER BY available_at, created LIMIT 1) "
+                "RETURNING id, profile, callback_url, image, attempts, created",
+                (now, now, now - self.lease)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0], "status": "running", "profile": row[1], "callback_url": row[2],
+            "image": row[3], "attempts": row[4], "created": row[5], "started": now,
+            "finished": None, "result": None, "error": None
+        }
+
+    def finish(self, job_id: str, result: dict = None, error: str = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ?, image = NULL WHERE id = ?",
+                ("failed" if error is not None else "done",
+                 json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def retry(self, job_id: str, delay: float, error: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', available_at = ?, error = ? WHERE id = ?",
+                (time.time() + delay, error, job_id)
+            )
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, profile, attempts, created, started, finished, result, error "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "status", "profile", "attempts", "created", "started", "finished", "result", "error")
+        job = dict(zip(keys, row))
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return _public(job)
+
+    def purge(self, ttl: float = JOB_RESULT_TTL):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?", (time.time() - ttl,))
+
+    def counts(self) -> dict:
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        with self._lock:
+            for status, n in self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+                counts[status] = n
+        return counts
+
+def make_job_queue(kind: str = JOB_QUEUE_BACKEND):
+    if kind == "sqlite":
+        return SQLiteJobQueue()
+    return MemoryJobQueue()
+
+# =========================
+# WORKERS
+# =========================
+
+class JobRunner:
+    """
+    Pool of asyncio workers that claim jobs from the queue and run the
+    analysis pipeline. Pipeline stages already await upstream calls and
+    offload CPU work to the bounded executor, so workers are tasks on the
+    server's event loop rather than separate processes.
+    """
+
+    def __init__(self, queue, workers: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL):
+        self.queue = queue
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tasks = []
+        self._wakeup = None
+        self._started_at = None
+        self._busy = {}
+        self._busy_seconds = 0.0
+        self._outcomes = {"done": 0, "failed": 0, "retried": 0}
+        self._last_purge = 0.0
+
+    def start(self):
+        if self._tasks or self.workers <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._started_at = time.monotonic()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info("Job workers started", extra={"workers": self.workers, "backend": type(self.queue).__name__})
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, image_bytes: bytes, profile: str = "General", callback_url: str = None) -> str:
+        """
+        Queues one analysis and returns its job id. Raises QueueFull.
+        """
+        job_id = uuid.uuid4().hex
+        await run_blocking(self.queue.put, job_id, image_bytes, profile, callback_url)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id: str):
+        return await run_blocking(self.queue.get, job_id)
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                job = await run_blocking(self.queue.claim)
+            except Exception as e:
+                logger.error("Job claim failed: %s", e)
+                job = None
+
+            if job is None:
+                await self._idle()
+                continue
+
+            started = time.monotonic()
+            self._busy[index] = started
+            try:
+                await self._run(job)
+            except Exception as e:
+                # Queue errors must not kill the worker; the lease re-runs the job
+                logger.error("Job worker error: %s", e, extra={"job_id": job["id"]})
+            finally:
+                del self._busy[index]
+                self._busy_seconds += time.monotonic() - started
+
+    async def _idle(self):
+        if time.monotonic() - self._last_purge > 60:
+            self._last_purge = time.monotonic()
+            await run_blocking(self.queue.purge)
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _run(self, job: dict):
+        JOB_WAIT_SECONDS.observe(max(0.0, job["started"] - job["created"]))
+        try:
+            result = await analyze_image(job["image"], job["profile"])
+        except UpstreamUnavailable as e:
+            if job["attempts"] < JOB_MAX_ATTEMPTS:
+                delay = e.retry_after if e.retry_after is not None else GEMINI_BREAKER_COOLDOWN
+                logger.warning("Job deferred: %s", e, extra={"job_id": job["id"], "delay": round(delay, 1)})
+                await run_blocking(self.queue.retry, job["id"], delay, str(e))
+                self._outcomes["retried"] += 1
+                return
+            await self._finish(job, error=str(e))
+        except Exception as e:
+            logger.exception("Job failed", extra={"job_id": job["id"]})
+            await self._finish(job, error=str(e))
+        else:
+            await self._finish(job, result=result)
+
+    async def _finish(self, job: dict, result: dict = None, error: str = None):
+        await run_blocking(self.queue.finish, job["id"], result, error)
+        self._outcomes["failed" if error is not None else "done"] += 1
+        if job["callback_url"]:
+            await self._callback(job["callback_url"], await self.get(job["id"]))
+
+    async def _callback(self, url: str, payload: dict):
+        """
+        POSTs the finished job to the client's callback URL. One attempt;
+        the result stays available from GET /jobs/{id} either way. The URL is
+        checked again here: its DNS may have changed since submission.
+        Redirects are not followed.
+        """
+        try:
+            await run_blocking(check_callback_url, url)
+            async with httpx.AsyncClient(timeout=JOB_CALLBACK_TIMEOUT, follow_redirects=False) as client:
+                response = await client.post(url, json=payload)
+            if response.status_code >= 400:
+                logger.warning("Job callback rejected", extra={"job_id": payload["job_id"], "status": response.status_code})
+        except Exception as e:
+            logger.warning("Job callback failed: %s", e, extra={"job_id": payload["job_id"]})
+
+    def stats(self) -> dict:
+        """
+        Queue depth by status plus this process's worker utilization (share
+        of worker time spent running jobs since start).
+        """
+        counts = self.queue.counts()
+        now = time.monotonic()
+        busy_seconds = self._busy_seconds + sum(now - t for t in list(self._busy.values()))
+        capacity = self.workers * (now - self._started_at) if self._started_at else 0
+        return {
+            "backend": type(self.queue).__name__,
+            "queue_depth": counts["queued"],
+            "jobs": counts,
+            "workers": self.workers,
+            "workers_busy": len(self._busy),
+            "utilization": round(busy_seconds / capacity, 3) if capacity else None,
+            "processed": dict(self._outcomes)
+        }
+
+job_runner = JobRunner(make_job_queue())
+
+# =========================
+# METRICS
+# =========================
+
+JOB_WAIT_SECONDS = metrics.histogram(
+    "safebite_job_wait_seconds", "Time jobs spend queued before a worker picks them up."
+)
+
+def _job_metrics() -> list:
+    stats = job_runner.stats()
+    lines = []
+    for metric, kind, help_text, samples in (
+        ("safebite_jobs", "gauge", "Jobs by status.",
+         [f'{{status="{s}"}} {n}' for s, n in sorted(stats["jobs"].items())]),
+        ("safebite_job_workers", "gauge", "Job workers in this process.", [f" {stats['workers']}"]),
+        ("safebite_job_workers_busy", "gauge", "Job workers currently running a job.", [f" {stats['workers_busy']}"]),
+        ("safebite_jobs_processed_total", "counter", "Jobs finished by this process, by outcome.",
+         [f'{{outcome="{o}"}} {n}' for o, n in sorted(stats["processed"].items())]),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        lines += [f"{metric}{sample}" for sample in samples]
+    return lines
+
+metrics.add_collector(_job_metrics)
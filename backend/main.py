@@ -1,7 +1,9 @@
-from fastapi import FastAPI, UploadFile, File, Form
+from fastapi import FastAPI, UploadFile, File, Form, Request
 from pydantic import BaseModel
-from typing import List, Dict, Any
-import uuid
+from typing import List, Dict, Any, Optional
+import json
+import threading
+import time
 import traceback
 from dotenv import load_dotenv
 import os
@@ -9,23 +11,95 @@ import os
 # Load environment variables from .env file (Override system/terminal variables)
 load_dotenv(override=True)
 
+from .telemetry import HTTP_SECONDS, get_logger, metrics, span
+
+logger = get_logger(__name__)
+
 api_key = os.getenv("GEMINI_API_KEY")
-print(f"DEBUG: Loaded API Key starting with: {api_key[:10] if api_key else 'None'}...")
+logger.info("Gemini API key %s", "loaded" if api_key else "missing")
 
-from .ocr.ocr_engine import extract_text
-from .ocr.filter import filter_ingredient_text
-from .ocr.parser import parse_ingredients
-from .ml.predict import predict_ingredient
+from .pipeline import analyze_image, analyze_events
+from .batch import run_batch, collect_uploads, detach_upload
+from .jobs import job_runner, check_callback_url, InvalidCallback, QueueFull, JOB_MAX_IMAGE_BYTES
+from .gemini.explain_cache import explain_cached
+from .gemini.models import model_resolver
+from .gemini.knowledge import knowledge_base
+from .gemini.resilience import UpstreamUnavailable, GEMINI_BREAKER_COOLDOWN
+from .ml.registry import model_registry, ML_CLASSIFIER, ML_SIMILARITY, ML_WARMUP
 from .ml.risk_engine import calculate_risk_score
-from .gemini.explain import explain_with_gemini
+from .cache import cache_stats
+from .concurrency import run_blocking
 
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
 app = FastAPI(title="AI Snack Analyzer")
 
+@app.on_event("startup")
+async def resolve_models():
+    # Discover the best Gemini model once, off the request path
+    model_resolver.start()
+    # Load DistilBERT in the background; keyword-mode traffic is served meanwhile
+    if ML_WARMUP:
+        model_registry.start()
+    # Build the nearest-neighbour index off the request path too
+    if ML_SIMILARITY:
+        from .ml.similarity import get_similarity_index
+        threading.Thread(target=get_similarity_index, name="similarity-index", daemon=True).start()
+    # Background analysis workers for /jobs
+    job_runner.start()
+
+def preload_models():
+    """
+    Blocking version of the startup warm-up, for a pre-fork server
+    (gunicorn.conf.py): whatever is loaded here before the workers fork is
+    shared copy-on-write instead of loaded once per worker.
+    """
+    if ML_WARMUP:
+        try:
+            model_registry.get(wait=True)
+        except Exception:
+            pass  # logged by the registry; workers fall back to keywords
+    if ML_SIMILARITY:
+        from .ml.similarity import get_similarity_index
+        get_similarity_index()
+    if ML_CLASSIFIER == "student":
+        from .ml.student import get_student
+        get_student()
+
+@app.on_event("shutdown")
+async def stop_workers():
+    await job_runner.stop()
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "api_key_loaded": os.getenv("GEMINI_API_KEY") is not None}
+    return {
+        "status": "healthy",
+        "api_key_loaded": os.getenv("GEMINI_API_KEY") is not None,
+        "gemini": model_resolver.status(),
+        "ml": model_registry.status(),
+        "cache": cache_stats(),
+        "knowledge": knowledge_base.stats() if knowledge_base is not None else None,
+        "jobs": job_runner.stats()
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Route template, not the raw path, to keep label cardinality bounded
+    route = request.scope.get("route")
+    HTTP_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=response.status_code
+    )
+    return response
 
 app.add_middleware(
     CORSMiddleware,
@@ -42,69 +116,148 @@ app.add_middleware(
 class ReExplainRequest(BaseModel):
     ingredients_analysis: List[Dict[str, Any]]
     profile: str
+    # The analyzed label text; when sent, the risk score is recomputed for the new profile
+    ingredients_text: Optional[str] = None
+
+def _unavailable_response(e: UpstreamUnavailable) -> JSONResponse:
+    retry_after = e.retry_after if e.retry_after is not None else GEMINI_BREAKER_COOLDOWN
+    return JSONResponse(
+        {"error": "Label analysis is temporarily unavailable. Please try again shortly."},
+        status_code=503,
+        headers={"Retry-After": str(max(1, round(retry_after)))}
+    )
 
 @app.post("/analyze")
 async def analyze_snack(file: UploadFile = File(...), profile: str = Form("General")):
-    temp_path = f"temp_{uuid.uuid4()}.jpg"
-
     try:
-        # Save uploaded image
-        with open(temp_path, "wb") as f:
-            f.write(await file.read())
-
-        # OCR
-        print(f"DEBUG: Extracting text from {temp_path}...")
-        raw_text = extract_text(temp_path)
-        print(f"DEBUG: Raw OCR text: {raw_text[:100]}...")
-        
-        # Filter to get only ingredients
-        print("DEBUG: Filtering OCR text for ingredients...")
-        filtered_text = filter_ingredient_text(raw_text)
-        print(f"DEBUG: Filtered text: {filtered_text[:100]}...")
-
-        # Ingredient parsing (use filtered text)
-        parsed = parse_ingredients(filtered_text)
-        print(f"DEBUG: Parsed ingredients: {parsed}")
-
-        # ML inference
-        results = [predict_ingredient(i) for i in parsed["ingredients"]]
-        print(f"DEBUG: ML Results: {results}")
-
-        # Risk Calculation
-        risk_data = calculate_risk_score(filtered_text, results)
-        print(f"DEBUG: Risk Score: {risk_data}")
-
-        # Gemini explanation
-        print(f"DEBUG: Calling Gemini with profile '{profile}'...")
-        explanation = explain_with_gemini(results, profile)
-        print("DEBUG: Gemini response received.")
+        # Image stays in memory; OCR decodes it once ("save" is the upload read)
+        with span("save"):
+            image_bytes = await file.read()
 
-        return {
-            "extracted_text": filtered_text,
-            "ingredients_analysis": results,
-            "risk_score": risk_data["score"],
-            "risk_level": risk_data["level"],
-            "risk_breakdown": risk_data["breakdown"],
-            "explanation": explanation
-        }
+        return await analyze_image(image_bytes, profile)
+    except UpstreamUnavailable as e:
+        # Fail fast while Gemini is down instead of returning an empty analysis
+        logger.warning("Analysis rejected: %s", e)
+        return _unavailable_response(e)
     except Exception as e:
-        print("ERROR: Analysis failed")
-        traceback.print_exc()
+        logger.exception("Analysis failed")
         return {
             "error": str(e),
             "traceback": traceback.format_exc()
         }
 
+@app.post("/analyze/stream")
+async def analyze_snack_stream(file: UploadFile = File(...), profile: str = Form("General")):
+    """
+    Same pipeline as /analyze, streamed as NDJSON: one {"event": ..., ...} line
+    for the extracted text, then the ingredient analysis and risk score, then
+    the explanation (raw "explanation_delta" chunks while Gemini writes it,
+    followed by the parsed "explanation"), then "done" with timings.
+    Errors before the first line get the same status codes as /analyze;
+    later ones arrive as an "error" event.
+    """
+    with span("save"):
+        image_bytes = await file.read()
+
+    events = analyze_events(image_bytes, profile)
+    try:
+        # OCR runs before the response starts, so an outage still gets a 503
+        first = await events.__anext__()
+    except UpstreamUnavailable as e:
+        logger.warning("Analysis rejected: %s", e)
+        return _unavailable_response(e)
+    except Exception as e:
+        logger.exception("Analysis failed")
+        return {"error": str(e), "traceback": traceback.format_exc()}
+
+    async def lines():
+        event, data = first
+        try:
+            yield json.dumps({"event": event, **data}) + "\n"
+            async for event, data in events:
+                yield json.dumps({"event": event, **data}) + "\n"
+        except Exception as e:
+            logger.exception("Streamed analysis failed")
+            yield json.dumps({"event": "error", "error": str(e)}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...), profile: str = Form("General"), callback_url: str = Form(None)):
+    """
+    Queues an analysis and returns its id immediately. Poll GET /jobs/{job_id}
+    for the result, or pass callback_url to have the finished job POSTed to you.
+    """
+    if callback_url:
+        try:
+            await run_blocking(check_callback_url, callback_url)
+        except InvalidCallback as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+    with span("save"):
+        # Read at most one byte past the limit; queued images stay in memory or SQLite
+        image_bytes = await file.read(JOB_MAX_IMAGE_BYTES + 1)
+    if not image_bytes:
+        return JSONResponse({"error": "Empty or unreadable upload"}, status_code=400)
+    if len(image_bytes) > JOB_MAX_IMAGE_BYTES:
+        return JSONResponse({"error": f"Image exceeds the {JOB_MAX_IMAGE_BYTES} byte limit"}, status_code=413)
+
+    try:
+        job_id = await job_runner.submit(image_bytes, profile, callback_url)
+    except QueueFull as e:
+        logger.warning("Job rejected: %s", e)
+        return JSONResponse(
+            {"error": "Too many queued analyses. Please try again shortly."},
+            status_code=503,
+            headers={"Retry-After": "30"}
+        )
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+@app.get("/jobs/stats")
+async def job_stats():
+    return job_runner.stats()
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_runner.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+    return job
+
+@app.post("/analyze-batch")
+async def analyze_batch(files: List[UploadFile] = File(...), profile: str = Form("General")):
+    """
+    Analyzes many label images in one request. Accepts any mix of image files and
+    zip/tar archives of images. Results are streamed back as NDJSON, one line per
+    image in completion order, followed by a summary line.
+    """
+    uploads = [(f.filename or f"upload_{i}", await run_blocking(detach_upload, f.file)) for i, f in enumerate(files)]
+    return StreamingResponse(
+        run_batch(collect_uploads(uploads), profile),
+        media_type="application/x-ndjson"
+    )
+
 @app.post("/re-explain")
 async def re_explain(request: ReExplainRequest):
     """
     Re-generates the Gemini explanation for an existing analysis based on a new profile.
-    Does NOT re-run OCR or ML predictions.
+    Does NOT re-run OCR or ML predictions. Identical (analysis, profile) pairs are
+    served from cache, and concurrent duplicates share one Gemini call.
+    Scores are profile-weighted, so when ingredients_text is sent the risk score,
+    level and breakdown are recomputed for the new profile as well.
     """
     try:
-        print(f"DEBUG: Re-explaining for profile '{request.profile}'...")
-        new_explanation = explain_with_gemini(request.ingredients_analysis, request.profile)
-        return {"explanation": new_explanation}
+        logger.debug("Re-explaining for profile %r", request.profile)
+        new_explanation = await explain_cached(request.ingredients_analysis, request.profile)
+        response = {"explanation": new_explanation}
+        if request.ingredients_text is not None:
+            risk_data = calculate_risk_score(request.ingredients_text, request.ingredients_analysis, request.profile)
+            response.update({
+                "risk_score": risk_data["score"],
+                "risk_level": risk_data["level"],
+                "risk_breakdown": risk_data["breakdown"]
+            })
+        return response
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Re-explain failed")
         return {"error": str(e)}
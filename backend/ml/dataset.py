@@ -1,18 +1,202 @@
-from datasets import load_dataset
-from .model import tokenizer
-
-dataset = load_dataset(
-    "json",
-    data_files={
-        "train": "D:\\snack-analyzer\\data\\processed\\ingredient_risk.json"
-    }
+import functools
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from .model import get_tokenizer
+from ..telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# Shards written by generate_ingredient_risk_dataset.py
+DATASET_PATH = os.getenv(
+    "ML_DATASET_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "..", "data", "processed", "ingredient_risk", "*.jsonl")
 )
+# Pre-tokenized training data (see TokenCache)
+TOKEN_CACHE_DIR = os.getenv("ML_TOKEN_CACHE_DIR", "data/processed/token_cache")
 
 def tokenize(batch):
-    return tokenizer(
+    return get_tokenizer()(
         batch["text"],
         padding=True,
         truncation=True
     )
 
-dataset = dataset.map(tokenize, batched=True)
+@functools.lru_cache(maxsize=None)
+def load_tokenized_dataset(path: str = DATASET_PATH):
+    """
+    Loads and tokenizes the training set on first call instead of at import.
+    """
+    from datasets import load_dataset
+
+    dataset = load_dataset(
+        "json",
+        data_files={
+            "train": path
+        }
+    )
+    return dataset.map(tokenize, batched=True)
+
+def __getattr__(name):
+    # `from .dataset import dataset` keeps working, lazily
+    if name == "dataset":
+        return load_tokenized_dataset()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# =========================
+# TOKEN CACHE
+# =========================
+
+def iter_labeled_rows(paths: list):
+    """
+    (text, label) pairs from dataset shards: JSONL, or Parquet when pyarrow
+    is installed (generate_ingredient_risk_dataset.py --format parquet).
+    """
+    for path in paths:
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+
+            table = pq.read_table(path, columns=["text", "label"])
+            yield from zip(table.column("text").to_pylist(), table.column("label").to_pylist())
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    yield row["text"], row["label"]
+
+def _fingerprint(paths: list, tokenizer_id: str, max_length: int, max_rows: int = 0) -> str:
+    h = hashlib.sha256(f"{tokenizer_id}|{max_length}|{max_rows}".encode())
+    for path in paths:
+        st = os.stat(path)
+        h.update(f"|{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+class TokenCache:
+    """
+    Tokenized dataset on disk: the token ids of every row concatenated into
+    one int32 file, with row offsets and labels beside it. Arrays are
+    memory-mapped on first access, so DataLoader workers share the page cache
+    instead of each holding a copy, and rows are only tokenized again when
+    the shards, tokenizer or max length change. No padding is stored;
+    batches are padded to their own longest row.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self._arrays = None
+
+    def _open(self):
+        if self._arrays is None:
+            self._arrays = (
+                np.memmap(os.path.join(self.directory, "tokens.bin"), dtype=np.int32, mode="r"),
+                np.load(os.path.join(self.directory, "offsets.npy"), mmap_mode="r"),
+                np.load(os.path.join(self.directory, "labels.npy"), mmap_mode="r")
+            )
+        return self._arrays
+
+    def __getstate__(self):
+        # Workers reopen the maps instead of receiving pickled copies
+        return {"directory": self.directory, "meta": self.meta, "_arrays": None}
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    @property
+    def tokens(self):
+        return self._open()[0]
+
+    @property
+    def offsets(self):
+        return self._open()[1]
+
+    @property
+    def labels(self):
+        return self._open()[2]
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def row(self, i: int) -> np.ndarray:
+        return self.tokens[self.offsets[i]:self.offsets[i + 1]]
+
+    @classmethod
+    def build(cls, paths: list, directory: str, tokenizer, tokenizer_id: str, max_length: int,
+              max_rows: int = 0, chunk: int = 10000) -> "TokenCache":
+        """
+        Streams the shards through the fast tokenizer chunk by chunk and
+        writes the cache into a temporary directory that replaces `directory`
+        once complete.
+        """
+        start = time.perf_counter()
+        tmp = f"{directory}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        lengths, labels = [], []
+        rows = iter_labeled_rows(paths)
+        with open(os.path.join(tmp, "tokens.bin"), "wb") as out:
+            while True:
+                batch = []
+                for text, label in rows:
+                    batch.append((text, label))
+                    if len(batch) >= chunk or (max_rows and len(labels) + len(batch) >= max_rows):
+                        break
+                if not batch:
+                    break
+                ids = tokenizer([t for t, _ in batch], truncation=True, max_length=max_length)["input_ids"]
+                for row in ids:
+                    out.write(np.asarray(row, dtype=np.int32).tobytes())
+                lengths.extend(len(row) for row in ids)
+                labels.extend(int(l) for _, l in batch)
+                if max_rows and len(labels) >= max_rows:
+                    break
+
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        np.save(os.path.join(tmp, "offsets.npy"), offsets)
+        np.save(os.path.join(tmp, "labels.npy"), np.asarray(labels, dtype=np.int8))
+        meta = {
+            "fingerprint": _fingerprint(paths, tokenizer_id, max_length, max_rows),
+            "rows": len(labels),
+            "tokens": int(offsets[-1]),
+            "max_length": max_length,
+            "pad_token_id": tokenizer.pad_token_id,
+            "shards": len(paths)
+        }
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp, directory)
+        logger.info("Token cache built", extra={
+            "rows": meta["rows"], "tokens": meta["tokens"], "seconds": round(time.perf_counter() - start, 1)
+        })
+        return cls(directory)
+
+def load_token_cache(path: str = DATASET_PATH, directory: str = TOKEN_CACHE_DIR, tokenizer=None,
+                     tokenizer_id: str = "", max_length: int = 32, max_rows: int = 0,
+                     rebuild: bool = False) -> TokenCache:
+    """
+    Returns the cache for these shards, building it if it is missing or stale.
+    """
+    paths = sorted(glob.glob(path))
+    if not paths:
+        raise FileNotFoundError(f"No dataset shards match {path}")
+
+    fingerprint = _fingerprint(paths, tokenizer_id, max_length, max_rows)
+    if not rebuild and os.path.exists(os.path.join(directory, "meta.json")):
+        cache = TokenCache(directory)
+        if cache.meta.get("fingerprint") == fingerprint:
+            return cache
+        logger.info("Token cache is stale, rebuilding", extra={"directory": directory})
+    return TokenCache.build(paths, directory, tokenizer or get_tokenizer(), tokenizer_id, max_length, max_rows)
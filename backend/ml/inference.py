@@ -0,0 +1,153 @@
+import os
+import time
+
+from ..telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# =========================
+# CONFIG
+# =========================
+
+ML_MODEL_PATH = os.getenv("ML_MODEL_PATH", os.path.join(os.path.dirname(__file__), "models", "final_model"))
+# fp32: plain PyTorch | int8: dynamic int8 quantization of Linear layers | onnx: ONNX Runtime
+ML_INFERENCE_BACKEND = os.getenv("ML_INFERENCE_BACKEND", "int8")
+# Ingredient names are short; capping the length keeps padded batches small
+ML_MAX_LENGTH = int(os.getenv("ML_MAX_LENGTH", "32"))
+ML_NUM_THREADS = int(os.getenv("ML_NUM_THREADS", "0"))  # 0 = library default
+
+# Labels from generate_ingredient_risk_dataset.py
+LABELS = {
+    0: "Safe",
+    1: "Moderate",
+    2: "Harmfull"  # Kept spelling to match frontend
+}
+
+# =========================
+# ENGINE
+# =========================
+
+class BertClassifier:
+    """
+    Batched DistilBERT ingredient classifier. A whole label is tokenized in
+    one fast-tokenizer call and classified in a single padded forward pass.
+    """
+
+    def __init__(self, path: str = ML_MODEL_PATH, backend: str = ML_INFERENCE_BACKEND,
+                 max_length: int = ML_MAX_LENGTH, model=None, onnx_path: str = None):
+        from transformers import DistilBertTokenizerFast
+
+        self.path = path
+        self.backend = backend
+        self.max_length = max_length
+        self.tokenizer = DistilBertTokenizerFast.from_pretrained(path)
+        self._session = None
+
+        if backend == "onnx":
+            self._session = self._load_onnx(model, onnx_path or os.path.join(path, "model.onnx"))
+            self.model = None
+        else:
+            self.model = self._load_torch(model)
+
+    def _load_torch(self, model=None):
+        import torch
+        from transformers import DistilBertForSequenceClassification
+
+        if ML_NUM_THREADS:
+            torch.set_num_threads(ML_NUM_THREADS)
+
+        # safetensors weights are memory-mapped rather than unpickled into fresh buffers
+        model = model or DistilBertForSequenceClassification.from_pretrained(self.path, use_safetensors=True)
+        model.eval()
+
+        if self.backend == "int8":
+            # Linear layers dominate DistilBERT on CPU; int8 weights cut latency and RAM
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def _load_onnx(self, model, onnx_path: str):
+        import onnxruntime as ort
+
+        if not os.path.exists(onnx_path):
+            export_onnx(self.path, onnx_path, model)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ML_NUM_THREADS:
+            options.intra_op_num_threads = ML_NUM_THREADS
+        return ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
+    def logits(self, texts: list):
+        """
+        Raw (n, 3) logits as a numpy array.
+        """
+        if self._session is not None:
+            import numpy as np
+
+            enc = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+            return self._session.run(["logits"], {
+                "input_ids": enc["input_ids"].astype(np.int64),
+                "attention_mask": enc["attention_mask"].astype(np.int64)
+            })[0]
+
+        import torch
+
+        enc = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="pt")
+        with torch.inference_mode():
+            return self.model(input_ids=enc["input_ids"], attention_mask=enc["attention_mask"]).logits.numpy()
+
+    def predict_batch(self, ingredients: list) -> list:
+        """
+        Same output shape as predict_ingredient, for every ingredient at once.
+        """
+        if not ingredients:
+            return []
+
+        import numpy as np
+
+        logits = self.logits(list(ingredients))
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        best = probs.argmax(axis=1)
+
+        return [
+            {
+                "ingredient": text,
+                "risk": LABELS[int(label)],
+                "confidence": round(float(probs[i, label]), 4),
+                "matches": [],
+                "nearest": None,
+                "similarity": 0.0
+            }
+            for i, (text, label) in enumerate(zip(ingredients, best))
+        ]
+
+def export_onnx(model_path: str, onnx_path: str, model=None):
+    """
+    Exports the checkpoint with dynamic batch and sequence axes.
+    """
+    import torch
+    from transformers import DistilBertForSequenceClassification
+
+    model = model or DistilBertForSequenceClassification.from_pretrained(model_path, use_safetensors=True)
+    model.eval()
+    dummy = torch.ones((1, 8), dtype=torch.long)
+
+    logger.info("Exporting ONNX model to %s", onnx_path)
+    start = time.perf_counter()
+    torch.onnx.export(
+        model,
+        (dummy, dummy),
+        onnx_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"}
+        },
+        opset_version=17,
+        dynamo=False
+    )
+    logger.info("ONNX export finished in %.1fs", time.perf_counter() - start)
@@ -0,0 +1,82 @@
+from collections import deque
+
+# =========================
+# AHO-CORASICK KEYWORD MATCHER
+# =========================
+
+class KeywordMatcher:
+    """
+    Finds every keyword occurring in a text in a single left-to-right pass.
+    The automaton is built once, so lookup cost depends on the text length,
+    not on how many keywords are loaded.
+    """
+
+    def __init__(self, keywords):
+        # keywords: iterable of keyword strings, or (keyword, tag) pairs
+        self.tags = {}
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for entry in keywords:
+            keyword, tag = entry if isinstance(entry, tuple) else (entry, None)
+            keyword = keyword.lower()
+            if not keyword or keyword in self.tags:
+                continue
+            self.tags[keyword] = tag
+            self._add(keyword)
+
+        self._build()
+
+    def _add(self, keyword):
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._out[node] = (keyword,)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                # Inherit the outputs of the fallback state so overlapping keywords are reported
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """
+        Returns the keywords found in text, in order of first occurrence.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        found = {}
+        node = 0
+        for ch in text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for keyword in out[node]:
+                found.setdefault(keyword, None)
+        return list(found)
+
+    def find_tagged(self, text):
+        """
+        Returns {tag: [keywords]} for every keyword found in text.
+        """
+        grouped = {}
+        for keyword in self.find(text):
+            grouped.setdefault(self.tags[keyword], []).append(keyword)
+        return grouped
+
+    def __len__(self):
+        return len(self.tags)
@@ -1,17 +1,38 @@
+import functools
 
-from transformers import DistilBertTokenizerFast, DistilBertForSequenceClassification
-import torch
+from .inference import ML_MODEL_PATH
 
-MODEL_PATH = "D:\\snack-analyzer\\backend\\ml\\models\\final_model"
+# Relocatable: set ML_MODEL_PATH to point at another checkpoint
+MODEL_PATH = ML_MODEL_PATH
 
-tokenizer = DistilBertTokenizerFast.from_pretrained(MODEL_PATH)
+# Nothing is loaded at import time. `tokenizer`, `model` and `DEVICE` are
+# still importable from this module and load on first access.
 
-model = DistilBertForSequenceClassification.from_pretrained(
-    MODEL_PATH
-)
+@functools.lru_cache(maxsize=None)
+def get_device():
+    import torch
 
-model.eval()
+    # Move to GPU if available
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-# Move to GPU if available
-DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model.to(DEVICE)
+@functools.lru_cache(maxsize=None)
+def get_tokenizer():
+    from transformers import DistilBertTokenizerFast
+
+    return DistilBertTokenizerFast.from_pretrained(MODEL_PATH)
+
+@functools.lru_cache(maxsize=None)
+def get_model():
+    from transformers import DistilBertForSequenceClassification
+
+    model = DistilBertForSequenceClassification.from_pretrained(MODEL_PATH, use_safetensors=True)
+    model.eval()
+    model.to(get_device())
+    return model
+
+_LAZY = {"tokenizer": get_tokenizer, "model": get_model, "DEVICE": get_device}
+
+def __getattr__(name):
+    if name in _LAZY:
+        return _LAZY[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,8 @@
-import re
+from .matcher import KeywordMatcher
+from .registry import model_registry, ML_CLASSIFIER, ML_SIMILARITY
+from ..telemetry import get_logger
+
+logger = get_logger(__name__)
 
 # =========================
 # KEYWORD-BASED CLASSIFIER (Lightweight for Deployment)
@@ -33,32 +37,89 @@ MODERATE_KEYWORDS = [
     "sodium", "salt"
 ]
 
+# Compiled once at import; harmful entries are added first so they win on duplicates
+KEYWORD_MATCHER = KeywordMatcher(
+    [(k, "Harmfull") for k in HARMFUL_KEYWORDS] +
+    [(k, "Moderate") for k in MODERATE_KEYWORDS]
+)
+
 def predict_ingredient(ingredient_text: str):
     """
     Predict risk category for a single ingredient using keyword matching.
     Replaces heavy ML model for lightweight deployment.
     """
-    text_lower = ingredient_text.lower()
+    hits = KEYWORD_MATCHER.find_tagged(ingredient_text)
     
     # Check Harmful
-    if any(k in text_lower for k in HARMFUL_KEYWORDS):
+    if "Harmfull" in hits:
         return {
             "ingredient": ingredient_text,
             "risk": "Harmfull",  # Kept spelling to match frontend
-            "confidence": 0.95
+            "confidence": 0.95,
+            "matches": hits["Harmfull"],
+            "nearest": None,
+            "similarity": 0.0
         }
         
     # Check Moderate
-    if any(k in text_lower for k in MODERATE_KEYWORDS):
+    if "Moderate" in hits:
         return {
             "ingredient": ingredient_text,
             "risk": "Moderate",
-            "confidence": 0.90
+            "confidence": 0.90,
+            "matches": hits["Moderate"],
+            "nearest": None,
+            "similarity": 0.0
         }
         
     # Default to Safe
     return {
         "ingredient": ingredient_text,
         "risk": "Safe",
-        "confidence": 0.85
+        "confidence": 0.85,
+        "matches": [],
+        "nearest": None,
+        "similarity": 0.0
     }
+
+# =========================
+# BATCH ENTRY POINT
+# =========================
+
+def predict_ingredients(ingredients: list, classifier: str = None) -> list:
+    """
+    Classifies every ingredient of a label at once with the configured classifier.
+    Falls back to keyword matching while the model is still loading, or if it
+    can't be loaded or run. Ingredients no keyword matches are looked up in the
+    similarity index in one batch, so misspellings still get a risk label.
+    Every classifier returns the same keys (matches, nearest, similarity
+    included), so the analysis payload doesn't change shape with ML_CLASSIFIER.
+    """
+    classifier = classifier or ML_CLASSIFIER
+    if classifier == "student" and ingredients:
+        from .student import get_student
+        student = get_student()
+        if student is not None:
+            return student.predict_batch(ingredients)
+
+    if classifier == "bert" and ingredients:
+        try:
+            bert = model_registry.get(wait=False)
+            if bert is not None:
+                return bert.predict_batch(ingredients)
+        except Exception as e:
+            logger.error("DistilBERT inference failed, using keywords: %s", e)
+
+    results = [predict_ingredient(i) for i in ingredients]
+
+    misses = [i for i, r in enumerate(results) if not r["matches"]]
+    if ML_SIMILARITY and misses:
+        try:
+            from .similarity import get_similarity_index
+            neighbours = get_similarity_index().classify([results[i]["ingredient"] for i in misses])
+            for i, result in zip(misses, neighbours):
+                results[i] = result
+        except Exception as e:
+            logger.error("Similarity lookup failed, keeping keyword results: %s", e)
+
+    return results
@@ -0,0 +1,109 @@
+import importlib.util
+import os
+import threading
+import time
+
+from .inference import ML_MODEL_PATH, ML_INFERENCE_BACKEND
+from ..telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# =========================
+# CONFIG
+# =========================
+
+# keyword: lightweight keyword matcher (default) | bert: batched DistilBERT engine (ml/inference.py)
+# | student: hashed n-gram model distilled from DistilBERT (ml/student.py)
+ML_CLASSIFIER = os.getenv("ML_CLASSIFIER", "keyword")
+# Load the model in a background thread at startup; defaults to on when the bert classifier is selected
+ML_WARMUP = os.getenv("ML_WARMUP", "1" if ML_CLASSIFIER == "bert" else "0") == "1"
+# Nearest-neighbour fallback for ingredients no keyword matches (ml/similarity.py, e.g. OCR typos like
+# "sodum benzoat"); it needs numpy, so it defaults to on only where numpy is installed
+ML_SIMILARITY = os.getenv("ML_SIMILARITY", "1" if importlib.util.find_spec("numpy") else "0") == "1"
+
+# =========================
+# REGISTRY
+# =========================
+
+class ModelRegistry:
+    """
+    Lazily loads the DistilBERT classifier once per process. Nothing is loaded
+    at import time: the first caller (or the startup warm-up) starts the load
+    in a background thread, and callers that don't want to wait get None until
+    the model is ready. A failed load is remembered instead of retried on
+    every request.
+    """
+
+    def __init__(self, path: str = ML_MODEL_PATH, backend: str = ML_INFERENCE_BACKEND):
+        self.path = path
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._thread = None
+        self._classifier = None
+        self._error = None
+        self._load_seconds = None
+
+    def _load(self):
+        # numpy/transformers are only needed once a model is actually loaded
+        from .inference import BertClassifier
+
+        logger.info("Loading DistilBERT", extra={"backend": self.backend, "path": self.path})
+        start = time.perf_counter()
+        try:
+            classifier = BertClassifier(self.path, self.backend)
+        except Exception as e:
+            logger.error("DistilBERT load failed: %s", e)
+            self._error = e
+        else:
+            self._classifier = classifier
+            self._load_seconds = round(time.perf_counter() - start, 2)
+            logger.info("DistilBERT ready", extra={"load_seconds": self._load_seconds})
+        finally:
+            self._loaded.set()
+
+    def start(self):
+        """
+        Starts loading in a background thread if no load has been started yet.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._load, name="model-registry", daemon=True)
+            self._thread.start()
+
+    def get(self, wait: bool = True, timeout: float = None):
+        """
+        Returns the loaded classifier. With wait=False returns None while the
+        model is still loading. Raises the load error if loading failed.
+        """
+        self.start()
+        if wait:
+            self._loaded.wait(timeout)
+        if self._error is not None:
+            raise self._error
+        return self._classifier
+
+    @property
+    def ready(self) -> bool:
+        return self._classifier is not None
+
+    def status(self) -> dict:
+        if self._error is not None:
+            state = "failed"
+        elif self._classifier is not None:
+            state = "ready"
+        elif self._thread is not None:
+            state = "loading"
+        else:
+            state = "idle"
+
+        return {
+            "classifier": ML_CLASSIFIER,
+            "backend": self.backend,
+            "state": state,
+            "load_seconds": self._load_seconds,
+            "error": str(self._error) if self._error is not None else None
+        }
+
+model_registry = ModelRegistry()
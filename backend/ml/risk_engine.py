@@ -1,63 +1,147 @@
+import json
+import os
 import re
 
-def calculate_risk_score(ingredients_text: str, ml_results: list) -> dict:
+# =========================
+# CONFIG
+# =========================
+
+# Scoring categories, their terms and weights, plus per-profile weight overrides
+RISK_CATEGORIES_PATH = os.getenv(
+    "RISK_CATEGORIES_PATH",
+    os.path.join(os.path.dirname(__file__), "data", "risk_categories.json")
+)
+
+# =========================
+# ENGINE
+# =========================
+
+def _trie_pattern(terms) -> str:
+    """
+    Regex for a set of terms with shared prefixes factored out ("su(?:gar|crose)"),
+    so the engine tries one branch per character instead of every term.
+    Optional suffixes are greedy: the longest term at a position wins.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+class RiskEngine:
+    """
+    Scores a label against a category index built once from the data file.
+    Every term is found in one regex pass over the lowercased text; the
+    harmful additive category reuses the classifier results instead of
+    reading the text.
+    """
+
+    def __init__(self, config: dict):
+        self.categories = config["categories"]
+        defaults = {c["name"]: c["weight"] for c in self.categories}
+        self._default_weights = defaults
+        self._profile_weights = {
+            name.lower(): {**defaults, **overrides} for name, overrides in config.get("profiles", {}).items()
+        }
+
+        # term -> categories it counts towards
+        self.index = {}
+        for category in self.categories:
+            for term in category.get("terms", []):
+                self.index.setdefault(term.lower(), []).append(category["name"])
+
+        # A lookahead tried at every position reports the longest term starting
+        # there, so each term also stands for the shorter terms it contains
+        # ("corn syrup" implies "syrup"). That finds exactly the terms a
+        # substring check would.
+        terms = list(self.index)
+        self._pattern = re.compile(f"(?=({_trie_pattern(terms)}))") if terms else None
+        self._implied = {t: [u for u in terms if u in t] for t in terms}
+
+        # (name, label, min_matches, classifier-based)
+        self._rules = [
+            (c["name"], c["label"], c.get("min_matches", 1), c.get("source") == "classifier")
+            for c in self.categories
+        ]
+
+    def find_terms(self, text: str) -> set:
+        """
+        Every index term occurring in text, from a single scan.
+        """
+        if self._pattern is None:
+            return set()
+        found = set()
+        for term in set(self._pattern.findall(text.lower())):
+            found.update(self._implied[term])
+        return found
+
+    @classmethod
+    def from_file(cls, path: str = RISK_CATEGORIES_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def weights(self, profile: str = None) -> dict:
+        if not profile:
+            return self._default_weights
+        return self._profile_weights.get(profile.lower(), self._default_weights)
+
+    def score(self, ingredients_text: str, ml_results: list, profile: str = None) -> dict:
+        weights = self.weights(profile)
+        score = 0
+        breakdown = []
+
+        counts = {}
+        for term in self.find_terms(ingredients_text):
+            for name in self.index[term]:
+                counts[name] = counts.get(name, 0) + 1
+
+        for name, label, needed, from_classifier in self._rules:
+            if from_classifier:
+                count = sum(1 for r in ml_results if r.get("risk") == "Harmfull")
+            else:
+                count = counts.get(name, 0)
+
+            if count >= needed:
+                score += weights[name]
+                breakdown.append(f"{label.format(count=count)} (+{weights[name]})")
+
+        # Cap score at 100
+        final_score = min(score, 100)
+
+        # Determine Level
+        if final_score <= 30:
+            level = "Safe"
+        elif final_score <= 60:
+            level = "Moderate"
+        else:
+            level = "High Risk"
+
+        return {
+            "score": final_score,
+            "level": level,
+            "breakdown": breakdown
+        }
+
+risk_engine = RiskEngine.from_file()
+
+def calculate_risk_score(ingredients_text: str, ml_results: list, profile: str = None) -> dict:
     """
-    Calculates a 0-100 risk score based on:
+    Calculates a 0-100 risk score based on (default weights):
     - Artificial preservatives (25%)
     - Excess sugar/sodium (20%)
     - Harmful additives (20%)
     - Allergens (15%)
     - Ultra-processing indicators (20%)
+    Weights can be overridden per profile in data/risk_categories.json.
     """
-    
-    score = 0
-    breakdown = []
-    
-    # 1. Artificial Preservatives (25%)
-    preservatives = ["benzoate", "sorbate", "nitrate", "nitrite", "bbq", "tbhq", "bha", "bht", "gallate", "metabisulfite"]
-    if any(p in ingredients_text.lower() for p in preservatives):
-        score += 25
-        breakdown.append("Contains Artificial Preservatives (+25)")
-        
-    # 2. Excess Sugar/Sodium/Fat (20%)
-    sugar_salt_fat = ["sugar", "syrup", "dextrose", "fructose", "sucrose", "maltodextrin", "sodium", "salt", "oil", "fat", "glucose", "cane", "corn syrup"]
-    # Check for presence and repetition
-    matches = [s for s in sugar_salt_fat if s in ingredients_text.lower()]
-    if len(matches) >= 2:
-        score += 20
-        breakdown.append("High Sugar/Sodium/Fat Content (+20)")
-
-    # 3. Harmful Additives (20%) - Based on ML results
-    harmful_count = sum(1 for r in ml_results if r["risk"] == "Harmfull")
-    if harmful_count > 0:
-        score += 20
-        breakdown.append(f"Contains {harmful_count} Harmful Additives (+20)")
-
-    # 4. Allergens (15%)
-    allergens = ["soy", "peanut", "milk", "gluten", "wheat", "egg", "fish", "shellfish", "nut", "dairy", "lactose", "casein"]
-    if any(a in ingredients_text.lower() for a in allergens):
-        score += 15
-        breakdown.append("Contains Common Allergens (+15)")
-
-    # 5. Ultra-processing indicators (20%)
-    processed = ["hydrolyzed", "isolate", "modified starch", "hydrogenated", "flavor", "colour", "color", "acid", "gum", "emulsifier", "stabilizer", "artificial", "extract"]
-    if any(p in ingredients_text.lower() for p in processed):
-        score += 20
-        breakdown.append("Ultra-processed Ingredients (+20)")
-
-    # Cap score at 100
-    final_score = min(score, 100)
-    
-    # Determine Level
-    if final_score <= 30:
-        level = "Safe"
-    elif final_score <= 60:
-        level = "Moderate"
-    else:
-        level = "High Risk"
-        
-    return {
-        "score": final_score,
-        "level": level,
-        "breakdown": breakdown
-    }
+    return risk_engine.score(ingredients_text, ml_results, profile)
@@ -0,0 +1,272 @@
+import glob
+import json
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from ..telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# =========================
+# CONFIG
+# =========================
+
+# Labeled vocabulary: dataset shards (JSONL "text"/"label") or a "name<TAB>risk" file; defaults to the
+# dataset from generate_ingredient_risk_dataset.py when present, else the keyword lists
+ML_SIMILARITY_VOCAB = os.getenv("ML_SIMILARITY_VOCAB", "")
+ML_SIMILARITY_MAX_VOCAB = int(os.getenv("ML_SIMILARITY_MAX_VOCAB", "200000"))
+# Cosine similarity a neighbour needs before its label is used; below ~0.75 ordinary ingredients
+# start picking up labels from look-alikes ("calcium citrate" vs "sodium citrate")
+ML_SIMILARITY_THRESHOLD = float(os.getenv("ML_SIMILARITY_THRESHOLD", "0.75"))
+ML_SIMILARITY_DIM = int(os.getenv("ML_SIMILARITY_DIM", "1024"))
+# exact: one matrix product over the whole vocabulary | ivf: probe the nearest clusters only
+# (faster on large vocabularies, slightly lower recall) | auto: ivf from 50k names
+ML_SIMILARITY_INDEX = os.getenv("ML_SIMILARITY_INDEX", "exact")
+ML_SIMILARITY_NPROBE = int(os.getenv("ML_SIMILARITY_NPROBE", "8"))
+
+NGRAM_SIZES = (2, 3, 4)
+# Shorter words are too ambiguous to look up on their own
+MIN_WORD_LENGTH = 4
+IVF_MIN_VOCAB = 50000
+
+# Same ids as the DistilBERT head (see inference.LABELS)
+RISK_IDS = {"Safe": 0, "Moderate": 1, "Harmfull": 2}
+RISK_NAMES = {v: k for k, v in RISK_IDS.items()}
+
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+
+# =========================
+# EMBEDDING
+# =========================
+
+def normalize_name(text: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", str(text).lower()).split())
+
+def ngram_hashes(texts: list, dim: int, sizes: tuple = NGRAM_SIZES):
+    """
+    (row, bucket) pairs for every character n-gram of every text, with word
+    boundaries marked. crc32 keeps the hashing stable across processes.
+    """
+    rows, cols = [], []
+    for r, text in enumerate(texts):
+        padded = f" {normalize_name(text)} "
+        for n in sizes:
+            for i in range(len(padded) - n + 1):
+                cols.append(zlib.crc32(padded[i:i + n].encode()) % dim)
+                rows.append(r)
+    return np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+
+def embed(texts: list, dim: int = ML_SIMILARITY_DIM, chunk: int = 4096) -> np.ndarray:
+    """
+    Hashed character n-gram vectors (2-4 grams), L2-normalized so a dot
+    product is the cosine similarity.
+    """
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for start in range(0, len(texts), chunk):
+        rows, cols = ngram_hashes(texts[start:start + chunk], dim)
+        size = min(chunk, len(texts) - start)
+        out[start:start + size] = np.bincount(rows * dim + cols, minlength=size * dim).reshape(size, dim)
+
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    np.divide(out, norms, out=out, where=norms > 0)
+    return out
+
+# =========================
+# INDEX
+# =========================
+
+class SimilarityIndex:
+    """
+    Labeled ingredient vocabulary as a (names x dim) matrix. A whole label is
+    looked up with one matrix product and a top-k partition. For large
+    vocabularies an IVF index (spherical k-means clusters) restricts the
+    product to the clusters nearest to the label's ingredients.
+    """
+
+    def __init__(self, names: list, risks: list, dim: int = ML_SIMILARITY_DIM, index: str = ML_SIMILARITY_INDEX):
+        self.names = list(names)
+        self.risks = np.asarray([RISK_IDS[r] for r in risks], dtype=np.int8)
+        self.dim = dim
+        self.matrix = embed(self.names, dim)
+        self._centroids = None
+        self._members = None
+
+        if index == "ivf" or (index == "auto" and len(self.names) >= IVF_MIN_VOCAB):
+            self._build_ivf()
+
+    def __len__(self):
+        return len(self.names)
+
+    def _build_ivf(self, iterations: int = 6, seed: int = 0):
+        n = len(self.names)
+        clusters = max(1, int(2 * np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        centroids = self.matrix[rng.choice(n, clusters, replace=False)].copy()
+
+        # Train on a sample; assigning the full matrix happens once at the end
+        sample = self.matrix[rng.choice(n, min(n, 30 * clusters), replace=False)]
+        for _ in range(iterations):
+            assign = (sample @ centroids.T).argmax(axis=1)
+            order = np.argsort(assign, kind="stable")
+            used, starts = np.unique(assign[order], return_index=True)
+            sums = np.add.reduceat(sample[order], starts, axis=0)
+            centroids[used] = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+
+        assign = np.concatenate([
+            (self.matrix[i:i + 8192] @ centroids.T).argmax(axis=1) for i in range(0, n, 8192)
+        ])
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(clusters + 1))
+        self._centroids = centroids
+        self._members = [order[bounds[c]:bounds[c + 1]] for c in range(clusters)]
+
+    def _candidates(self, queries: np.ndarray, nprobe: int):
+        if self._centroids is None:
+            return None
+        nprobe = min(nprobe, len(self._centroids))
+        probed = np.argpartition(-(queries @ self._centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        return np.concatenate([self._members[c] for c in np.unique(probed)])
+
+    def query(self, texts: list, k: int = 5, nprobe: int = ML_SIMILARITY_NPROBE):
+        """
+        Top-k neighbours for every text at once. Returns (indices, scores),
+        both (len(texts), k), best first. Indices are -1 where fewer than
+        k candidates exist.
+        """
+        queries = embed(texts, self.dim)
+        candidates = self._candidates(queries, nprobe)
+        matrix = self.matrix if candidates is None else self.matrix[candidates]
+
+        scores = queries @ matrix.T
+        k_eff = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k_eff - 1, axis=1)[:, :k_eff]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        if candidates is not None:
+            top = candidates[top]
+
+        if k_eff < k:
+            pad = k - k_eff
+            top = np.pad(top, ((0, 0), (0, pad)), constant_values=-1)
+            top_scores = np.pad(top_scores, ((0, 0), (0, pad)), constant_values=0)
+        return top, top_scores
+
+    def classify(self, texts: list, threshold: float = ML_SIMILARITY_THRESHOLD, k: int = 5) -> list:
+        """
+        Nearest known ingredient for each text. Each text is looked up whole
+        and word by word (so "sodum benzoat" reaches "benzoate"), all in one
+        query. Neighbours that only add words to the lookup ("potassium" vs
+        "potassium citrate", "corn" vs "corn oil") are skipped: the missing
+        words are what make them risky. A neighbour at or above the threshold
+        lends its risk label with its similarity as confidence; otherwise the
+        text is Safe, with confidence 1 - similarity of the closest risky
+        neighbour.
+        """
+        if not texts:
+            return []
+
+        queries, owners = [], []
+        for i, text in enumerate(texts):
+            name = normalize_name(text)
+            words = [w for w in name.split() if len(w) >= MIN_WORD_LENGTH] if " " in name else []
+            for q in [name] + words:
+                queries.append(q)
+                owners.append(i)
+        owners = np.asarray(owners)
+
+        top, scores = self.query(queries, k)
+        results = []
+        for i, text in enumerate(texts):
+            best, similarity, closest_risky = -1, 0.0, 0.0
+            for row in np.flatnonzero(owners == i):
+                words = set(queries[row].split())
+                for j, score in zip(top[row].tolist(), scores[row].tolist()):
+                    if j < 0 or words < set(self.names[j].split()):
+                        continue
+                    if score > similarity:
+                        best, similarity = j, score
+                    if self.risks[j] > 0:
+                        closest_risky = max(closest_risky, score)
+            if best >= 0 and similarity >= threshold:
+                risk, confidence = RISK_NAMES[int(self.risks[best])], similarity
+            else:
+                risk, confidence = "Safe", 1.0 - closest_risky
+            results.append({
+                "ingredient": text,
+                "risk": risk,
+                "confidence": round(confidence, 4),
+                "matches": [],
+                "nearest": self.names[best] if best >= 0 else None,
+                "similarity": round(similarity, 4)
+            })
+        return results
+
+# =========================
+# VOCABULARY
+# =========================
+
+def load_vocabulary(path: str = ML_SIMILARITY_VOCAB, limit: int = ML_SIMILARITY_MAX_VOCAB):
+    """
+    Returns (names, risks). Reads dataset shards (a glob of JSONL with "text"
+    and "label") or a "name<TAB>risk" file; with no path, uses the dataset
+    shards if they exist and the keyword lists otherwise. Names are
+    deduplicated after normalization; the first label seen wins.
+    """
+    from .dataset import DATASET_PATH
+    from .predict import HARMFUL_KEYWORDS, MODERATE_KEYWORDS
+
+    paths = sorted(glob.glob(path or DATASET_PATH))
+    vocab = {}
+    for p in paths:
+        with open(p, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith("{"):
+                    row = json.loads(line)
+                    name, risk = row.get("text", ""), RISK_NAMES.get(row.get("label"))
+                else:
+                    name, _, risk = line.partition("\t")
+                key = normalize_name(name)
+                if key and risk in RISK_IDS and key not in vocab:
+                    vocab[key] = risk
+                    if len(vocab) >= limit:
+                        break
+        if len(vocab) >= limit:
+            break
+
+    # Keyword terms are always included so typos of them are caught
+    for k in HARMFUL_KEYWORDS:
+        vocab.setdefault(normalize_name(k), "Harmfull")
+    for k in MODERATE_KEYWORDS:
+        vocab.setdefault(normalize_name(k), "Moderate")
+    return list(vocab), list(vocab.values())
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_similarity_index() -> SimilarityIndex:
+    """
+    Builds the process-wide index on first use (or at startup, see main.py).
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                start = time.perf_counter()
+                names, risks = load_vocabulary()
+                _index = SimilarityIndex(names, risks)
+                logger.info("Similarity index ready", extra={
+                    "names": len(_index),
+                    "ivf": _index._centroids is not None,
+                    "seconds": round(time.perf_counter() - start, 2)
+                })
+    return _index
@@ -0,0 +1,256 @@
+"""
+Tiny ingredient classifier distilled from the DistilBERT teacher: a softmax
+regression over hashed character n-grams, stored as one small .npz file.
+
+    python -m backend.ml.student --input "data/processed/ingredient_risk/*.jsonl"
+
+Serve it with ML_CLASSIFIER=student.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+from .inference import LABELS, ML_MODEL_PATH
+from .similarity import NGRAM_SIZES, ngram_hashes
+from ..telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# =========================
+# CONFIG
+# =========================
+
+ML_STUDENT_PATH = os.getenv("ML_STUDENT_PATH", os.path.join(os.path.dirname(__file__), "models", "student.npz"))
+# Hash buckets; the artifact is dim x 3 float32 weights
+ML_STUDENT_DIM = int(os.getenv("ML_STUDENT_DIM", str(2 ** 16)))
+
+# =========================
+# MODEL
+# =========================
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=1, keepdims=True)
+    p = np.exp(z)
+    return p / p.sum(axis=1, keepdims=True)
+
+def featurize(texts: list, dim: int, sizes: tuple = NGRAM_SIZES):
+    """
+    Sparse L2-normalized n-gram counts in CSR form: (indptr, cols, vals).
+    """
+    rows, cols = ngram_hashes(texts, dim, sizes)
+    keys, counts = np.unique(rows * dim + cols, return_counts=True)
+    rows, cols = keys // dim, keys % dim
+    vals = counts.astype(np.float32)
+    norms = np.sqrt(np.bincount(rows, weights=vals ** 2, minlength=len(texts)))
+    vals /= np.maximum(norms[rows], 1e-12).astype(np.float32)
+    indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(texts)), out=indptr[1:])
+    return indptr, cols, vals
+
+class StudentClassifier:
+    """
+    Logits are a sum of per-n-gram weight rows, so a whole ingredient list is
+    one hashing pass and a few bincounts; there is no tokenizer or framework
+    to load.
+    """
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, sizes: tuple = NGRAM_SIZES):
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.dim = weights.shape[0]
+        self.sizes = tuple(int(n) for n in sizes)
+
+    @classmethod
+    def load(cls, path: str = ML_STUDENT_PATH) -> "StudentClassifier":
+        with np.load(path) as f:
+            return cls(f["weights"], f["bias"], tuple(f["ngram_sizes"]))
+
+    def save(self, path: str = ML_STUDENT_PATH, **meta):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez_compressed(tmp, weights=self.weights, bias=self.bias,
+                            ngram_sizes=np.asarray(self.sizes), **{k: np.asarray(v) for k, v in meta.items()})
+        os.replace(tmp, path)
+
+    def _logits_csr(self, indptr, cols, vals) -> np.ndarray:
+        n = len(indptr) - 1
+        rows = np.repeat(np.arange(n), np.diff(indptr))
+        out = np.empty((n, self.weights.shape[1]), dtype=np.float32)
+        for k in range(out.shape[1]):
+            out[:, k] = np.bincount(rows, weights=self.weights[cols, k] * vals, minlength=n)
+        return out + self.bias
+
+    def logits(self, texts: list) -> np.ndarray:
+        return self._logits_csr(*featurize(texts, self.dim, self.sizes))
+
+    def predict_batch(self, ingredients: list) -> list:
+        """
+        Same output shape as BertClassifier.predict_batch.
+        """
+        if not ingredients:
+            return []
+
+        probs = _softmax(self.logits(list(ingredients)))
+        best = probs.argmax(axis=1)
+        return [
+            {
+                "ingredient": text,
+                "risk": LABELS[int(label)],
+                "confidence": round(float(probs[i, label]), 4),
+                "matches": [],
+                "nearest": None,
+                "similarity": 0.0
+            }
+            for i, (text, label) in enumerate(zip(ingredients, best))
+        ]
+
+_student = None
+_student_error = None
+_student_lock = threading.Lock()
+
+def get_student():
+    """
+    Loads ML_STUDENT_PATH once. Returns None (and logs once) if the artifact
+    is missing or unreadable, so callers can fall back to keywords.
+    """
+    global _student, _student_error
+    if _student is None and _student_error is None:
+        with _student_lock:
+            if _student is None and _student_error is None:
+                start = time.perf_counter()
+                try:
+                    _student = StudentClassifier.load(ML_STUDENT_PATH)
+                except Exception as e:
+                    _student_error = e
+                    logger.error("Student classifier unavailable, using keywords: %s", e)
+                else:
+                    logger.info("Student classifier ready", extra={
+                        "path": ML_STUDENT_PATH, "load_ms": round((time.perf_counter() - start) * 1000, 1)
+                    })
+    return _student
+
+# =========================
+# DISTILLATION
+# =========================
+
+def teacher_logits(texts: list, teacher, batch_size: int = 256) -> np.ndarray:
+    out = []
+    for i in range(0, len(texts), batch_size):
+        out.append(teacher.logits(texts[i:i + batch_size]))
+    return np.concatenate(out).astype(np.float32)
+
+def distill(texts: list, labels: np.ndarray, soft_logits: np.ndarray = None, dim: int = ML_STUDENT_DIM,
+            epochs: int = 8, batch_size: int = 256, lr: float = 0.05, temperature: float = 2.0,
+            alpha: float = 0.7, weight_decay: float = 1e-6, seed: int = 0) -> StudentClassifier:
+    """
+    Trains the student with Adam on alpha * T^2 * KL(teacher || student) at
+    temperature T plus (1 - alpha) * cross-entropy on the hard labels.
+    Without teacher logits it is plain cross-entropy training.
+    """
+    n, classes = len(texts), len(LABELS)
+    if soft_logits is None:
+        alpha = 0.0
+    labels = np.asarray(labels, dtype=np.int64)
+    indptr, cols, vals = featurize(texts, dim)
+    soft = _softmax(soft_logits / temperature) if soft_logits is not None else None
+    hard = np.eye(classes, dtype=np.float32)[labels]
+
+    student = StudentClassifier(np.zeros((dim, classes), np.float32), np.zeros(classes, np.float32))
+    m_w, v_w = np.zeros_like(student.weights), np.zeros_like(student.weights)
+    m_b, v_b = np.zeros_like(student.bias), np.zeros_like(student.bias)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    rng = np.random.default_rng(seed)
+    step = 0
+
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        loss_sum = 0.0
+        for batch in np.array_split(rng.permutation(n), max(1, n // batch_size)):
+            # Gather the batch's CSR rows
+            starts, ends = indptr[batch], indptr[batch + 1]
+            lengths = ends - starts
+            b_indptr = np.zeros(len(batch) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=b_indptr[1:])
+            take = np.repeat(starts - b_indptr[:-1], lengths) + np.arange(b_indptr[-1])
+            b_cols, b_vals = cols[take], vals[take]
+
+            z = student._logits_csr(b_indptr, b_cols, b_vals)
+            p = _softmax(z)
+            grad = (1 - alpha) * (p - hard[batch])
+            loss = -(1 - alpha) * np.log(p[np.arange(len(batch)), labels[batch]] + 1e-12).mean()
+            if alpha:
+                p_t = _softmax(z / temperature)
+                q = soft[batch]
+                grad += alpha * temperature * (p_t - q)
+                loss += alpha * temperature ** 2 * (q * (np.log(q + 1e-12) - np.log(p_t + 1e-12))).sum(axis=1).mean()
+            grad /= len(batch)
+            loss_sum += float(loss) * len(batch)
+
+            # Sparse rows of X^T @ grad, accumulated per class
+            b_rows = np.repeat(np.arange(len(batch)), lengths)
+            g_w = np.empty_like(student.weights)
+            for k in range(classes):
+                g_w[:, k] = np.bincount(b_cols, weights=b_vals * grad[b_rows, k], minlength=dim)
+            g_w += weight_decay * student.weights
+            g_b = grad.sum(axis=0)
+
+            step += 1
+            for param, g, m, v in ((student.weights, g_w, m_w, v_w), (student.bias, g_b, m_b, v_b)):
+                m *= beta1
+                m += (1 - beta1) * g
+                v *= beta2
+                v += (1 - beta2) * g * g
+                param -= lr * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+
+        logger.info("Student epoch finished", extra={
+            "epoch": epoch + 1, "loss": round(loss_sum / n, 4), "seconds": round(time.perf_counter() - start, 2)
+        })
+    return student
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+
+    from .dataset import DATASET_PATH, iter_labeled_rows
+
+    parser = argparse.ArgumentParser(description="Distill the DistilBERT classifier into a hashed n-gram student")
+    parser.add_argument("--input", default=DATASET_PATH, help="Glob of dataset shards (*.jsonl or *.parquet)")
+    parser.add_argument("--teacher", default=ML_MODEL_PATH, help="Teacher checkpoint; hard labels only if it can't be loaded")
+    parser.add_argument("--output", default=ML_STUDENT_PATH)
+    parser.add_argument("--dim", type=int, default=ML_STUDENT_DIM)
+    parser.add_argument("--epochs", type=int, default=8)
+    parser.add_argument("--temperature", type=float, default=2.0)
+    parser.add_argument("--alpha", type=float, default=0.7, help="Weight of the teacher term vs the hard labels")
+    parser.add_argument("--max-rows", type=int, default=0, help="Use the first N rows only (0 = all)")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.input))
+    if not paths:
+        parser.error(f"No dataset shards match {args.input}")
+    rows = {}
+    for text, label in iter_labeled_rows(paths):
+        rows.setdefault(text, label)
+        if args.max_rows and len(rows) >= args.max_rows:
+            break
+    texts, labels = list(rows), np.fromiter(rows.values(), dtype=np.int64, count=len(rows))
+
+    soft = None
+    try:
+        from .inference import BertClassifier
+
+        started = time.perf_counter()
+        soft = teacher_logits(texts, BertClassifier(args.teacher, "int8"))
+        print(f"Teacher logits for {len(texts)} rows in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        print(f"Teacher unavailable ({e}); training on hard labels only")
+
+    started = time.perf_counter()
+    student = distill(texts, labels, soft, args.dim, args.epochs, temperature=args.temperature, alpha=args.alpha)
+    student.save(args.output, teacher=args.teacher if soft is not None else "", rows=len(texts))
+    accuracy = float((student.logits(texts).argmax(axis=1) == labels).mean())
+    print(f"Student trained in {time.perf_counter() - started:.1f}s, train accuracy {accuracy:.3f}, "
+          f"{os.path.getsize(args.output) / 1024:.0f} KB -> {args.output}")
@@ -0,0 +1,271 @@
+"""
+Fine-tunes DistilBERT on the ingredient risk dataset and exports the
+checkpoint where the model registry loads it from (ML_MODEL_PATH).
+
+    python -m backend.ml.train --epochs 2
+    python -m backend.ml.train --input "data/processed/ingredient_risk/*.jsonl" --workers 4 --batch-size 128
+
+Rows are tokenized once into a memory-mapped cache (dataset.TokenCache);
+batches are drawn from length buckets and padded to their own longest row.
+"""
+
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from .dataset import DATASET_PATH, TOKEN_CACHE_DIR, load_token_cache
+from .inference import LABELS, ML_MAX_LENGTH, ML_MODEL_PATH
+from ..telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# =========================
+# CONFIG
+# =========================
+
+# Checkpoint (hub id or directory) fine-tuning starts from
+ML_TRAIN_BASE_MODEL = os.getenv("ML_TRAIN_BASE_MODEL", "distilbert-base-uncased")
+
+# =========================
+# BATCHING
+# =========================
+
+class BucketBatchSampler:
+    """
+    Yields batches of row indices with similar lengths. Shuffled indices are
+    cut into pools of `pool_batches` batches, each pool is sorted by length
+    and split into batches, and the batch order is shuffled again, so every
+    epoch sees different batches while padding stays close to zero.
+    """
+
+    def __init__(self, lengths: np.ndarray, indices: np.ndarray, batch_size: int,
+                 shuffle: bool = True, bucketing: bool = True, pool_batches: int = 100, seed: int = 0):
+        self.lengths = lengths
+        self.indices = indices
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.bucketing = bucketing
+        self.pool = batch_size * pool_batches
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __len__(self):
+        return (len(self.indices) + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        rng = np.random.default_rng(self.seed + self.epoch)
+        indices = rng.permutation(self.indices) if self.shuffle else self.indices
+
+        batches = []
+        for start in range(0, len(indices), self.pool):
+            pool = indices[start:start + self.pool]
+            if self.bucketing:
+                pool = pool[np.argsort(self.lengths[pool], kind="stable")]
+            batches += [pool[i:i + self.batch_size] for i in range(0, len(pool), self.batch_size)]
+
+        if self.shuffle:
+            rng.shuffle(batches)
+        return iter(batches)
+
+class PaddedBatches:
+    """
+    Map-style dataset keyed by a batch of indices: returns the rows padded to
+    the batch's longest row (or to `pad_to` for fixed-length padding).
+    """
+
+    def __init__(self, cache, pad_to: int = 0):
+        self.cache = cache
+        self.pad_id = cache.meta["pad_token_id"]
+        self.pad_to = pad_to
+
+    def __len__(self):
+        return len(self.cache)
+
+    def __getitem__(self, indices):
+        rows = [self.cache.row(i) for i in indices]
+        width = self.pad_to or max(len(r) for r in rows)
+        input_ids = np.full((len(rows), width), self.pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(rows), width), dtype=np.int64)
+        for i, r in enumerate(rows):
+            input_ids[i, :len(r)] = r
+            attention_mask[i, :len(r)] = 1
+        return {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "labels": np.asarray(self.cache.labels[indices], dtype=np.int64)
+        }
+
+def make_loader(cache, indices, batch_size: int, workers: int, shuffle: bool, bucketing: bool, seed: int):
+    from torch.utils.data import DataLoader
+
+    sampler = BucketBatchSampler(cache.lengths, indices, batch_size, shuffle, bucketing, seed=seed)
+    pad_to = 0 if bucketing else int(cache.lengths.max())
+    loader = DataLoader(
+        PaddedBatches(cache, pad_to),
+        batch_size=None,  # the sampler yields whole batches
+        sampler=sampler,
+        num_workers=workers,
+        persistent_workers=workers > 0,
+        prefetch_factor=4 if workers > 0 else None
+    )
+    return loader, sampler
+
+# =========================
+# TRAINING
+# =========================
+
+def evaluate(model, loader) -> dict:
+    import torch
+
+    model.eval()
+    correct = total = 0
+    loss = 0.0
+    with torch.inference_mode():
+        for batch in loader:
+            out = model(**batch)
+            loss += float(out.loss) * len(batch["labels"])
+            correct += int((out.logits.argmax(dim=1) == batch["labels"]).sum())
+            total += len(batch["labels"])
+    model.train()
+    return {"loss": round(loss / max(total, 1), 4), "accuracy": round(correct / max(total, 1), 4)}
+
+def export(model, tokenizer, output: str, report: dict):
+    """
+    Writes the checkpoint next to `output` and swaps it in, keeping the
+    previous one as `<output>.prev`. A stale model.onnx never survives the
+    swap; the registry re-exports it on the next onnx load.
+    """
+    tmp = f"{output}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    model.save_pretrained(tmp, safe_serialization=True)
+    tokenizer.save_pretrained(tmp)
+    with open(os.path.join(tmp, "training_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    if os.path.exists(output):
+        shutil.rmtree(f"{output}.prev", ignore_errors=True)
+        os.replace(output, f"{output}.prev")
+    os.replace(tmp, output)
+    logger.info("Model exported", extra={"path": output})
+
+def train(input_path: str = DATASET_PATH, output: str = ML_MODEL_PATH, base: str = ML_TRAIN_BASE_MODEL,
+          cache_dir: str = TOKEN_CACHE_DIR, epochs: int = 2, batch_size: int = 64, lr: float = 5e-5,
+          max_length: int = ML_MAX_LENGTH, workers: int = 2, threads: int = 0, val_fraction: float = 0.02,
+          max_rows: int = 0, bucketing: bool = True, rebuild_cache: bool = False, seed: int = 0,
+          log_every: int = 200) -> dict:
+    import torch
+    from transformers import DistilBertForSequenceClassification, DistilBertTokenizerFast, get_linear_schedule_with_warmup
+
+    torch.manual_seed(seed)
+    if threads:
+        torch.set_num_threads(threads)
+
+    tokenizer = DistilBertTokenizerFast.from_pretrained(base)
+    start = time.perf_counter()
+    cache = load_token_cache(input_path, cache_dir, tokenizer, base, max_length, max_rows, rebuild_cache)
+    cache_seconds = time.perf_counter() - start
+
+    order = np.random.default_rng(seed).permutation(len(cache))
+    n_val = int(len(cache) * val_fraction)
+    val_idx, train_idx = order[:n_val], order[n_val:]
+
+    train_loader, sampler = make_loader(cache, train_idx, batch_size, workers, True, bucketing, seed)
+    val_loader, _ = make_loader(cache, val_idx, batch_size * 2, 0, False, True, seed) if n_val else (None, None)
+
+    model = DistilBertForSequenceClassification.from_pretrained(
+        base, num_labels=len(LABELS), id2label=LABELS, label2id={v: k for k, v in LABELS.items()}
+    )
+    model.train()
+    optimizer = torch.optim.AdamW(model.parameters(), lr=lr, weight_decay=0.01)
+    steps = epochs * len(sampler)
+    scheduler = get_linear_schedule_with_warmup(optimizer, int(0.06 * steps), steps)
+
+    logger.info("Training", extra={
+        "rows": len(cache), "train": len(train_idx), "val": n_val, "epochs": epochs,
+        "steps": steps, "bucketing": bucketing, "workers": workers, "threads": torch.get_num_threads()
+    })
+
+    history = []
+    for epoch in range(epochs):
+        sampler.set_epoch(epoch)
+        epoch_start = time.perf_counter()
+        tokens = padded = 0
+        loss_sum = 0.0
+        for step, batch in enumerate(train_loader, 1):
+            loss = model(**batch).loss
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+            optimizer.step()
+            scheduler.step()
+            optimizer.zero_grad(set_to_none=True)
+
+            loss_sum += loss.item()
+            tokens += int(batch["attention_mask"].sum())
+            padded += batch["attention_mask"].numel()
+            if log_every and step % log_every == 0:
+                elapsed = time.perf_counter() - epoch_start
+                logger.info("step %d/%d loss %.4f %.0f tokens/s", step, len(sampler),
+                            loss_sum / step, tokens / elapsed)
+
+        seconds = time.perf_counter() - epoch_start
+        stats = {
+            "epoch": epoch + 1,
+            "seconds": round(seconds, 1),
+            "train_loss": round(loss_sum / max(len(sampler), 1), 4),
+            "tokens_per_second": round(tokens / seconds),
+            "padded_tokens_per_second": round(padded / seconds),
+            "padding_efficiency": round(tokens / max(padded, 1), 3)
+        }
+        if val_loader is not None:
+            stats.update({f"val_{k}": v for k, v in evaluate(model, val_loader).items()})
+        history.append(stats)
+        logger.info("Epoch finished", extra=stats)
+
+    report = {
+        "base": base,
+        "dataset": input_path,
+        "rows": len(cache),
+        "max_length": max_length,
+        "batch_size": batch_size,
+        "bucketing": bucketing,
+        "cache_seconds": round(cache_seconds, 1),
+        "epochs": history
+    }
+    export(model, tokenizer, output, report)
+    return report
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fine-tune DistilBERT on the ingredient risk dataset")
+    parser.add_argument("--input", default=DATASET_PATH, help="Glob of dataset shards (*.jsonl or *.parquet)")
+    parser.add_argument("--output", default=ML_MODEL_PATH, help="Checkpoint directory the model registry loads")
+    parser.add_argument("--base", default=ML_TRAIN_BASE_MODEL, help="Checkpoint to start from")
+    parser.add_argument("--cache-dir", default=TOKEN_CACHE_DIR)
+    parser.add_argument("--rebuild-cache", action="store_true")
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--lr", type=float, default=5e-5)
+    parser.add_argument("--max-length", type=int, default=ML_MAX_LENGTH)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="DataLoader worker processes")
+    parser.add_argument("--threads", type=int, default=0, help="Torch intra-op threads (0 = library default)")
+    parser.add_argument("--val-fraction", type=float, default=0.02)
+    parser.add_argument("--max-rows", type=int, default=0, help="Train on the first N rows only (0 = all)")
+    parser.add_argument("--no-bucketing", action="store_true", help="Pad every batch to the dataset's longest row")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-every", type=int, default=200)
+    args = parser.parse_args()
+
+    report = train(args.input, args.output, args.base, args.cache_dir, args.epochs, args.batch_size, args.lr,
+                   args.max_length, args.workers, args.threads, args.val_fraction, args.max_rows,
+                   not args.no_bucketing, args.rebuild_cache, args.seed, args.log_every)
+    for e in report["epochs"]:
+        print(f"epoch {e['epoch']}: {e['seconds']}s, {e['tokens_per_second']} tokens/s "
+              f"(padding efficiency {e['padding_efficiency']}), loss {e['train_loss']}"
+              + (f", val accuracy {e['val_accuracy']}" if "val_accuracy" in e else ""))
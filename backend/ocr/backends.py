@@ -0,0 +1,171 @@
+import os
+
+from ..concurrency import run_blocking
+from ..gemini.resilience import UpstreamUnavailable
+from ..telemetry import get_logger
+from .ocr_engine import extract_text_async
+
+# Local OCR is optional: needs the tesseract binary plus
+# `pip install pytesseract opencv-python-headless numpy`
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+logger = get_logger(__name__)
+
+# =========================
+# CONFIG
+# =========================
+
+# gemini: cloud vision only (default)
+# tiered: local Tesseract first, escalate to Gemini when confidence is low
+# local:  local Tesseract only (offline)
+OCR_BACKEND = os.getenv("OCR_BACKEND", "gemini")
+# Mean word confidence (0-1) local OCR needs before we skip the cloud call
+OCR_LOCAL_MIN_CONFIDENCE = float(os.getenv("OCR_LOCAL_MIN_CONFIDENCE", "0.80"))
+# Fewer recognized words than this counts as low confidence
+OCR_LOCAL_MIN_WORDS = int(os.getenv("OCR_LOCAL_MIN_WORDS", "5"))
+OCR_TESSERACT_CONFIG = os.getenv("OCR_TESSERACT_CONFIG", "--oem 1 --psm 6")
+# tiled: detect the text region and OCR it tile by tile (see preprocess.map_tiles)
+# full:  classic preprocess_image on the whole frame
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "tiled")
+
+# =========================
+# BACKENDS
+# =========================
+
+class OCRResult:
+    def __init__(self, text: str, confidence, engine: str):
+        self.text = text
+        self.confidence = confidence  # 0-1, or None when the engine doesn't report one
+        self.engine = engine
+
+    def __repr__(self):
+        return f"OCRResult(engine={self.engine!r}, confidence={self.confidence}, chars={len(self.text)})"
+
+class OCRBackend:
+    """
+    Interface for OCR engines: turn encoded image bytes into text.
+    """
+    name = "base"
+
+    def available(self) -> bool:
+        return True
+
+    async def recognize(self, image_bytes: bytes) -> OCRResult:
+        raise NotImplementedError
+
+class GeminiOCR(OCRBackend):
+    name = "gemini"
+
+    async def recognize(self, image_bytes: bytes) -> OCRResult:
+        return OCRResult(await extract_text_async(image_bytes), None, self.name)
+
+class TesseractOCR(OCRBackend):
+    """
+    CPU-only OCR on the preprocessing pipeline (upscale, adaptive threshold,
+    median blur). Confidence is the length-weighted mean of Tesseract's
+    per-word confidences.
+    """
+    name = "tesseract"
+
+    def __init__(self, config: str = OCR_TESSERACT_CONFIG, preprocess: str = OCR_PREPROCESS):
+        self.config = config
+        self.preprocess = preprocess
+
+    def available(self) -> bool:
+        return pytesseract is not None
+
+    def _read(self, processed):
+        return pytesseract.image_to_data(processed, config=self.config, output_type=pytesseract.Output.DICT)
+
+    def recognize_sync(self, image_bytes: bytes) -> OCRResult:
+        from .preprocess import preprocess_image, map_tiles
+
+        if self.preprocess == "full":
+            tiles = [self._read(preprocess_image(image_bytes))]
+        else:
+            tiles = map_tiles(image_bytes, self._read)
+
+        lines = {}
+        weighted, total = 0.0, 0
+        for tile, data in enumerate(tiles):
+            for word, conf, block, par, line in zip(
+                data["text"], data["conf"], data["block_num"], data["par_num"], data["line_num"]
+            ):
+                word = word.strip()
+                conf = float(conf)
+                if not word or conf < 0:
+                    continue
+                lines.setdefault((tile, block, par, line), []).append(word)
+                weighted += conf * len(word)
+                total += len(word)
+
+        word_count = sum(len(w) for w in lines.values())
+        confidence = (weighted / total / 100) if total else 0.0
+        if word_count < OCR_LOCAL_MIN_WORDS:
+            confidence = min(confidence, OCR_LOCAL_MIN_CONFIDENCE - 0.01)
+
+        text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+        return OCRResult(text, round(confidence, 3), self.name)
+
+    async def recognize(self, image_bytes: bytes) -> OCRResult:
+        return await run_blocking(self.recognize_sync, image_bytes)
+
+class TieredOCR(OCRBackend):
+    """
+    Runs the fast local engine first and escalates to the cloud engine only
+    when local confidence is below the threshold. If the cloud call fails
+    (e.g. offline, or Gemini unavailable), the local text is kept rather than
+    returning nothing.
+    """
+    name = "tiered"
+
+    def __init__(self, local: OCRBackend, cloud: OCRBackend, min_confidence: float = OCR_LOCAL_MIN_CONFIDENCE):
+        self.local = local
+        self.cloud = cloud
+        self.min_confidence = min_confidence
+
+    async def recognize(self, image_bytes: bytes) -> OCRResult:
+        local = None
+        if self.local.available():
+            try:
+                local = await self.local.recognize(image_bytes)
+                if local.confidence is not None and local.confidence >= self.min_confidence:
+                    logger.debug("Local OCR accepted (%.2f)", local.confidence)
+                    return local
+                logger.debug("Local OCR confidence %.2f too low; escalating", local.confidence)
+            except Exception as e:
+                logger.error("Local OCR failed: %s", e)
+
+        try:
+            cloud = await self.cloud.recognize(image_bytes)
+        except UpstreamUnavailable as e:
+            if local is None or not local.text:
+                raise
+            logger.warning("Cloud OCR unavailable; keeping local text: %s", e)
+            return local
+        if not cloud.text and local is not None and local.text:
+            logger.debug("Cloud OCR returned nothing; keeping local text")
+            return local
+        return cloud
+
+def make_ocr_backend(kind: str = OCR_BACKEND) -> OCRBackend:
+    if kind == "local":
+        if pytesseract is None:
+            logger.error("OCR_BACKEND=local but pytesseract is not installed; using Gemini")
+            return GeminiOCR()
+        return TesseractOCR()
+    if kind == "tiered":
+        return TieredOCR(TesseractOCR(), GeminiOCR())
+    return GeminiOCR()
+
+ocr_backend = make_ocr_backend()
+
+async def recognize_text(image_bytes: bytes) -> str:
+    """
+    OCR through the configured backend. Returns raw label text.
+    """
+    result = await ocr_backend.recognize(image_bytes)
+    return result.text
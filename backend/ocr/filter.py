@@ -1,31 +1,15 @@
-from google import genai
 import os
 
-# Initialize the new Gemini Client
-client = genai.Client(
-    api_key=os.getenv("GEMINI_API_KEY")
-)
+from ..gemini.models import generate_content, generate_content_async
+from ..telemetry import get_logger
 
-def get_best_model(client):
-    try:
-        models = [m.name for m in client.models.list()]
-        priorities = ["gemini-1.5-flash", "gemini-1.5-flash-latest", "gemini-2.0-flash-exp"]
-        for p in priorities:
-            for m in models:
-                if p == m or f"models/{p}" == m:
-                    return m
-        for m in models:
-            if "flash" in m.lower():
-                return m
-        return "gemini-1.5-flash"
-    except:
-        return "gemini-1.5-flash"
+logger = get_logger(__name__)
 
-def filter_ingredient_text(raw_ocr_text: str) -> str:
-    if not raw_ocr_text or not raw_ocr_text.strip():
-        return ""
-    
-    prompt = f"""You are a strict OCR text filter for food packaging. Extract ONLY ingredients and health-related information.
+# Text-only and cheap; on timeout the raw OCR text is used, so don't wait long
+FILTER_TIMEOUT_SECONDS = float(os.getenv("GEMINI_FILTER_TIMEOUT_SECONDS", "10"))
+
+def build_filter_prompt(raw_ocr_text: str) -> str:
+    return f"""You are a strict OCR text filter for food packaging. Extract ONLY ingredients and health-related information.
 
 Raw OCR text:
 {raw_ocr_text}
@@ -44,22 +28,47 @@ WHAT TO REMOVE:
 
 Return ONLY clean ingredient text.
 """
+
+def _clean_filter_output(text: str) -> str:
+    filtered_text = text.strip()
+    
+    if not filtered_text or filtered_text.lower() in ["no ingredients detected", "none", ""]:
+        return "No clear ingredient information found in the image."
+    
+    return filtered_text
+
+def filter_ingredient_text(raw_ocr_text: str) -> str:
+    if not raw_ocr_text or not raw_ocr_text.strip():
+        return ""
+    
+    prompt = build_filter_prompt(raw_ocr_text)
     
     try:
-        model_name = get_best_model(client)
-        
-        response = client.models.generate_content(
-            model=model_name,
-            contents=prompt
-        )
+        response = generate_content(prompt, timeout=FILTER_TIMEOUT_SECONDS)
         
-        filtered_text = response.text.strip()
+        return _clean_filter_output(response.text)
         
-        if not filtered_text or filtered_text.lower() in ["no ingredients detected", "none", ""]:
-            return "No clear ingredient information found in the image."
+    except Exception as e:
+        logger.error("filter_ingredient_text failed: %s", e)
+        return raw_ocr_text
+
+async def filter_ingredient_text_async(raw_ocr_text: str, raise_errors: bool = False) -> str:
+    """
+    Non-blocking variant of filter_ingredient_text using the SDK's async client.
+    With raise_errors, upstream failures propagate instead of returning the raw text.
+    """
+    if not raw_ocr_text or not raw_ocr_text.strip():
+        return ""
+    
+    prompt = build_filter_prompt(raw_ocr_text)
+    
+    try:
+        response = await generate_content_async(prompt, timeout=FILTER_TIMEOUT_SECONDS)
         
-        return filtered_text
+        return _clean_filter_output(response.text)
         
     except Exception as e:
-        print(f"ERROR in filter_ingredient_text: {e}")
+        if raise_errors:
+            raise
+        logger.error("filter_ingredient_text failed: %s", e)
         return raw_ocr_text
@@ -0,0 +1,51 @@
+import io
+import os
+
+from PIL import Image, ImageOps
+
+# =========================
+# CONFIG
+# =========================
+
+# Phone photos are downscaled so the longest side is at most this many pixels
+OCR_MAX_DIMENSION = int(os.getenv("OCR_MAX_DIMENSION", "2048"))
+OCR_JPEG_QUALITY = int(os.getenv("OCR_JPEG_QUALITY", "85"))
+
+# =========================
+# DECODE / ENCODE
+# =========================
+
+def load_image(source) -> Image.Image:
+    """
+    Decodes an image from a path, raw bytes or a file-like object.
+    EXIF rotation is applied so the label is upright.
+    """
+    if isinstance(source, Image.Image):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    img = Image.open(source)
+    img.load()
+    return ImageOps.exif_transpose(img)
+
+def downscale(img: Image.Image, max_dimension: int = OCR_MAX_DIMENSION) -> Image.Image:
+    if max(img.size) <= max_dimension:
+        return img
+    img = img.copy()
+    img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    return img
+
+def encode_jpeg(img: Image.Image, quality: int = OCR_JPEG_QUALITY) -> bytes:
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+def prepare_image(source, max_dimension: int = OCR_MAX_DIMENSION, quality: int = OCR_JPEG_QUALITY) -> bytes:
+    """
+    Decodes once, downscales oversized photos and re-encodes as JPEG,
+    ready to send upstream. Raises if the upload is not a readable image.
+    """
+    img = load_image(source)
+    return encode_jpeg(downscale(img, max_dimension), quality)
@@ -1,50 +1,107 @@
-from google import genai
-import os
-from PIL import Image
+import json
 
-# Initialize the new Gemini Client
-client = genai.Client(
-    api_key=os.getenv("GEMINI_API_KEY")
-)
+from google.genai import types
 
-def get_best_model(client):
-    try:
-        models = [m.name for m in client.models.list()]
-        priorities = ["gemini-1.5-flash", "gemini-1.5-flash-latest", "gemini-2.0-flash-exp", "gemini-1.5-pro"]
-        for p in priorities:
-            for m in models:
-                if p == m or f"models/{p}" == m:
-                    return m
-        for m in models:
-            if "flash" in m.lower() or "pro" in m.lower():
-                return m
-        return "gemini-1.5-flash"
-    except:
-        return "gemini-1.5-flash"
-
-def extract_text(image_path: str) -> str:
+from ..concurrency import run_blocking
+from ..gemini.models import generate_content, generate_content_async
+from ..gemini.resilience import UpstreamUnavailable
+from ..telemetry import get_logger
+from .image_io import prepare_image
+
+logger = get_logger(__name__)
+
+OCR_PROMPT = "Extract all text from this food label, specifically focusing on the ingredients list. Return the raw text."
+
+# Single-call mode: OCR and ingredient filtering in one vision request
+SINGLE_PASS_PROMPT = """You are reading a food packaging label. Extract ONLY the ingredients and health-related information.
+
+KEEP: the ingredient list, sub-ingredients in brackets/parentheses, additives (preservatives, colorings, MSG), allergen information ("Contains milk", etc.) and health warnings.
+REMOVE: nutritional tables, energy/fat/protein/salt grams, serving sizes, dates, brand marketing, storage and packaging info.
+
+RETURN ONLY JSON (no Markdown, no conversational text):
+{
+  "ingredients_text": "The clean ingredient text exactly as printed",
+  "ingredients": ["ingredient 1", "ingredient 2"]
+}
+If no ingredients are visible, return {"ingredients_text": "", "ingredients": []}.
+"""
+
+def _image_part(jpeg_bytes: bytes):
+    return types.Part.from_bytes(data=jpeg_bytes, mime_type="image/jpeg")
+
+def extract_text(image) -> str:
     """
     Extracts text from an image using Gemini (Vision).
+    image: file path, raw bytes or a file-like object. It is decoded once in
+    memory, downscaled if oversized and sent as JPEG; nothing touches disk.
+    Raises UpstreamUnavailable when Gemini is down: without OCR there is
+    nothing to analyze, so the caller should fail fast.
+    """
+    # Decode errors are the caller's problem, not an OCR failure
+    jpeg_bytes = prepare_image(image)
+
+    try:
+        # Best available model is resolved once per process (see gemini/models.py)
+        response = generate_content([OCR_PROMPT, _image_part(jpeg_bytes)])
+
+        if response and response.text:
+            return response.text
+        return ""
+
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        logger.error("Gemini Vision OCR failed: %s", e)
+        return ""
+
+async def extract_text_async(image) -> str:
+    """
+    Non-blocking variant of extract_text for the request path.
+    Uses the SDK's async client; image decoding runs on the bounded executor.
     """
+    jpeg_bytes = await run_blocking(prepare_image, image)
+
     try:
-        img = Image.open(image_path)
-        prompt = "Extract all text from this food label, specifically focusing on the ingredients list. Return the raw text."
-        
-        # Auto-discover working model
-        model_name = get_best_model(client)
-        print(f"DEBUG OCR: Using model '{model_name}'")
-        
-        response = client.models.generate_content(
-            model=model_name,
-            contents=[prompt, img]
-        )
-        
+        response = await generate_content_async([OCR_PROMPT, _image_part(jpeg_bytes)])
+
         if response and response.text:
             return response.text
         return ""
-        
+
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
-        print(f"ERROR: Gemini Vision OCR failed: {e}")
+        logger.error("Gemini Vision OCR failed: %s", e)
         return ""
-    finally:
-        pass
+
+async def extract_ingredients_async(image):
+    """
+    Single vision call that returns already-filtered ingredient text and a split list:
+    {"ingredients_text": str, "ingredients": [str]}.
+    Returns None if the call fails or the reply is not valid JSON, so the caller
+    can fall back to the two-stage OCR -> filter path. UpstreamUnavailable is
+    raised instead, since the fallback would hit the same outage.
+    """
+    jpeg_bytes = await run_blocking(prepare_image, image)
+
+    try:
+        response = await generate_content_async([SINGLE_PASS_PROMPT, _image_part(jpeg_bytes)])
+
+        text = (response.text or "").strip()
+        if text.startswith("```json"):
+            text = text[7:-3].strip()
+        elif text.startswith("```"):
+            text = text[3:-3].strip()
+
+        data = json.loads(text)
+        ingredients = [str(i).strip() for i in data.get("ingredients") or [] if str(i).strip()]
+        return {
+            "ingredients_text": str(data.get("ingredients_text") or "").strip(),
+            "ingredients": ingredients
+        }
+
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        logger.error("Single-pass vision extraction failed: %s", e)
+        return None
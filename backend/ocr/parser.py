@@ -1,63 +1,174 @@
 import re
 
+# =========================
+# PATTERNS (compiled once)
+# =========================
+
+MARKER = "ingredients:"
+
+# One token per match: bracket, separator or run of ingredient text. A period
+# is a separator unless it sits between digits ("2.5%", "vitamin b1.2" stays split).
+TOKEN_PATTERN = re.compile(
+    r"(?P<open>[(\[{])"
+    r"|(?P<close>[)\]}])"
+    r"|(?P<sep>[,;]|\.(?!\d)|(?<!\d)\.)"
+    r"|(?P<text>(?:[^(\[{)\]},;.]|(?<=\d)\.(?=\d))+)"
+)
+
+# Everything that marks an item as non-ingredient text, in a single search:
+# runs of 2+ digits that aren't E-numbers (e331 is kept), weights, percentages
+# and common packaging phrases
+GARBAGE_PATTERN = re.compile(
+    r"(?<![e\d])\d{2,}|\d+g|\d+%|best before|batch|upright|tear|store in|consume|packaged|calories|energy",
+    re.IGNORECASE
+)
+
+# Quantities leading or trailing an ingredient name ("milk 2.5%", "12% cocoa butter",
+# "salt 1.2 g") are stripped before the garbage check, so the ingredient itself is kept
+_QUANTITY = r"\d+(?:\.\d+)?\s*(?:%|mg|kg|g|ml|l)"
+QUANTITY_PATTERN = re.compile(rf"^(?:{_QUANTITY}\s+)+|(?:\s+{_QUANTITY})+$", re.IGNORECASE)
+_HAS_DIGIT = re.compile(r"\d").search
+
+# Streamed chunks are only tokenized up to the last character that always ends a token
+_SAFE_END = "()[]{},;"
+
+# =========================
+# STREAMING PARSER
+# =========================
+
+def _is_garbage(name: str) -> bool:
+    return len(name) < 3 or GARBAGE_PATTERN.search(name) is not None
+
+class IngredientParser:
+    """
+    Single-pass, bracket-aware ingredient tokenizer. Text can be fed in
+    chunks (e.g. a streamed model response); feed() returns top-level
+    ingredients as soon as their separator arrives, each as
+    {"name": ..., "children": [...]} with nested sub-ingredients, so
+    "chocolate (sugar, cocoa butter)" becomes one node with two children.
+
+    Like parse_ingredients, everything before the first "ingredients:" is
+    dropped. Until that marker has been seen output is held back, so text
+    without a marker is only returned by close().
+    """
+
+    def __init__(self):
+        self._prefix = ""
+        self._marker_seen = False
+        self._pending = ""
+        # Frames of (items at this depth, parts of the item being read)
+        self._stack = [([], [])]
+        # Children collected for the item being read at each depth
+        self._children = [[]]
+
+    def feed(self, chunk: str) -> list:
+        chunk = chunk.lower().replace("\n", " ")
+        if not self._marker_seen:
+            self._prefix += chunk
+            index = self._prefix.find(MARKER)
+            if index < 0:
+                return []
+            self._marker_seen = True
+            chunk, self._prefix = self._prefix[index + len(MARKER):], ""
+
+        text = self._pending + chunk
+        end = max(text.rfind(c) for c in _SAFE_END) + 1
+        self._pending = text[end:]
+        self._consume(text[:end])
+        return self._take()
+
+    def close(self) -> list:
+        """
+        Flushes the remaining text, closing any unbalanced brackets.
+        """
+        text = self._pending if self._marker_seen else self._prefix
+        self._pending = self._prefix = ""
+        self._marker_seen = True
+
+        self._consume(text)
+        while len(self._stack) > 1:
+            self._close_bracket()
+        self._finish_item()
+        return self._take()
+
+    def _consume(self, text: str):
+        for match in TOKEN_PATTERN.finditer(text):
+            kind = match.lastgroup
+            if kind == "text":
+                self._stack[-1][1].append(match.group())
+            elif kind == "sep":
+                self._finish_item()
+            elif kind == "open":
+                self._stack.append(([], []))
+                self._children.append([])
+            elif len(self._stack) > 1:
+                self._close_bracket()
+
+    def _finish_item(self):
+        items, parts = self._stack[-1]
+        children = self._children[-1]
+        name = " ".join(" ".join(parts).split())
+        if _HAS_DIGIT(name):
+            name = QUANTITY_PATTERN.sub("", name)
+        if not _is_garbage(name):
+            items.append({"name": name, "children": children})
+        else:
+            # Keep real sub-ingredients of a garbage item ("contains 2% or less of (salt)")
+            items.extend(children)
+        parts.clear()
+        self._children[-1] = []
+
+    def _close_bracket(self):
+        self._finish_item()
+        items, _ = self._stack.pop()
+        self._children.pop()
+        self._children[-1].extend(items)
+
+    def _take(self) -> list:
+        # Completed top-level items; nested ones wait for their closing bracket
+        items = self._stack[0][0]
+        if not items:
+            return []
+        self._stack[0] = ([], self._stack[0][1])
+        return items
+
+def flatten(tree: list) -> list:
+    """
+    Ingredient names in reading order, parents before their sub-ingredients.
+    """
+    names = []
+    for node in tree:
+        names.append(node["name"])
+        names.extend(flatten(node["children"]))
+    return names
+
+def iter_ingredients(chunks):
+    """
+    Yields top-level ingredient nodes from an iterable of text chunks.
+    """
+    parser = IngredientParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+# =========================
+# ENTRY POINT
+# =========================
+
 def parse_ingredients(text):
     """
     Parse ingredient text into a list of individual ingredients.
     Filters out garbage text and non-ingredient items.
+    "ingredients" is the flat list of names; "tree" keeps sub-ingredients
+    nested under their parent.
     """
     if not text or text.strip() == "":
-        return {"ingredients": []}
-    
-    # Remove common prefixes more robustly
-    text = text.lower().strip()
-    text = text.replace("\n", " ")
-    # Strip everything up to the first 'ingredients:' if present
-    marker = "ingredients:"
-    if marker in text:
-        text = text.split(marker, 1)[1]
-    
-    # Split by common delimiters: comma, semicolon, period, or newline
-    # Using regex to handle "item. next" but not "E331" if possible
-    items = re.split(r",|;|\.|\n", text)
-    
-    ingredients = []
-    for item in items:
-        item = item.strip()
-        
-        # Skip if too short
-        if len(item) < 3:
-            continue
-        
-        # Skip if it's mostly random numbers, but KEEP E-numbers (e.g., e331)
-        # Modified regex: skip if has 2+ consecutive digits NOT preceded by 'e'
-        if re.search(r'(?<!e)\d{2,}', item, re.IGNORECASE):
-            continue
-        
-        # Skip common garbage patterns
-        garbage_patterns = [
-            r'best before',
-            r'batch',
-            r'upright',
-            r'tear',
-            r'store in',
-            r'consume',
-            r'packaged',
-            r'\d+g',  # Weight measurements
-            r'\d+%',  # Percentages
-            r'calories',
-            r'energy',
-        ]
-        
-        is_garbage = False
-        for pattern in garbage_patterns:
-            if re.search(pattern, item, re.IGNORECASE):
-                is_garbage = True
-                break
-        
-        if not is_garbage:
-            ingredients.append(item)
-    
+        return {"ingredients": [], "tree": []}
+
+    parser = IngredientParser()
+    tree = parser.feed(text.strip()) + parser.close()
+
     return {
-        "ingredients": ingredients
+        "ingredients": flatten(tree),
+        "tree": tree
     }
-
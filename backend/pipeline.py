@@ -0,0 +1,179 @@
+import os
+import time
+
+from .ocr.ocr_engine import extract_ingredients_async
+from .ocr.backends import OCR_BACKEND, OCR_PREPROCESS, recognize_text
+from .ocr.filter import filter_ingredient_text_async
+from .ocr.parser import parse_ingredients
+from .ml.predict import predict_ingredients, ML_CLASSIFIER
+from .concurrency import run_blocking
+from .ml.risk_engine import calculate_risk_score
+from .gemini.explain_cache import explain_cached, explain_cached_stream
+from .result_cache import OCR_CACHE, FILTER_CACHE, VISION_CACHE, resolve_image_key, cached_stage, stage_key
+from .telemetry import STAGE_SECONDS, get_logger, span
+
+logger = get_logger(__name__)
+
+# =========================
+# CONFIG
+# =========================
+
+# two_stage: OCR (see OCR_BACKEND in ocr/backends.py), then a text call to filter ingredients (default)
+# single:    one vision call returns filtered ingredients; falls back to two_stage
+OCR_PIPELINE_MODE = os.getenv("OCR_PIPELINE_MODE", "two_stage")
+# In single mode, use the model's ingredient split instead of parse_ingredients
+OCR_USE_MODEL_SPLIT = os.getenv("OCR_USE_MODEL_SPLIT", "0") == "1"
+
+NO_INGREDIENTS_TEXT = "No clear ingredient information found in the image."
+
+# What the OCR output depends on; preprocessing only applies to local Tesseract
+OCR_CACHE_CONFIG = OCR_BACKEND if OCR_BACKEND == "gemini" else f"{OCR_BACKEND}-{OCR_PREPROCESS}"
+
+# =========================
+# INGREDIENT TEXT STAGES
+# =========================
+
+async def _two_stage_text(image_bytes: bytes, image_key, timings: dict) -> str:
+    filter_failed = False
+
+    async def ocr_then_filter():
+        nonlocal filter_failed
+
+        # OCR
+        logger.debug("Extracting text from %d byte upload", len(image_bytes))
+        with span("ocr", timings):
+            raw_text = await cached_stage(
+                OCR_CACHE, stage_key(image_key, OCR_CACHE_CONFIG), lambda: recognize_text(image_bytes)
+            )
+        logger.debug("Raw OCR text: %.100s", raw_text)
+
+        # Filter to get only ingredients
+        logger.debug("Filtering OCR text for ingredients")
+        with span("filter", timings):
+            try:
+                return await filter_ingredient_text_async(raw_text, raise_errors=True)
+            except Exception as e:
+                # Fall back to the raw text, but don't cache it
+                logger.error("filter_ingredient_text failed: %s", e)
+                filter_failed = True
+                return raw_text
+
+    filtered_text = await cached_stage(
+        FILTER_CACHE, stage_key(image_key, "two_stage", OCR_CACHE_CONFIG), ocr_then_filter,
+        should_store=lambda text: bool(text) and not filter_failed
+    )
+    logger.debug("Filtered text: %.100s", filtered_text)
+    return filtered_text
+
+async def _single_pass_text(image_bytes: bytes, image_key, timings: dict):
+    """
+    Returns (ingredients_text, model_split or None).
+    """
+    logger.debug("Single-pass vision extraction from %d byte upload", len(image_bytes))
+    with span("vision", timings):
+        extracted = await cached_stage(
+            VISION_CACHE, stage_key(image_key, "single"), lambda: extract_ingredients_async(image_bytes),
+            should_store=lambda data: data is not None
+        )
+
+    if extracted is None:
+        logger.warning("Single-pass extraction failed; falling back to two-stage OCR")
+        return await _two_stage_text(image_bytes, image_key, timings), None
+
+    text = extracted["ingredients_text"] or NO_INGREDIENTS_TEXT
+    logger.debug("Filtered text: %.100s", text)
+    return text, extracted["ingredients"]
+
+# =========================
+# PIPELINE
+# =========================
+
+async def analyze_events(image_bytes: bytes, profile: str = "General", stream_explanation: bool = True):
+    """
+    Runs the full OCR -> filter -> parse -> predict -> score -> explain pipeline
+    for one uploaded label image, entirely in memory, yielding (event, data)
+    pairs as results become available:
+
+        text         {"extracted_text"}
+        analysis     {"ingredients_analysis", "risk_score", "risk_level", "risk_breakdown"}
+        explanation_delta  {"text"}  raw model output while it is generated (stream_explanation only)
+        explanation  {"explanation"}
+        done         {"timings_ms"}
+
+    Raises on failure so callers decide how to report it. Upstream calls are
+    awaited, so the event loop keeps serving other requests. OCR and
+    filtering are cached on the image hash and the OCR backend and mode.
+    """
+    if not image_bytes:
+        raise ValueError("Empty or unreadable upload")
+
+    timings = {}
+    started = time.perf_counter()
+    with span("hash", timings):
+        image_key = await resolve_image_key(image_bytes)
+
+    # OCR + filter, as one vision call or two sequential calls
+    model_split = None
+    if OCR_PIPELINE_MODE == "single":
+        filtered_text, model_split = await _single_pass_text(image_bytes, image_key, timings)
+    else:
+        filtered_text = await _two_stage_text(image_bytes, image_key, timings)
+    yield "text", {"extracted_text": filtered_text}
+
+    # Ingredient parsing (use filtered text)
+    with span("parse", timings):
+        if OCR_USE_MODEL_SPLIT and model_split is not None:
+            parsed = {"ingredients": [i.lower() for i in model_split]}
+        else:
+            parsed = parse_ingredients(filtered_text)
+    logger.debug("Parsed ingredients: %s", parsed["ingredients"])
+
+    # ML inference
+    with span("predict", timings):
+        if ML_CLASSIFIER == "keyword":
+            results = predict_ingredients(parsed["ingredients"])
+        else:
+            # Model forward pass is CPU-bound; keep it off the event loop
+            results = await run_blocking(predict_ingredients, parsed["ingredients"])
+    logger.debug("ML results: %s", results)
+
+    # Risk Calculation
+    with span("score", timings):
+        risk_data = calculate_risk_score(filtered_text, results, profile)
+    logger.debug("Risk score: %s", risk_data)
+
+    yield "analysis", {
+        "ingredients_analysis": results,
+        "risk_score": risk_data["score"],
+        "risk_level": risk_data["level"],
+        "risk_breakdown": risk_data["breakdown"]
+    }
+
+    # Gemini explanation; the deterministic results above don't wait for it
+    logger.debug("Calling Gemini with profile %r", profile)
+    with span("explain", timings):
+        if stream_explanation:
+            async for event, data in explain_cached_stream(results, profile):
+                if event == "delta":
+                    yield "explanation_delta", {"text": data}
+                else:
+                    explanation = data
+        else:
+            explanation = await explain_cached(results, profile)
+    logger.debug("Gemini response received")
+    yield "explanation", {"explanation": explanation}
+
+    elapsed = time.perf_counter() - started
+    STAGE_SECONDS.observe(elapsed, stage="total")
+    timings["total"] = round(elapsed * 1000, 1)
+    yield "done", {"timings_ms": timings}
+
+async def analyze_image(image_bytes: bytes, profile: str = "General") -> dict:
+    """
+    analyze_events collected into one response dict. Per-stage wall times
+    are returned under "timings_ms".
+    """
+    result = {}
+    async for _, data in analyze_events(image_bytes, profile, stream_explanation=False):
+        result.update(data)
+    return result
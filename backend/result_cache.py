@@ -0,0 +1,148 @@
+import hashlib
+import io
+import os
+
+from PIL import Image
+
+from .cache import get_cache
+from .concurrency import run_blocking
+from .telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# =========================
+# CONFIG
+# =========================
+
+# Also match near-duplicate photos by perceptual hash (dHash)
+RESULT_CACHE_PHASH = os.getenv("RESULT_CACHE_PHASH", "0") == "1"
+# Max differing bits (out of 64) for two photos to count as the same label
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "4"))
+# Most recent hashes kept per bucket; bounds the work per lookup
+PHASH_BUCKET_SIZE = int(os.getenv("PHASH_BUCKET_SIZE", "64"))
+
+# Each stage is cached on its own so a profile change still reuses OCR + filter.
+# Stage keys also name the configuration that produced the value (see stage_key);
+# bump the version when a prompt or stage changes what it returns.
+# Explanations are cached by content in gemini/explain_cache.py.
+STAGE_CACHE_VERSION = "1"
+OCR_CACHE = get_cache("ocr")
+FILTER_CACHE = get_cache("filter")
+# Single-call mode output: {"ingredients_text", "ingredients"}
+VISION_CACHE = get_cache("vision")
+PHASH_INDEX = get_cache("phash") if RESULT_CACHE_PHASH else None
+# Band of the hash -> recent hashes sharing it (see _bands)
+PHASH_BUCKETS = get_cache("phash_bucket") if RESULT_CACHE_PHASH else None
+
+# =========================
+# HASHING
+# =========================
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def perceptual_hash(data: bytes) -> int:
+    """
+    64-bit difference hash: robust to re-encoding, resizing and small exposure changes.
+    """
+    img = Image.open(io.BytesIO(data)).convert("L").resize((9, 8), Image.LANCZOS)
+    pixels = list(img.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+def _bands(phash: int) -> list:
+    """
+    Splits the 64 bits into PHASH_MAX_DISTANCE + 1 bands. Two hashes within
+    PHASH_MAX_DISTANCE bits agree on at least one whole band, so only hashes
+    sharing a band with the query need comparing.
+    """
+    n = PHASH_MAX_DISTANCE + 1
+    bounds = [64 * i // n for i in range(n + 1)]
+    return [f"{i}:{(phash >> lo) & ((1 << (hi - lo)) - 1):x}" for i, (lo, hi) in enumerate(zip(bounds, bounds[1:]))]
+
+def _find_similar(phash: int):
+    best_digest, best_distance = None, PHASH_MAX_DISTANCE + 1
+    seen = set()
+    for band in _bands(phash):
+        for key in PHASH_BUCKETS.get(band) or []:
+            if key in seen:
+                continue
+            seen.add(key)
+            distance = bin(int(key, 16) ^ phash).count("1")
+            if distance < best_distance:
+                digest = PHASH_INDEX.get(key)  # None once expired
+                if digest is not None:
+                    best_digest, best_distance = digest, distance
+    return best_digest
+
+def _add_phash(phash: int, digest: str):
+    key = f"{phash:016x}"
+    PHASH_INDEX.set(key, digest)
+    for band in _bands(phash):
+        bucket = [k for k in PHASH_BUCKETS.get(band) or [] if k != key]
+        PHASH_BUCKETS.set(band, ([key] + bucket)[:PHASH_BUCKET_SIZE])
+
+def _resolve_image_key(data: bytes) -> str:
+    digest = content_hash(data)
+    if PHASH_INDEX is None or digest in OCR_CACHE:
+        return digest
+
+    try:
+        phash = perceptual_hash(data)
+    except Exception as e:
+        logger.debug("Perceptual hash failed: %s", e)
+        return digest
+
+    similar = _find_similar(phash)
+    if similar is not None:
+        logger.debug("Near-duplicate image matched cached key %s", similar[:12])
+        return similar
+
+    _add_phash(phash, digest)
+    return digest
+
+async def resolve_image_key(data: bytes):
+    """
+    Cache key for an uploaded image: its SHA-256, or the key of a
+    near-duplicate photo already in the cache when RESULT_CACHE_PHASH is on.
+    Returns None when caching is off.
+    """
+    if OCR_CACHE is None or not data:
+        return None
+    return await run_blocking(_resolve_image_key, data)
+
+# =========================
+# STAGE HELPER
+# =========================
+
+def stage_key(image_key, *config):
+    """
+    Per-stage cache key: the image key plus whatever configuration the stage's
+    output depends on (OCR backend, pipeline mode), so switching OCR_BACKEND or
+    OCR_PIPELINE_MODE doesn't keep serving results produced the old way.
+    """
+    if image_key is None:
+        return None
+    return ":".join([image_key, *config, f"v{STAGE_CACHE_VERSION}"])
+
+async def cached_stage(cache, key, compute, should_store=bool):
+    """
+    Returns the cached value for key, or awaits compute() and stores the
+    result when should_store(result) is true (failed stages are not cached).
+    """
+    if cache is None or key is None:
+        return await compute()
+
+    value = await run_blocking(cache.get, key)
+    if value is not None:
+        return value
+
+    value = await compute()
+    if should_store(value):
+        await run_blocking(cache.set, key, value)
+    return value
@@ -0,0 +1,244 @@
+import atexit
+import bisect
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# =========================
+# CONFIG
+# =========================
+
+# Per-request detail (OCR text, ML results) is logged at DEBUG, so it costs
+# nothing at the default INFO level
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# text: "time level logger message key=value ..." | json: one JSON object per line
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# =========================
+# LOGGING
+# =========================
+
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _STANDARD_ATTRS}
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = f"{self.formatTime(record)} {record.levelname} {record.name} {record.getMessage()}"
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v!r}" if isinstance(v, str) else f"{k}={v}" for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_fields(record)
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+_configured = False
+_listener = None
+_queue_handler = None
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """
+    Routes the "backend" loggers through a queue so formatting and stream
+    writes happen on a listener thread, not on the request path.
+    """
+    global _configured, _listener, _queue_handler
+    if _configured:
+        return
+    _configured = True
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JSONFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(lambda: _listener.stop())
+
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    root = logging.getLogger("backend")
+    root.setLevel(level)
+    root.addHandler(_queue_handler)
+    root.propagate = False
+
+def _restart_listener():
+    # The listener thread does not survive fork() (gunicorn --preload);
+    # each worker starts its own on a fresh queue
+    global _listener
+    if _listener is None:
+        return
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+    _queue_handler.queue = log_queue
+
+os.register_at_fork(after_in_child=_restart_listener)
+
+def get_logger(name: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(name)
+
+# =========================
+# METRICS
+# =========================
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_str(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labels, key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # key -> [bucket counts..., sum, count]
+        self._values = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_label_str(names, key + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_label_str(names, key + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_label_str(self.labels, key)} {series[-1]}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Minimal Prometheus text-format registry. Collectors are callables that
+    return extra exposition lines at scrape time (e.g. cache counters that
+    already live on the cache objects).
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, help_text: str, labels: tuple = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "safebite_stage_duration_seconds", "Wall time per analysis pipeline stage.", ("stage",)
+)
+HTTP_SECONDS = metrics.histogram(
+    "safebite_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status")
+)
+UPSTREAM_SECONDS = metrics.histogram(
+    "safebite_upstream_duration_seconds", "Gemini generate_content latency.", ("model",)
+)
+UPSTREAM_REQUESTS = metrics.counter(
+    "safebite_upstream_requests_total", "Gemini generate_content calls by outcome.", ("model", "outcome")
+)
+UPSTREAM_TOKENS = metrics.counter(
+    "safebite_upstream_tokens_total", "Gemini tokens used, from response usage metadata.", ("model", "kind")
+)
+
+@contextmanager
+def span(stage: str, timings: dict = None):
+    """
+    Times a pipeline stage into the stage histogram, and into timings[stage]
+    (milliseconds) when a per-request timings dict is given.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = round(elapsed * 1000, 1)
+
+def record_upstream(model: str, elapsed: float, response=None, error: Exception = None):
+    """
+    Records one upstream call: latency, outcome and token usage.
+    """
+    UPSTREAM_SECONDS.observe(elapsed, model=model)
+    UPSTREAM_REQUESTS.inc(model=model, outcome="error" if error is not None else "ok")
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        UPSTREAM_TOKENS.inc(getattr(usage, "prompt_token_count", None) or 0, model=model, kind="prompt")
+        UPSTREAM_TOKENS.inc(getattr(usage, "candidates_token_count", None) or 0, model=model, kind="candidates")
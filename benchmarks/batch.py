@@ -0,0 +1,113 @@
+"""
+BATCH ENDPOINT BENCHMARK
+------------------------
+Streams /analyze-batch in-process against the local stub Gemini server:
+the same images sent as separate files and as one zip archive.
+
+Also checks that a bad upload stays a per-image error: a corrupt archive
+posted next to a valid image must still produce both item lines and the
+summary line. Exits non-zero if it doesn't.
+
+Run from the repo root:
+    python -m benchmarks.batch --images 16 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+
+from .load_test import make_label_image
+from .stub_gemini import start_stub_server
+
+# =========================
+# HELPERS
+# =========================
+
+def make_zip(images: list) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for i, image in enumerate(images):
+            zf.writestr(f"label_{i}.jpg", image)
+    return buf.getvalue()
+
+async def stream_batch(client, files: list):
+    """
+    Posts the files and returns (lines, total_ms). In-process the ASGI
+    transport buffers the response, so only the whole stream is timed.
+    """
+    lines = []
+    start = time.perf_counter()
+    async with client.stream("POST", "/analyze-batch", files=files, data={"profile": "General"}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line:
+                lines.append(json.loads(line))
+    return lines, (time.perf_counter() - start) * 1000
+
+async def check_corrupt_archive(client, image: bytes) -> bool:
+    files = [
+        ("files", ("broken.zip", b"PK\x03\x04 not really a zip", "application/zip")),
+        ("files", ("label.jpg", image, "image/jpeg")),
+    ]
+    lines, _ = await stream_batch(client, files)
+    items = {line["filename"]: line for line in lines if "summary" not in line}
+    summary = lines[-1].get("summary") if lines else None
+
+    ok = (
+        "error" in items.get("broken.zip", {})
+        and "result" in items.get("label.jpg", {})
+        and summary == {"total": 2, "succeeded": 1, "failed": 1}
+    )
+    print(f"\nCorrupt archive + valid image: {'ok' if ok else 'FAILED'}")
+    for line in lines:
+        print(f"  {json.dumps(line)[:120]}")
+    return ok
+
+# =========================
+# MAIN
+# =========================
+
+async def main(latency: float, count: int) -> bool:
+    server, url = start_stub_server(latency)
+    os.environ["GEMINI_BASE_URL"] = url
+    os.environ.setdefault("GEMINI_API_KEY", "stub")
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    # Every image is identical; measure the pipeline, not cache hits
+    os.environ["RESULT_CACHE_BACKEND"] = "off"
+
+    import httpx
+    from backend.main import app
+
+    image = make_label_image()
+    images = [image] * count
+    scenarios = {
+        "files": [("files", (f"label_{i}.jpg", img, "image/jpeg")) for i, img in enumerate(images)],
+        "zip": [("files", ("labels.zip", make_zip(images), "application/zip"))],
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=300) as client:
+        print(f"{count} images, stub latency {latency * 1000:.0f} ms per upstream call")
+        print(f"{'upload':>8} {'total ms':>9} {'images/s':>9} {'failed':>7}")
+        for name, files in scenarios.items():
+            lines, total = await stream_batch(client, files)
+            failed = lines[-1]["summary"]["failed"]
+            print(f"{name:>8} {total:>9.0f} {count / (total / 1000):>9.1f} {failed:>7}")
+
+        ok = await check_corrupt_archive(client, image)
+
+    server.shutdown()
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="/analyze-batch benchmark against a stub Gemini server")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per stubbed upstream call")
+    parser.add_argument("--images", type=int, default=16, help="Images per batch")
+    args = parser.parse_args()
+    if not asyncio.run(main(args.latency, args.images)):
+        sys.exit(1)
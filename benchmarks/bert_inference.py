@@ -0,0 +1,92 @@
+"""
+DISTILBERT INFERENCE BENCHMARK
+------------------------------
+Per-batch CPU latency of the batched DistilBERT engine at batch sizes
+1 / 16 / 64 for each inference backend (fp32, int8, onnx), next to the
+keyword classifier.
+
+If the checkpoint weights are not present (e.g. Git LFS not pulled), a
+randomly initialised model with the same config is used: latency depends
+on architecture and sequence length, not on the weight values.
+
+Run from the repo root:
+    python -m benchmarks.bert_inference
+"""
+
+import argparse
+import copy
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from backend.ml.inference import BertClassifier, ML_MODEL_PATH
+from backend.ml.predict import predict_ingredient
+
+BATCH_SIZES = [1, 16, 64]
+
+INGREDIENTS = [
+    "sugar", "wheat flour", "palm oil", "cocoa butter", "soy lecithin", "sodium benzoate",
+    "salt", "natural flavor", "high fructose corn syrup", "citric acid", "monosodium glutamate",
+    "water", "rice flour", "caramel color", "tbhq", "disodium inosinate", "milk solids",
+    "oats", "e330", "yellow 6", "hydrogenated vegetable oil", "maltodextrin", "whey powder",
+]
+
+# =========================
+# HELPERS
+# =========================
+
+def load_model(path: str):
+    from transformers import DistilBertConfig, DistilBertForSequenceClassification
+
+    try:
+        return DistilBertForSequenceClassification.from_pretrained(path), "checkpoint"
+    except Exception as e:
+        print(f"Checkpoint weights unavailable ({e}); using random weights with the same config.\n")
+        return DistilBertForSequenceClassification(DistilBertConfig.from_pretrained(path)), "random-init"
+
+def time_batches(fn, batch: list, repeats: int) -> float:
+    fn(batch)  # warm-up
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(batch)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+# =========================
+# MAIN
+# =========================
+
+def main(repeats: int):
+    rng = random.Random(0)
+    model, source = load_model(ML_MODEL_PATH)
+    print(f"Model weights: {source}, repeats: {repeats}, median ms per batch\n")
+
+    onnx_dir = tempfile.mkdtemp(prefix="bert-onnx-")
+    engines = {
+        "keyword": lambda b: [predict_ingredient(i) for i in b],
+        "fp32": BertClassifier(backend="fp32", model=copy.deepcopy(model)).predict_batch,
+        "int8": BertClassifier(backend="int8", model=copy.deepcopy(model)).predict_batch,
+    }
+    try:
+        engines["onnx"] = BertClassifier(
+            backend="onnx", model=model, onnx_path=os.path.join(onnx_dir, "model.onnx")
+        ).predict_batch
+    except Exception as e:
+        print(f"Skipping onnx: {e}\n")
+
+    print(f"{'engine':>8} " + " ".join(f"{'batch ' + str(b):>10}" for b in BATCH_SIZES) + f" {'per item @64':>13}")
+    for name, fn in engines.items():
+        row = []
+        for size in BATCH_SIZES:
+            batch = [rng.choice(INGREDIENTS) for _ in range(size)]
+            row.append(time_batches(fn, batch, repeats))
+        print(f"{name:>8} " + " ".join(f"{ms:>10.2f}" for ms in row) + f" {row[-1] / BATCH_SIZES[-1]:>13.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched DistilBERT CPU latency")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    main(args.repeats)
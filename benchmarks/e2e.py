@@ -0,0 +1,298 @@
+"""
+END-TO-END BENCHMARK
+--------------------
+Replays a corpus of label images and ingredient lists against /analyze and
+/re-explain, with every Gemini call served by the local fake server
+(benchmarks/stub_gemini.py). You can set its latency, jitter, error rate
+and canned payloads. Each label in benchmarks/data/labels.txt is rendered
+into an image, and the fake server answers OCR calls with one of the
+corpus texts.
+
+Reports per endpoint:
+  - throughput
+  - status counts
+  - p50 / p95 / p99 latency
+  - upstream calls per request
+  - for /analyze, the same percentiles per pipeline stage, from the
+    response's timings_ms
+
+It also reports process memory (RSS before and after, peak RSS). Results
+are written as JSON, tagged with the git commit. --compare prints the
+change against an earlier results file and exits non-zero on a
+regression.
+
+Runs in-process through the ASGI app by default. --url targets a running
+server instead; that server must point at a fake Gemini server itself,
+and memory is then not reported.
+
+Run from the repo root:
+    python -m benchmarks.e2e --requests 200 --concurrency 16 --latency 0.2
+    python -m benchmarks.e2e --error-rate 0.05 --compare benchmarks/results/e2e-<commit>.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from .stub_gemini import load_payloads, start_stub_server
+
+# =========================
+# CONFIG
+# =========================
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "labels.txt")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+PROFILES = ["General", "Diabetic", "Hypertension", "Child", "Allergy-Prone", "Weight Loss"]
+NUTRITION = "NUTRITION FACTS per 100g Energy 480kcal Fat 24g Protein 6g Salt 1.2g Best before 12/2026"
+WARMUP_REQUESTS = 4
+# Stages faster than this are noise for --compare
+MIN_COMPARE_MS = 1.0
+
+# =========================
+# CORPUS
+# =========================
+
+def load_corpus(path: str = CORPUS_PATH) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def make_image(label: str) -> bytes:
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (1200, 900), "white")
+    draw = ImageDraw.Draw(img)
+    draw.text((40, 40), NUTRITION, fill="black")
+    for i in range(0, len(label), 90):
+        draw.text((40, 120 + i // 90 * 24), label[i:i + 90], fill="black")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+def make_analyses(corpus: list) -> list:
+    from backend.ml.predict import predict_ingredients
+    from backend.ocr.parser import parse_ingredients
+
+    return [predict_ingredients(parse_ingredients(f"Ingredients: {label}")["ingredients"]) for label in corpus]
+
+# =========================
+# HELPERS
+# =========================
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def rank(q):
+        return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+    return {
+        "p50": round(rank(0.50), 2),
+        "p95": round(rank(0.95), 2),
+        "p99": round(rank(0.99), 2),
+        "mean": round(sum(ordered) / len(ordered), 2)
+    }
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def git_commit() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except Exception:
+        return {"commit": None, "dirty": None}
+
+async def replay(client, make_request, total: int, concurrency: int, stub) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, stages, statuses = [], {}, {}
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200:
+                for stage, ms in response.json().get("timings_ms", {}).items():
+                    stages.setdefault(stage, []).append(ms)
+
+    calls_before = stub.calls + stub.errors
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": total,
+        "seconds": round(elapsed, 2),
+        "throughput_rps": round(total / elapsed, 2),
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+        "error_rate": round(1 - statuses.get(200, 0) / total, 4),
+        "latency_ms": percentiles(latencies),
+        "stages_ms": {stage: percentiles(v) for stage, v in sorted(stages.items())},
+        "upstream_calls_per_request": round((stub.calls + stub.errors - calls_before) / total, 2)
+    }
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """
+    Prints throughput and p95 changes per endpoint and stage. Returns the
+    regressions beyond threshold (a fraction, e.g. 0.1 for 10%).
+    """
+    regressions = []
+    print(f"\nAgainst {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')}):")
+    if baseline["meta"].get("config") != current["meta"]["config"]:
+        print("  (note: run configuration differs from the baseline)")
+    for name, result in current["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(name)
+        if not old:
+            continue
+        rows = [("throughput_rps", result["throughput_rps"], old["throughput_rps"], True),
+                ("p95 ms", result["latency_ms"].get("p95"), old["latency_ms"].get("p95"), False)]
+        rows += [(f"{stage} p95 ms", s.get("p95"), old.get("stages_ms", {}).get(stage, {}).get("p95"), False)
+                 for stage, s in result["stages_ms"].items()]
+        for metric, new_value, old_value, higher_is_better in rows:
+            if not old_value or new_value is None or (metric.endswith("ms") and max(old_value, new_value) < MIN_COMPARE_MS):
+                continue
+            change = (new_value - old_value) / old_value
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > threshold else ""
+            print(f"  {name:<12} {metric:<22} {old_value:>9} -> {new_value:>9} ({change:+.1%}){flag}")
+            if flag:
+                regressions.append((name, metric, change))
+    return regressions
+
+# =========================
+# MAIN
+# =========================
+
+async def main(args):
+    import httpx
+
+    stub, stub_url = start_stub_server(args.latency, error_rate=0.0, jitter=args.jitter)
+    corpus = load_corpus(args.corpus)
+    stub.ocr_texts = [f"{NUTRITION}\nINGREDIENTS: {label}" for label in corpus]
+    if args.payloads:
+        load_payloads(stub, args.payloads)
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=120)
+    else:
+        os.environ["GEMINI_BASE_URL"] = stub_url
+        os.environ.setdefault("GEMINI_API_KEY", "stub")
+        os.environ.setdefault("LOG_LEVEL", "ERROR")
+        # Measure the pipeline, not the result cache (--cache keeps it on)
+        if not args.cache:
+            os.environ["RESULT_CACHE_BACKEND"] = "off"
+            os.environ["INGREDIENT_KB"] = "0"
+
+        from backend.gemini.models import model_resolver
+        from backend.main import app
+
+        model_resolver.resolve()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+
+    images = [make_image(label) for label in corpus]
+    analyses = make_analyses(corpus)
+    endpoints = {
+        "/analyze": lambda c, i: c.post(
+            "/analyze",
+            files={"file": ("label.jpg", images[i % len(images)], "image/jpeg")},
+            data={"profile": PROFILES[i % len(PROFILES)]}
+        ),
+        "/re-explain": lambda c, i: c.post(
+            "/re-explain",
+            json={"ingredients_analysis": analyses[i % len(analyses)], "profile": PROFILES[i % len(PROFILES)]}
+        ),
+    }
+
+    memory_start = rss_mb() if not args.url else None
+    results = {}
+    async with client:
+        for name, make_request in endpoints.items():
+            # Warm-up: model resolution, lazy indexes, connection pools
+            await replay(client, make_request, WARMUP_REQUESTS, WARMUP_REQUESTS, stub)
+            stub.error_rate = args.error_rate
+            results[name] = replay_result = await replay(client, make_request, args.requests, args.concurrency, stub)
+            stub.error_rate = 0.0
+
+            print(f"\n{name}: {replay_result['throughput_rps']} req/s, status {replay_result['status']}, "
+                  f"{replay_result['upstream_calls_per_request']} upstream calls/request")
+            print(f"  {'':<10} {'p50':>8} {'p95':>8} {'p99':>8}")
+            for stage, p in [("request", replay_result["latency_ms"])] + list(replay_result["stages_ms"].items()):
+                print(f"  {stage:<10} {p['p50']:>8.1f} {p['p95']:>8.1f} {p['p99']:>8.1f}")
+
+    stub.shutdown()
+    memory = None
+    if not args.url:
+        memory = {"rss_start_mb": memory_start, "rss_end_mb": rss_mb(), "peak_rss_mb": peak_rss_mb()}
+        print(f"\nMemory: RSS {memory['rss_start_mb']} -> {memory['rss_end_mb']} MB, peak {memory['peak_rss_mb']} MB")
+
+    report = {
+        "meta": {
+            **git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "target": args.url or "in-process",
+            "config": {
+                "requests": args.requests, "concurrency": args.concurrency, "latency": args.latency,
+                "jitter": args.jitter, "error_rate": args.error_rate, "cache": args.cache,
+                "corpus": os.path.relpath(args.corpus), "labels": len(corpus),
+                "ocr_pipeline_mode": os.getenv("OCR_PIPELINE_MODE", "two_stage"),
+                "ml_classifier": os.getenv("ML_CLASSIFIER", "keyword")
+            }
+        },
+        "endpoints": results,
+        "memory": memory
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"e2e-{report['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end /analyze and /re-explain benchmark against a fake Gemini server")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2, help="Mean seconds per fake Gemini call")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Latency std dev as a fraction of --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake Gemini calls that fail with 503")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="One ingredient list per line")
+    parser.add_argument("--payloads", help="JSON file of canned payloads (see stub_gemini.load_payloads)")
+    parser.add_argument("--cache", action="store_true", help="Keep the result cache and knowledge base on")
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--output", help="Results JSON (default benchmarks/results/e2e-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Regression threshold for --compare")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,114 @@
+"""
+GEMINI CLIENT RESILIENCE
+------------------------
+Exercises the shared Gemini client (backend/gemini/models.py) against the
+local stub server with injected failures:
+
+  flaky   a fraction of calls fail with 503; jittered retries should turn
+          most of them into successes at the cost of extra upstream calls
+  outage  every call fails; the circuit breaker should open after a few
+          failures and the rest fail fast without reaching the server
+  recover the stub comes back; after the cooldown one trial call closes
+          the circuit again and traffic flows normally
+  limit   calls through the token bucket should not exceed the configured rate
+
+Run from the repo root:
+    python -m benchmarks.gemini_resilience --calls 200 --error-rate 0.3
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from .stub_gemini import start_stub_server
+
+# =========================
+# HELPERS
+# =========================
+
+async def fire(generate, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = {}
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await generate(f"OCR text filter call {i}")
+                outcome = "ok"
+            except Exception as e:
+                outcome = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return outcomes, statistics.median(latencies) * 1000
+
+def report(name: str, server, before: tuple, outcomes: dict, p50_ms: float, breaker):
+    calls = server.calls + server.errors - sum(before)
+    print(f"{name:>8}  outcomes={outcomes}  upstream calls={calls}  "
+          f"p50={p50_ms:.0f} ms  circuit={breaker.state}")
+
+# =========================
+# MAIN
+# =========================
+
+async def main(total: int, error_rate: float, concurrency: int, latency: float):
+    server, url = start_stub_server(latency)
+    os.environ["GEMINI_BASE_URL"] = url
+    os.environ.setdefault("GEMINI_API_KEY", "stub")
+    # Short backoff and cooldown so the run takes seconds, not minutes
+    os.environ.setdefault("GEMINI_BACKOFF_BASE", "0.05")
+    os.environ.setdefault("GEMINI_BREAKER_COOLDOWN", "1")
+    # Every retry logs a warning; keep the report readable
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+    from backend.gemini.models import generate_content_async, model_resolver
+    from backend.gemini.resilience import TokenBucket, breaker
+
+    model_resolver.resolve()
+    print(f"stub latency {latency * 1000:.0f} ms, {total} calls at concurrency {concurrency}\n")
+
+    # Flaky upstream: retries absorb transient 503s
+    server.error_rate = error_rate
+    before = (server.calls, server.errors)
+    outcomes, p50 = await fire(generate_content_async, total, concurrency)
+    report("flaky", server, before, outcomes, p50, breaker)
+    breaker.record_success()
+
+    # Full outage: the breaker opens and later calls never leave the process
+    server.error_rate = 1.0
+    before = (server.calls, server.errors)
+    outcomes, p50 = await fire(generate_content_async, total, concurrency)
+    report("outage", server, before, outcomes, p50, breaker)
+
+    # Recovery: after the cooldown a single trial call closes the circuit
+    server.error_rate = 0.0
+    await asyncio.sleep(breaker.cooldown)
+    before = (server.calls, server.errors)
+    await generate_content_async("OCR text filter trial call")
+    outcomes, p50 = await fire(generate_content_async, total, concurrency)
+    report("recover", server, before, outcomes, p50, breaker)
+
+    # Rate limiter: 20 req/s with a burst of 5
+    bucket = TokenBucket(rate=20, capacity=5)
+    n = 45
+    start = time.perf_counter()
+    await asyncio.gather(*(bucket.acquire_async() for _ in range(n)))
+    elapsed = time.perf_counter() - start
+    print(f"{'limit':>8}  {n} acquires at 20/s burst 5 took {elapsed:.2f}s "
+          f"(expected ~{(n - 5) / 20:.2f}s)")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gemini client retries, circuit breaker and rate limiter")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.3, help="Injected 503 rate for the flaky phase")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds per stubbed upstream call")
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.error_rate, args.concurrency, args.latency))
@@ -0,0 +1,96 @@
+"""
+KEYWORD MATCHER BENCHMARK
+-------------------------
+Compares the compiled Aho-Corasick matcher against the old
+`any(k in text for k in keywords)` loop at growing lexicon sizes.
+
+Run from the repo root:
+    python -m benchmarks.keyword_matcher
+"""
+
+import random
+import string
+import time
+
+from backend.ml.matcher import KeywordMatcher
+from backend.ml.predict import HARMFUL_KEYWORDS, MODERATE_KEYWORDS, predict_ingredient
+
+# =========================
+# CONFIG
+# =========================
+
+SIZES = [50, 5000, 50000]
+LABELS = 200
+SEED = 7
+
+SAMPLE_INGREDIENTS = [
+    "sugar", "wheat flour", "palm oil", "cocoa butter", "soy lecithin (emulsifier)",
+    "sodium benzoate", "salt", "natural flavor", "high fructose corn syrup",
+    "citric acid", "monosodium glutamate", "water", "rice flour", "caramel color",
+    "tbhq", "disodium inosinate", "milk solids", "oats", "e330", "yellow 6",
+]
+
+# =========================
+# HELPERS
+# =========================
+
+def make_lexicon(size, rng):
+    keywords = list(HARMFUL_KEYWORDS) + [f"e{n}" for n in range(100, 1600)]
+    while len(keywords) < size:
+        keywords.append("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 14))))
+    return keywords[:size]
+
+def make_labels(rng):
+    return [rng.sample(SAMPLE_INGREDIENTS, rng.randint(5, 15)) for _ in range(LABELS)]
+
+def loop_match(keywords, ingredients):
+    return [any(k in i.lower() for k in keywords) for i in ingredients]
+
+def matcher_match(matcher, ingredients):
+    return [bool(matcher.find(i)) for i in ingredients]
+
+def timed(fn, labels):
+    start = time.perf_counter()
+    out = [fn(label) for label in labels]
+    return (time.perf_counter() - start) * 1000, out
+
+# =========================
+# MAIN
+# =========================
+
+def check_precedence():
+    """
+    Sanity check: the new predict_ingredient agrees with the old any() chain.
+    """
+    for ingredient in SAMPLE_INGREDIENTS:
+        text = ingredient.lower()
+        if any(k in text for k in HARMFUL_KEYWORDS):
+            expected = "Harmfull"
+        elif any(k in text for k in MODERATE_KEYWORDS):
+            expected = "Moderate"
+        else:
+            expected = "Safe"
+        got = predict_ingredient(ingredient)["risk"]
+        assert got == expected, f"{ingredient}: expected {expected}, got {got}"
+
+def main():
+    rng = random.Random(SEED)
+    labels = make_labels(rng)
+    check_precedence()
+
+    print(f"{'keywords':>10} {'build ms':>10} {'loop ms':>10} {'matcher ms':>11} {'speedup':>8}")
+    for size in SIZES:
+        keywords = make_lexicon(size, rng)
+
+        start = time.perf_counter()
+        matcher = KeywordMatcher(keywords)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        loop_ms, loop_out = timed(lambda label: loop_match(keywords, label), labels)
+        matcher_ms, matcher_out = timed(lambda label: matcher_match(matcher, label), labels)
+        assert loop_out == matcher_out, "matcher disagrees with substring loop"
+
+        print(f"{size:>10} {build_ms:>10.1f} {loop_ms:>10.1f} {matcher_ms:>11.1f} {loop_ms / matcher_ms:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
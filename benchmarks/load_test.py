@@ -0,0 +1,101 @@
+"""
+CONCURRENCY LOAD TEST
+---------------------
+Drives /re-explain and /analyze in-process against the local stub Gemini
+server and reports requests/sec at increasing concurrency. With non-blocking
+upstream calls throughput should scale with concurrency until the executor
+or stub saturates; with blocking calls it stays flat at ~1/latency.
+
+Run from the repo root:
+    python -m benchmarks.load_test --latency 0.2 --requests 64
+"""
+
+import argparse
+import asyncio
+import io
+import itertools
+import os
+import statistics
+import time
+
+from .stub_gemini import start_stub_server
+
+CONCURRENCY_LEVELS = [1, 4, 16, 64]
+
+# =========================
+# HELPERS
+# =========================
+
+def make_label_image() -> bytes:
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (400, 200), "white")
+    ImageDraw.Draw(img).text((10, 10), "INGREDIENTS: potato, palm oil, salt", fill="black")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG")
+    return buf.getvalue()
+
+async def run_level(client, make_request, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await make_request(client)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    }
+
+# =========================
+# MAIN
+# =========================
+
+async def main(latency: float, total: int):
+    server, url = start_stub_server(latency)
+    os.environ["GEMINI_BASE_URL"] = url
+    os.environ.setdefault("GEMINI_API_KEY", "stub")
+    # Measure upstream concurrency, not cache hits
+    os.environ["RESULT_CACHE_BACKEND"] = "off"
+
+    import httpx
+    from backend.main import app
+
+    image = make_label_image()
+    analysis = [{"ingredient": "monosodium glutamate", "risk": "Harmfull", "confidence": 0.95}]
+
+    # A unique profile per request keeps single-flight from coalescing the calls
+    profiles = (f"Profile {i}" for i in itertools.count())
+
+    scenarios = {
+        "/re-explain": lambda c: c.post("/re-explain", json={"ingredients_analysis": analysis, "profile": next(profiles)}),
+        "/analyze": lambda c: c.post("/analyze", files={"file": ("label.jpg", image, "image/jpeg")}, data={"profile": next(profiles)}),
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120) as client:
+        for name, make_request in scenarios.items():
+            print(f"\n{name} (stub latency {latency * 1000:.0f} ms per upstream call)")
+            print(f"{'concurrency':>12} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+            for concurrency in CONCURRENCY_LEVELS:
+                stats = await run_level(client, make_request, total, concurrency)
+                print(f"{concurrency:>12} {stats['rps']:>8.1f} {stats['p50_ms']:>8.0f} {stats['p99_ms']:>8.0f}")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrency load test against a stub Gemini server")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per stubbed upstream call")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    args = parser.parse_args()
+    asyncio.run(main(args.latency, args.requests))
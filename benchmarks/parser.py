@@ -0,0 +1,150 @@
+"""
+INGREDIENT PARSER BENCHMARK
+---------------------------
+Compares the original parse_ingredients (kept below as legacy_parse, one
+uncompiled re.search per garbage pattern per item) with the single-pass
+bracket-aware parser, whole-text and streamed in small chunks, on a
+synthetic corpus of 100k labels built from benchmarks/data/labels.txt.
+
+Also checks that ingredients carrying a quantity ("milk 2.5%") and
+E-numbers are kept while packaging text is dropped; exits non-zero if not.
+
+Run from the repo root:
+    python -m benchmarks.parser --labels 100000
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+
+from backend.ocr.parser import IngredientParser, flatten, parse_ingredients
+
+from .risk_engine import load_corpus
+
+NOISE = [
+    "NUTRITION FACTS Energy 480kcal Fat 24g\nINGREDIENTS: ",
+    "Ingredients: ",
+    "",
+]
+# (label, expected ingredient names)
+CHECKS = [
+    ("Ingredients: Milk 2.5%, sugar, 12% cocoa butter, salt 1.2 g",
+     ["milk", "sugar", "cocoa butter", "salt"]),
+    ("Ingredients: acidity regulator (e331), emulsifier e322, chocolate (sugar, cocoa 30%)",
+     ["acidity regulator", "e331", "emulsifier e322", "chocolate", "sugar", "cocoa"]),
+    ("Ingredients: wheat flour, contains 2% or less of (salt). Best before 12/2026. Batch 2231A.",
+     ["wheat flour", "salt"]),
+]
+TRAILERS = ["", " Best before 12/2026.", " Store in a cool dry place.", " Batch 2231A. Packaged in a facility that handles nuts."]
+
+# =========================
+# REFERENCE (original parser)
+# =========================
+
+def legacy_parse(text):
+    if not text or text.strip() == "":
+        return {"ingredients": []}
+
+    text = text.lower().strip()
+    text = text.replace("\n", " ")
+    marker = "ingredients:"
+    if marker in text:
+        text = text.split(marker, 1)[1]
+
+    items = re.split(r",|;|\.|\n", text)
+
+    ingredients = []
+    for item in items:
+        item = item.strip()
+        if len(item) < 3:
+            continue
+        if re.search(r'(?<!e)\d{2,}', item, re.IGNORECASE):
+            continue
+        garbage_patterns = [
+            r'best before', r'batch', r'upright', r'tear', r'store in', r'consume',
+            r'packaged', r'\d+g', r'\d+%', r'calories', r'energy',
+        ]
+        is_garbage = False
+        for pattern in garbage_patterns:
+            if re.search(pattern, item, re.IGNORECASE):
+                is_garbage = True
+                break
+        if not is_garbage:
+            ingredients.append(item)
+
+    return {"ingredients": ingredients}
+
+# =========================
+# CORPUS
+# =========================
+
+def build_corpus(count: int, seed: int = 0) -> list:
+    """
+    Real labels with their top-level ingredients shuffled, plus typical OCR
+    headers and trailers.
+    """
+    rng = random.Random(seed)
+    base = load_corpus()
+    labels = []
+    for _ in range(count):
+        label = rng.choice(base).rstrip(".")
+        # Shuffle at depth 0 only, so brackets stay balanced
+        parts, depth, start = [], 0, 0
+        for i, ch in enumerate(label):
+            if ch in "([":
+                depth += 1
+            elif ch in ")]":
+                depth -= 1
+            elif ch == "," and depth == 0:
+                parts.append(label[start:i].strip())
+                start = i + 1
+        parts.append(label[start:].strip())
+        rng.shuffle(parts)
+        labels.append(rng.choice(NOISE) + ", ".join(parts) + "." + rng.choice(TRAILERS))
+    return labels
+
+def parse_streamed(text: str, chunk_size: int = 64) -> list:
+    parser = IngredientParser()
+    nodes = []
+    for i in range(0, len(text), chunk_size):
+        nodes.extend(parser.feed(text[i:i + chunk_size]))
+    nodes.extend(parser.close())
+    return nodes
+
+# =========================
+# MAIN
+# =========================
+
+def run(name: str, fn, labels: list, count_items) -> None:
+    start = time.perf_counter()
+    items = 0
+    for text in labels:
+        items += count_items(fn(text))
+    elapsed = time.perf_counter() - start
+    print(f"{name:>10} {len(labels) / elapsed:>12.0f} {elapsed * 1e6 / len(labels):>10.1f} {items / len(labels):>10.1f}")
+
+def main(count: int):
+    labels = build_corpus(count)
+    print(f"{count} labels, avg {sum(map(len, labels)) / count:.0f} chars\n")
+    print(f"{'parser':>10} {'labels/s':>12} {'us/label':>10} {'items/label':>10}")
+    run("legacy", legacy_parse, labels, lambda r: len(r["ingredients"]))
+    run("tree", parse_ingredients, labels, lambda r: len(r["ingredients"]))
+    run("streamed", parse_streamed, labels, lambda nodes: len(flatten(nodes)))
+
+    print("\nQuantities, E-numbers and packaging text:")
+    failed = 0
+    for text, expected in CHECKS:
+        got = parse_ingredients(text)["ingredients"]
+        ok = got == expected and flatten(parse_streamed(text, chunk_size=7)) == expected
+        failed += not ok
+        print(f"  {'ok  ' if ok else 'MISS'} {got}" + ("" if ok else f" (expected {expected})"))
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingredient parser benchmark")
+    parser.add_argument("--labels", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.labels)
@@ -0,0 +1,136 @@
+"""
+PIPELINE MODE BENCHMARK
+-----------------------
+Runs a fixture set of generated label images through /analyze's pipeline in
+both OCR modes against a stubbed Gemini client, and reports upstream calls,
+tokens and per-stage latency:
+
+    two_stage: vision OCR -> text filter call
+    single:    one vision call returning filtered ingredients
+
+Run from the repo root:
+    python -m benchmarks.pipeline_modes --latency 0.3
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import statistics
+from types import SimpleNamespace
+
+os.environ["RESULT_CACHE_BACKEND"] = "off"
+os.environ.setdefault("GEMINI_API_KEY", "stub")
+
+from backend import pipeline
+from backend.gemini import models
+
+# =========================
+# FIXTURES
+# =========================
+
+LABELS = [
+    "INGREDIENTS: Potato, Palm Oil, Salt, Sugar, Monosodium Glutamate, Citric Acid",
+    "INGREDIENTS: Wheat Flour, Sugar, Cocoa Butter, Milk Solids, Soy Lecithin, Vanillin",
+    "INGREDIENTS: Corn, Sunflower Oil, Cheese Powder (Milk, Salt, Enzymes), Yellow 6",
+    "INGREDIENTS: Oats, Honey, Almonds, Rice Flour, Sea Salt, Natural Flavor",
+    "INGREDIENTS: Carbonated Water, High Fructose Corn Syrup, Caramel Color, Sodium Benzoate",
+]
+
+NUTRITION = "NUTRITION FACTS per 100g Energy 480kcal Fat 24g Protein 6g Salt 1.2g Best before 12/2026"
+
+# Rough Gemini accounting: ~4 characters per token, fixed cost per image
+IMAGE_TOKENS = 258
+
+def make_image(label: str) -> bytes:
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (1600, 1200), "white")
+    draw = ImageDraw.Draw(img)
+    draw.text((40, 40), NUTRITION, fill="black")
+    draw.text((40, 120), label, fill="black")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+# =========================
+# STUB CLIENT
+# =========================
+
+class StubModels:
+    def __init__(self, latency: float, label_for):
+        self.latency = latency
+        self.label_for = label_for
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    def list(self):
+        return [SimpleNamespace(name="models/gemini-1.5-flash")]
+
+    async def generate_content(self, model, contents, config=None):
+        parts = contents if isinstance(contents, list) else [contents]
+        prompt = " ".join(p for p in parts if isinstance(p, str))
+        images = sum(1 for p in parts if not isinstance(p, str))
+        label = self.label_for()
+
+        if "RETURN ONLY JSON" in prompt and images:
+            text = '{"ingredients_text": "%s", "ingredients": [%s]}' % (
+                label, ", ".join(f'"{i.strip()}"' for i in label.split(":", 1)[1].split(","))
+            )
+        elif images:
+            text = f"{NUTRITION}\n{label}"
+        elif "OCR text filter" in prompt:
+            text = label
+        else:
+            text = '{"harm_explanation": "stub", "risk_factors": [], "alternatives": [], "commercial_alternatives": [], "ingredient_explanations": {}}'
+
+        prompt_tokens = len(prompt) // 4 + images * IMAGE_TOKENS
+        output_tokens = len(text) // 4
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.output_tokens += output_tokens
+
+        # Latency grows with output length, like real decoding
+        await asyncio.sleep(self.latency + output_tokens * 0.002)
+        return SimpleNamespace(text=text, usage_metadata=SimpleNamespace(
+            prompt_token_count=prompt_tokens, candidates_token_count=output_tokens
+        ))
+
+# =========================
+# MAIN
+# =========================
+
+async def run_mode(mode: str, images: list, latency: float):
+    current = {"label": None}
+    stub = StubModels(latency, lambda: current["label"])
+    models.client = SimpleNamespace(models=stub, aio=SimpleNamespace(models=stub))
+    models.model_resolver.resolve()
+    pipeline.OCR_PIPELINE_MODE = mode
+
+    stage_times = {}
+    for label, image in zip(LABELS, images):
+        current["label"] = label
+        result = await pipeline.analyze_image(image, "General")
+        for stage, ms in result["timings_ms"].items():
+            stage_times.setdefault(stage, []).append(ms)
+
+    return stub, {stage: statistics.mean(ms) for stage, ms in stage_times.items()}
+
+async def main(latency: float):
+    images = [make_image(label) for label in LABELS]
+
+    print(f"{len(images)} fixture labels, stub latency {latency * 1000:.0f} ms + 2 ms/output token\n")
+    for mode in ["two_stage", "single"]:
+        stub, means = await run_mode(mode, images, latency)
+        calls = stub.calls / len(images)
+        tokens = (stub.prompt_tokens + stub.output_tokens) / len(images)
+        stages = ", ".join(f"{k} {v:.0f}" for k, v in means.items())
+        print(f"{mode:>10}: {calls:.1f} calls/label, {tokens:.0f} tokens/label")
+        print(f"{'':>10}  mean ms -> {stages}\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two-stage and single-call OCR modes")
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds per stubbed upstream call")
+    args = parser.parse_args()
+    asyncio.run(main(args.latency))
@@ -0,0 +1,98 @@
+"""
+PREPROCESSING BENCHMARK
+-----------------------
+Compares the classic full-frame preprocess_image (2x INTER_CUBIC upscale of
+the whole photo) with the region-detect + tiled pipeline at several photo
+resolutions. Reports ms per image and peak RSS growth over the process
+baseline (Linux VmHWM); every measurement runs in a fresh process so peaks
+don't leak between runs.
+
+Run from the repo root:
+    python -m benchmarks.preprocess
+"""
+
+import multiprocessing as mp
+import resource
+import statistics
+import time
+
+RESOLUTIONS = [(1280, 960), (2048, 1536), (3024, 2268), (4032, 3024)]  # ~1, 3, 7, 12 MP
+REPEATS = 3
+
+# =========================
+# FIXTURES
+# =========================
+
+def make_label(width: int, height: int) -> bytes:
+    """
+    Two-column ingredient panel on a noisy background, text scaled with the photo.
+    """
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    img = rng.integers(190, 255, (height, width, 1), dtype=np.uint8).repeat(3, axis=2)
+    font_scale = height / 1500
+    thickness = max(1, int(2 * font_scale))
+    for col in range(2):
+        x = int(width * 0.1) + col * int(width * 0.42)
+        for i in range(18):
+            y = int(height * 0.25) + i * int(64 * font_scale)
+            cv2.putText(img, "sugar, palm oil, salt, e330", (x, y),
+                        cv2.FONT_HERSHEY_SIMPLEX, font_scale, (20, 20, 20), thickness)
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return buf.tobytes()
+
+# =========================
+# WORKER
+# =========================
+
+def _rss_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _measure(method: str, data: bytes, queue):
+    from backend.ocr import preprocess
+
+    run = preprocess.preprocess_image if method == "full" else preprocess.preprocess_tiles
+    try:
+        # Reset the high-water mark so import-time allocations don't mask ours
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    before = _rss_kb("VmRSS:")
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        run(data)
+        times.append((time.perf_counter() - start) * 1000)
+    queue.put((statistics.median(times), (_rss_kb("VmHWM:") - before) / 1024))
+
+def measure(method: str, data: bytes):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(method, data, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+# =========================
+# MAIN
+# =========================
+
+def main():
+    print(f"{'resolution':>12} {'MP':>5} | {'full ms':>8} {'full MB':>8} | {'tiled ms':>8} {'tiled MB':>8}")
+    for width, height in RESOLUTIONS:
+        data = make_label(width, height)
+        full_ms, full_mb = measure("full", data)
+        tiled_ms, tiled_mb = measure("tiled", data)
+        print(f"{width:>5}x{height:<6} {width * height / 1e6:>5.1f} | "
+              f"{full_ms:>8.0f} {full_mb:>8.1f} | {tiled_ms:>8.0f} {tiled_mb:>8.1f}")
+
+if __name__ == "__main__":
+    main()
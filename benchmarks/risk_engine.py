@@ -0,0 +1,149 @@
+"""
+RISK ENGINE BENCHMARK
+---------------------
+Checks that the index-based RiskEngine returns exactly the same score,
+level and breakdown as the original five-scan calculate_risk_score
+(kept below as legacy_risk_score) on a corpus of real product labels plus
+randomly generated labels, then compares their speed. Also compares the
+engine's single-pass term scan with per-term substring checks as the term
+list grows.
+
+Run from the repo root:
+    python -m benchmarks.risk_engine
+"""
+
+import argparse
+import os
+import random
+import time
+
+from backend.ml.predict import predict_ingredient
+from backend.ocr.parser import parse_ingredients
+from backend.ml.risk_engine import RiskEngine, risk_engine
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "labels.txt")
+
+# =========================
+# REFERENCE (original engine)
+# =========================
+
+def legacy_risk_score(ingredients_text: str, ml_results: list) -> dict:
+    score = 0
+    breakdown = []
+
+    preservatives = ["benzoate", "sorbate", "nitrate", "nitrite", "bbq", "tbhq", "bha", "bht", "gallate", "metabisulfite"]
+    if any(p in ingredients_text.lower() for p in preservatives):
+        score += 25
+        breakdown.append("Contains Artificial Preservatives (+25)")
+
+    sugar_salt_fat = ["sugar", "syrup", "dextrose", "fructose", "sucrose", "maltodextrin", "sodium", "salt", "oil", "fat", "glucose", "cane", "corn syrup"]
+    matches = [s for s in sugar_salt_fat if s in ingredients_text.lower()]
+    if len(matches) >= 2:
+        score += 20
+        breakdown.append("High Sugar/Sodium/Fat Content (+20)")
+
+    harmful_count = sum(1 for r in ml_results if r["risk"] == "Harmfull")
+    if harmful_count > 0:
+        score += 20
+        breakdown.append(f"Contains {harmful_count} Harmful Additives (+20)")
+
+    allergens = ["soy", "peanut", "milk", "gluten", "wheat", "egg", "fish", "shellfish", "nut", "dairy", "lactose", "casein"]
+    if any(a in ingredients_text.lower() for a in allergens):
+        score += 15
+        breakdown.append("Contains Common Allergens (+15)")
+
+    processed = ["hydrolyzed", "isolate", "modified starch", "hydrogenated", "flavor", "colour", "color", "acid", "gum", "emulsifier", "stabilizer", "artificial", "extract"]
+    if any(p in ingredients_text.lower() for p in processed):
+        score += 20
+        breakdown.append("Ultra-processed Ingredients (+20)")
+
+    final_score = min(score, 100)
+    if final_score <= 30:
+        level = "Safe"
+    elif final_score <= 60:
+        level = "Moderate"
+    else:
+        level = "High Risk"
+
+    return {"score": final_score, "level": level, "breakdown": breakdown}
+
+# =========================
+# CORPUS
+# =========================
+
+FILLER = ["water", "rice", "vinegar", "paprika", "(", ")", ":", "and", "contains 2% or less of", "e330", "beans"]
+
+def load_corpus() -> list:
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def random_labels(count: int, seed: int = 0) -> list:
+    """
+    Random mixes of category terms and filler, with random case and separators,
+    so overlapping terms ("corn syrup" / "syrup") and term boundaries get exercised.
+    """
+    rng = random.Random(seed)
+    vocabulary = list(risk_engine.index) + FILLER
+    labels = []
+    for _ in range(count):
+        words = rng.sample(vocabulary, rng.randint(0, 12))
+        words = [w.upper() if rng.random() < 0.2 else w.title() if rng.random() < 0.3 else w for w in words]
+        labels.append(rng.choice([", ", " ", ",", "; "]).join(words))
+    return labels
+
+def with_results(labels: list) -> list:
+    return [(text, [predict_ingredient(i) for i in parse_ingredients(text)["ingredients"]]) for text in labels]
+
+# =========================
+# MAIN
+# =========================
+
+def substring_scan(text: str, terms: list) -> list:
+    return [t for t in terms if t in text]
+
+def time_per_call(fn, cases: list, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for text, results in cases:
+            fn(text, results)
+    return (time.perf_counter() - start) / (repeats * len(cases)) * 1e6
+
+def main(random_count: int, repeats: int):
+    real = with_results(load_corpus())
+    generated = with_results(random_labels(random_count))
+
+    mismatches = 0
+    for text, results in real + generated:
+        expected = legacy_risk_score(text, results)
+        actual = risk_engine.score(text, results)
+        if expected != actual:
+            mismatches += 1
+            print(f"MISMATCH: {text!r}\n  legacy: {expected}\n  engine: {actual}")
+    print(f"Equivalence: {len(real)} real + {len(generated)} random labels, {mismatches} mismatches")
+    if mismatches:
+        raise SystemExit(1)
+
+    legacy_us = time_per_call(legacy_risk_score, real, repeats)
+    engine_us = time_per_call(risk_engine.score, real, repeats)
+    print(f"\n{'engine':>8} {'us/label':>10}")
+    print(f"{'legacy':>8} {legacy_us:>10.1f}")
+    print(f"{'engine':>8} {engine_us:>10.1f}  ({legacy_us / engine_us:.1f}x)")
+
+    # Scan cost vs number of terms (real label words plus random padding)
+    rng = random.Random(1)
+    words = sorted({w.strip("().,:;[]%") for text, _ in real for w in text.lower().replace(",", " ").split() if len(w) > 3})
+    print(f"\n{'terms':>8} {'single pass us':>15} {'per-term in us':>15}")
+    for n in (len(risk_engine.index), 200, 500):
+        terms = rng.sample(words, min(n, len(words)))
+        terms += ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=6)) for _ in range(n - len(terms))]
+        engine = RiskEngine({"categories": [{"name": "all", "label": "all", "weight": 1, "terms": terms}]})
+        single = time_per_call(lambda text, _: engine.find_terms(text), real, repeats // 2)
+        per_term = time_per_call(lambda text, _: substring_scan(text.lower(), terms), real, repeats // 2)
+        print(f"{n:>8} {single:>15.1f} {per_term:>15.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RiskEngine equivalence check and micro-benchmark")
+    parser.add_argument("--random", type=int, default=20000, help="Randomly generated labels to check")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+    main(args.random, args.repeats)
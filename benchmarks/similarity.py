@@ -0,0 +1,130 @@
+"""
+NEAREST-NEIGHBOUR CLASSIFIER BENCHMARK
+--------------------------------------
+Query latency of the ingredient similarity index (backend/ml/similarity.py)
+against vocabulary size, exact matrix product vs the IVF approximate index,
+plus IVF recall@1 against exact search. Every query is one label's worth of
+ingredients looked up in a single batch.
+
+Also checks that misspelled concerning ingredients (OCR typos) are labeled
+from their nearest keyword, and that common safe ingredients stay Safe:
+exits non-zero if any of those picks up a risk label.
+
+Run from the repo root:
+    python -m benchmarks.similarity
+"""
+
+import random
+import statistics
+import string
+import sys
+import time
+
+import numpy as np
+
+from backend.ml.predict import HARMFUL_KEYWORDS, MODERATE_KEYWORDS
+from backend.ml.similarity import SimilarityIndex
+
+# =========================
+# CONFIG
+# =========================
+
+SIZES = [1000, 10000, 100000]
+LABELS = 100
+SEED = 7
+
+MISSPELLED = {
+    "sodum benzoat": "Harmfull", "monosodum glutamat": "Harmfull", "aspartam": "Harmfull",
+    "sucralos": "Harmfull", "hydrogenatd palm oil": "Harmfull", "potassium sorbat": "Harmfull",
+    "saccharine": "Harmfull", "maltodextrn": "Moderate", "dextrse": "Moderate", "lecithn": "Moderate",
+}
+SAFE = [
+    "water", "wheat flour", "rice", "oats", "milk solids", "cocoa butter", "potato", "tomato paste",
+    "egg yolk", "vinegar", "natural vanilla", "butter", "cream", "peanut", "xanthan", "sunflower oil",
+    # Look-alikes of keyword terms that should not borrow their label
+    "potassium chloride", "potassium iodide", "calcium citrate", "magnesium citrate", "calcium carbonate",
+    "riboflavin", "niacin", "corn", "corn flour", "yellow corn flour", "soybean",
+    "soybeans", "palm", "red pepper", "blue cheese", "glucosamine", "cocoa powder", "barley malt",
+    "sea vegetables", "yeast", "skimmed milk powder", "cornmeal", "whole grain oats", "almonds",
+]
+
+# =========================
+# HELPERS
+# =========================
+
+def make_vocabulary(size, rng):
+    names = list(HARMFUL_KEYWORDS) + list(MODERATE_KEYWORDS)
+    risks = ["Harmfull"] * len(HARMFUL_KEYWORDS) + ["Moderate"] * len(MODERATE_KEYWORDS)
+    while len(names) < size:
+        words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+                 for _ in range(rng.randint(1, 3))]
+        names.append(" ".join(words))
+        risks.append(rng.choice(["Safe", "Safe", "Moderate", "Harmfull"]))
+    return names[:size], risks[:size]
+
+def make_labels(names, rng):
+    # Ingredients near (but not equal to) vocabulary entries, like OCR output
+    labels = []
+    for _ in range(LABELS):
+        label = []
+        for name in rng.sample(names, rng.randint(5, 20)):
+            chars = list(name)
+            chars[rng.randrange(len(chars))] = rng.choice(string.ascii_lowercase)
+            label.append("".join(chars))
+        labels.append(label)
+    return labels
+
+def timed_queries(index, labels):
+    times, tops = [], []
+    for label in labels:
+        start = time.perf_counter()
+        top, _ = index.query(label, k=5)
+        times.append((time.perf_counter() - start) * 1000)
+        tops.append(top[:, 0])
+    return times, tops
+
+# =========================
+# MAIN
+# =========================
+
+def main():
+    rng = random.Random(SEED)
+
+    print(f"{'vocab':>8} {'index':>6} {'build ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'recall@1':>9} {'matrix MB':>10}")
+    for size in SIZES:
+        names, risks = make_vocabulary(size, rng)
+        labels = make_labels(names, rng)
+
+        exact_tops = None
+        for kind in ("exact", "ivf"):
+            start = time.perf_counter()
+            index = SimilarityIndex(names, risks, index=kind)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            times, tops = timed_queries(index, labels)
+            if kind == "exact":
+                exact_tops, recall = tops, 1.0
+            else:
+                recall = float(np.mean(np.concatenate([a == b for a, b in zip(tops, exact_tops)])))
+            p95 = statistics.quantiles(times, n=20)[-1]
+            print(f"{size:>8} {kind:>6} {build_ms:>9.0f} {statistics.median(times):>8.2f} {p95:>8.2f} "
+                  f"{recall:>9.3f} {index.matrix.nbytes / 1e6:>10.1f}")
+
+    names = list(HARMFUL_KEYWORDS) + list(MODERATE_KEYWORDS)
+    index = SimilarityIndex(names, ["Harmfull"] * len(HARMFUL_KEYWORDS) + ["Moderate"] * len(MODERATE_KEYWORDS))
+    print("\nKeyword vocabulary, misspelled and safe ingredients:")
+    flagged = []
+    for result in index.classify(list(MISSPELLED) + SAFE):
+        expected = MISSPELLED.get(result["ingredient"], "Safe")
+        mark = "ok  " if result["risk"] == expected else "MISS"
+        if expected == "Safe" and result["risk"] != "Safe":
+            flagged.append(result["ingredient"])
+        print(f"  {mark} {result['ingredient']:<22} {result['risk']:<9} conf={result['confidence']:.2f} "
+              f"nearest={result['nearest']} ({result['similarity']:.2f})")
+
+    if flagged:
+        print(f"\nSafe ingredients labeled risky: {', '.join(flagged)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
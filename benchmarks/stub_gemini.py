@@ -0,0 +1,233 @@
+"""
+LOCAL STUB GEMINI SERVER
+------------------------
+A tiny threaded HTTP server that speaks enough of the Gemini REST API
+(models.list, generateContent and streamGenerateContent) for load tests. Each call sleeps for a
+configurable latency (optionally jittered) and returns a canned OCR, filter
+or explain payload. A fraction of generateContent calls can be failed on
+purpose (--error-rate, --error-status) to exercise client retries and the
+circuit breaker.
+
+OCR replies are picked per image from `server.ocr_texts` (by a hash of the
+image data, so the same image always reads the same). The filter reply
+echoes the INGREDIENTS line of the OCR text it was given. --payloads loads
+a JSON file with any of {"ocr": [...], "filter": "...", "explain": {...}}.
+
+Point the backend at it with:
+    GEMINI_BASE_URL=http://127.0.0.1:<port>/ GEMINI_API_KEY=stub
+"""
+
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =========================
+# CANNED PAYLOADS
+# =========================
+
+MODELS = ["models/gemini-1.5-flash", "models/gemini-1.5-pro"]
+
+OCR_TEXT = (
+    "NUTRITION FACTS Energy 480kcal Fat 24g\n"
+    "INGREDIENTS: Potato, Palm Oil, Salt, Sugar, Monosodium Glutamate, "
+    "Maltodextrin, Citric Acid, Sodium Benzoate, Natural Flavor.\n"
+    "Best before 12/2026"
+)
+
+FILTERED_TEXT = (
+    "Ingredients: Potato, Palm Oil, Salt, Sugar, Monosodium Glutamate, "
+    "Maltodextrin, Citric Acid, Sodium Benzoate, Natural Flavor"
+)
+
+EXPLANATION = {
+    "harm_explanation": "Contains MSG and palm oil, which are best limited.",
+    "risk_factors": ["High sodium", "Refined oils", "Flavor enhancers"],
+    "alternatives": [
+        {"name": "Roasted chickpeas", "why": "Whole food", "how_to_use": "Snack", "benefit": "Fiber"},
+        {"name": "Air-popped popcorn", "why": "Low fat", "how_to_use": "Snack", "benefit": "Whole grain"},
+        {"name": "Baked sweet potato chips", "why": "No additives", "how_to_use": "Snack", "benefit": "Vitamin A"}
+    ],
+    "commercial_alternatives": [
+        {"product_name": "Brand X Baked", "why_better": "Less oil", "availability": "Supermarkets"},
+        {"product_name": "Brand Y Lightly Salted", "why_better": "Less sodium", "availability": "Online"},
+        {"product_name": "Brand Z Veggie Crisps", "why_better": "No MSG", "availability": "Supermarkets"}
+    ],
+    "ingredient_explanations": {"monosodium glutamate": "Flavor enhancer some people are sensitive to."}
+}
+
+# =========================
+# SERVER
+# =========================
+
+_INGREDIENTS_LINE = re.compile(r"ingredients\s*:\s*([^\n]+)", re.IGNORECASE)
+
+def _filter_reply(prompt: str, default: str) -> str:
+    match = _INGREDIENTS_LINE.search(prompt)
+    return f"Ingredients: {match.group(1).strip().rstrip('.')}" if match else default
+
+def _pick_payload(server, body: dict) -> str:
+    parts = [p for c in body.get("contents", []) for p in c.get("parts", [])]
+    text = " ".join(p.get("text", "") for p in parts)
+    images = [p.get("inlineData") or p.get("inline_data") for p in parts if "inlineData" in p or "inline_data" in p]
+    if images:
+        data = str(images[0].get("data", "")).encode()
+        return server.ocr_texts[zlib.crc32(data) % len(server.ocr_texts)]
+    if "For EACH ingredient below" in text:
+        # Knowledge-base warm-up: one line per "- name" in the prompt
+        names = [line[2:].strip() for line in text.splitlines() if line.startswith("- ")]
+        return json.dumps({name: f"Stub explanation for {name}." for name in names})
+    if "food safety and nutrition expert" in text:
+        return json.dumps(server.explanation)
+    if "OCR text filter" in text:
+        return _filter_reply(text, server.filtered_text)
+    return server.ocr_texts[0]
+
+# streamGenerateContent replies are split into this many SSE events
+STREAM_CHUNKS = 4
+
+_ERROR_STATUS = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+
+def _make_handler(latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, payload: dict, status: int = 200):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if "/models" in self.path:
+                self._send({"models": [{"name": m, "supportedActions": ["generateContent"]} for m in MODELS]})
+            else:
+                self._send({"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}}, 404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            path = self.path.split("?")[0]
+            streaming = path.endswith(":streamGenerateContent")
+            if not streaming and not path.endswith(":generateContent"):
+                return self._send({"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}}, 404)
+
+            # A stream spends the same total latency, spread over its chunks
+            server = self.server
+            delay = max(0.0, random.gauss(latency, latency * server.jitter)) if server.jitter else latency
+            time.sleep(delay / STREAM_CHUNKS if streaming else delay)
+            if server.error_rate and random.random() < server.error_rate:
+                server.errors += 1
+                return self._send({"error": {
+                    "code": server.error_status,
+                    "message": "injected failure",
+                    "status": _ERROR_STATUS.get(server.error_status, "UNKNOWN")
+                }}, server.error_status)
+
+            self.server.calls += 1
+            text = _pick_payload(server, body)
+            if streaming:
+                return self._stream(text, length)
+            self._send({
+                "candidates": [{
+                    "content": {"role": "model", "parts": [{"text": text}]},
+                    "finishReason": "STOP",
+                    "index": 0
+                }],
+                "usageMetadata": {
+                    "promptTokenCount": length // 4,
+                    "candidatesTokenCount": len(text) // 4,
+                    "totalTokenCount": length // 4 + len(text) // 4
+                }
+            })
+
+        def _stream(self, text: str, prompt_length: int):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+
+            size = -(-len(text) // STREAM_CHUNKS)
+            pieces = [text[i:i + size] for i in range(0, len(text), size)]
+            for i, piece in enumerate(pieces):
+                if i:
+                    time.sleep(latency / STREAM_CHUNKS)
+                chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": piece}]}, "index": 0}]}
+                if i == len(pieces) - 1:
+                    chunk["candidates"][0]["finishReason"] = "STOP"
+                    chunk["usageMetadata"] = {
+                        "promptTokenCount": prompt_length // 4,
+                        "candidatesTokenCount": len(text) // 4,
+                        "totalTokenCount": prompt_length // 4 + len(text) // 4
+                    }
+                self.wfile.write(f"data: {json.dumps(chunk)}\r\n\r\n".encode())
+                self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Default backlog of 5 drops connections under load tests
+    request_queue_size = 256
+    # Fraction of generateContent calls to fail; can be changed while running
+    error_rate = 0.0
+    error_status = 503
+    # Successful and injected-failure generateContent calls
+    calls = 0
+    errors = 0
+    # Latency standard deviation as a fraction of the mean (0 = fixed latency)
+    jitter = 0.0
+    # Canned replies; replace per server (see load_payloads)
+    ocr_texts = [OCR_TEXT]
+    filtered_text = FILTERED_TEXT
+    explanation = EXPLANATION
+
+def load_payloads(server, path: str):
+    with open(path, encoding="utf-8") as f:
+        payloads = json.load(f)
+    if payloads.get("ocr"):
+        server.ocr_texts = list(payloads["ocr"])
+    server.filtered_text = payloads.get("filter", server.filtered_text)
+    server.explanation = payloads.get("explain", server.explanation)
+
+def start_stub_server(latency: float = 0.2, port: int = 0, error_rate: float = 0.0, error_status: int = 503,
+                      jitter: float = 0.0):
+    """
+    Starts the stub in a daemon thread. Returns (server, base_url).
+    """
+    server = StubServer(("127.0.0.1", port), _make_handler(latency))
+    server.error_rate = error_rate
+    server.error_status = error_status
+    server.jitter = jitter
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local stub Gemini server")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of generateContent calls to fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status for injected failures")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latency std dev as a fraction of --latency")
+    parser.add_argument("--payloads", help='JSON file with canned {"ocr": [...], "filter": "...", "explain": {...}}')
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.latency, args.port, args.error_rate, args.error_status, args.jitter)
+    if args.payloads:
+        load_payloads(server, args.payloads)
+    print(f"Stub Gemini listening on {url} (latency {args.latency}s, error rate {args.error_rate})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
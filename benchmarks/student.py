@@ -0,0 +1,160 @@
+"""
+DISTILLED STUDENT BENCHMARK
+---------------------------
+Distills the hashed n-gram student (backend/ml/student.py) from the
+DistilBERT teacher on a train split, then compares keyword, student and
+teacher on a held-out split: accuracy against the dataset labels,
+agreement with the teacher, and median ms to label a 20-ingredient list.
+It also reports the student's artifact size and load time.
+
+Data comes from the dataset shards (ML_DATASET_PATH). If there are none,
+the ingredients of benchmarks/data/labels.txt are labeled the way
+generate_ingredient_risk_dataset.py does, with OCR-style typos added.
+If the teacher weights are missing (e.g. Git LFS not pulled), the student
+learns from the hard labels only. The teacher's latency is then measured
+with random weights and it gets no accuracy.
+
+Run from the repo root:
+    python -m benchmarks.student
+    python -m benchmarks.student --teacher path/to/checkpoint
+"""
+
+import argparse
+import glob
+import os
+import random
+import statistics
+import string
+import tempfile
+import time
+
+import numpy as np
+
+from backend.ml.dataset import DATASET_PATH, iter_labeled_rows
+from backend.ml.inference import BertClassifier, LABELS, ML_MODEL_PATH
+from backend.ml.predict import predict_ingredient
+from backend.ml.student import StudentClassifier, distill, teacher_logits
+
+# =========================
+# CONFIG
+# =========================
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "labels.txt")
+LABEL_SIZE = 20
+TYPOS_PER_INGREDIENT = 8
+TEST_FRACTION = 0.2
+SEED = 7
+
+RISK_IDS = {v: k for k, v in LABELS.items()}
+
+# =========================
+# HELPERS
+# =========================
+
+def typo(text, rng):
+    chars = list(text)
+    i = rng.randrange(len(chars))
+    op = rng.choice(("drop", "swap", "replace"))
+    if op == "drop" and len(chars) > 3:
+        del chars[i]
+    elif op == "swap" and i + 1 < len(chars):
+        chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    else:
+        chars[i] = rng.choice(string.ascii_lowercase)
+    return "".join(chars)
+
+def load_rows(path, rng, max_rows):
+    paths = sorted(glob.glob(path))
+    if paths:
+        rows = {}
+        for text, label in iter_labeled_rows(paths):
+            rows.setdefault(text, label)
+            if len(rows) >= max_rows:
+                break
+        return list(rows.items()), f"{len(paths)} dataset shards"
+
+    from generate_ingredient_risk_dataset import assign_label, split_ingredients
+
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        names = sorted({i for line in f for i in split_ingredients(line.strip().rstrip("."))})
+    rows = {}
+    for name in names:
+        rows[name] = assign_label(name)
+        for _ in range(TYPOS_PER_INGREDIENT):
+            variant = typo(name, rng)
+            rows.setdefault(variant, assign_label(variant))
+    return list(rows.items()), f"{len(names)} ingredients from {os.path.basename(CORPUS_PATH)} plus typos"
+
+def load_teacher(path):
+    try:
+        return BertClassifier(path, "int8"), True
+    except Exception as e:
+        from transformers import DistilBertConfig, DistilBertForSequenceClassification
+
+        print(f"Teacher weights unavailable ({e}); random weights for latency only.\n")
+        model = DistilBertForSequenceClassification(DistilBertConfig.from_pretrained(path))
+        return BertClassifier(path, "int8", model=model), False
+
+def median_ms(fn, labels):
+    fn(labels[0])  # warm-up
+    samples = []
+    for label in labels:
+        start = time.perf_counter()
+        fn(label)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+# =========================
+# MAIN
+# =========================
+
+def main(data, teacher_path, max_rows):
+    rng = random.Random(SEED)
+    rows, source = load_rows(data, rng, max_rows)
+    rng.shuffle(rows)
+    n_test = int(len(rows) * TEST_FRACTION)
+    test, train = rows[:n_test], rows[n_test:]
+    print(f"Data: {source}; {len(train)} train / {len(test)} test rows\n")
+
+    teacher, trained = load_teacher(teacher_path)
+    train_texts = [t for t, _ in train]
+    soft = None
+    if trained:
+        start = time.perf_counter()
+        soft = teacher_logits(train_texts, teacher)
+        print(f"Teacher logits: {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    student = distill(train_texts, np.array([l for _, l in train]), soft)
+    print(f"Distillation:   {time.perf_counter() - start:.1f}s")
+
+    path = os.path.join(tempfile.mkdtemp(prefix="student-"), "student.npz")
+    student.save(path)
+    start = time.perf_counter()
+    student = StudentClassifier.load(path)
+    print(f"Artifact:       {os.path.getsize(path) / 1024:.0f} KB, loads in {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    test_texts = [t for t, _ in test]
+    gold = np.array([l for _, l in test])
+    engines = {
+        "keyword": lambda b: [predict_ingredient(i) for i in b],
+        "student": student.predict_batch,
+        "teacher": teacher.predict_batch,
+    }
+    predictions = {name: np.array([RISK_IDS[r["risk"]] for r in fn(test_texts)]) for name, fn in engines.items()}
+    labels = [rng.sample(test_texts, min(LABEL_SIZE, len(test_texts))) for _ in range(50)]
+
+    print(f"{'engine':>8} {'accuracy':>9} {'teacher agreement':>18} {f'ms / {LABEL_SIZE} items':>14}")
+    for name, fn in engines.items():
+        accuracy = float((predictions[name] == gold).mean()) if name != "teacher" or trained else None
+        agreement = float((predictions[name] == predictions["teacher"]).mean()) if trained else None
+        print(f"{name:>8} {accuracy if accuracy is not None else float('nan'):>9.3f} "
+              f"{agreement if agreement is not None else float('nan'):>18.3f} {median_ms(fn, labels):>14.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distilled student vs DistilBERT vs keywords")
+    parser.add_argument("--data", default=DATASET_PATH, help="Glob of dataset shards")
+    parser.add_argument("--teacher", default=ML_MODEL_PATH)
+    parser.add_argument("--max-rows", type=int, default=200000)
+    args = parser.parse_args()
+    main(args.data, args.teacher, args.max_rows)
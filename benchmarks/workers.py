@@ -0,0 +1,189 @@
+"""
+MULTI-WORKER SERVING BENCHMARK
+------------------------------
+Starts the production profile (gunicorn.conf.py: gunicorn + uvicorn
+workers, preloaded app, SQLite caches) against the local stub Gemini
+server at 1 / 2 / 4 workers, then drives /analyze over real HTTP.
+
+  miss    every request is a new image, so each one runs the full pipeline
+          (preprocess, stub OCR + filter, parse, classify, stub explain)
+  shared  requests cycle over a few images; the SQLite cache is shared,
+          so a label analyzed by one worker is a hit for all of them
+          (upstream calls per request shows it)
+
+Memory is reported as total RSS and PSS of the master plus workers (Linux
+/proc). PSS splits shared pages between processes, so the gap to RSS is
+what the copy-on-write preload saves. The last row repeats 4 workers with
+preload off for comparison.
+
+Run from the repo root:
+    python -m benchmarks.workers --latency 0.05 --requests 200
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from .stub_gemini import start_stub_server
+
+RUNS = [(1, True), (2, True), (4, True), (4, False)]
+SHARED_IMAGES = 8
+
+# =========================
+# HELPERS
+# =========================
+
+def make_label_image(seed: int) -> bytes:
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    img = Image.new("RGB", (400, 200), "white")
+    draw = ImageDraw.Draw(img)
+    draw.text((10, 10), "INGREDIENTS: potato, palm oil, salt", fill="black")
+    draw.text((10, 40), f"LOT {seed}", fill="black")
+    for _ in range(20):
+        x, y = rng.randrange(400), rng.randrange(60, 200)
+        draw.point((x, y), fill="black")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG")
+    return buf.getvalue()
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(workers: int, preload: bool, stub_url: str, data_dir: str):
+    port = free_port()
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_PRELOAD="1" if preload else "0",
+        GEMINI_BASE_URL=stub_url,
+        GEMINI_API_KEY="stub",
+        LOG_LEVEL="WARNING",
+        RESULT_CACHE_BACKEND="sqlite",
+        RESULT_CACHE_PATH=os.path.join(data_dir, "cache.sqlite3"),
+        JOB_QUEUE_BACKEND="sqlite",
+        JOB_QUEUE_PATH=os.path.join(data_dir, "jobs.sqlite3"),
+        INGREDIENT_KB_PATH=os.path.join(data_dir, "knowledge.sqlite3"),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "backend.main:app", "-c", "gunicorn.conf.py", "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return proc, f"http://127.0.0.1:{port}"
+
+async def wait_ready(client, proc, workers: int, timeout: float = 60):
+    # Ready once /health has answered from every worker's pid
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        try:
+            if (await client.get("/health")).status_code == 200 and len(worker_pids(proc.pid)) == workers:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError("server did not become ready")
+
+def worker_pids(master: int) -> list:
+    pids = []
+    for task in os.listdir(f"/proc/{master}/task"):
+        with open(f"/proc/{master}/task/{task}/children") as f:
+            pids += [int(p) for p in f.read().split()]
+    return pids
+
+def memory_mb(pids: list) -> tuple:
+    rss = pss = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1])
+        except OSError:
+            pass
+    return rss / 1024, pss / 1024
+
+async def drive(client, images: list, total: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(
+                "/analyze",
+                files={"file": ("label.jpg", images[i % len(images)], "image/jpeg")},
+                data={"profile": "General"}
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    }
+
+# =========================
+# MAIN
+# =========================
+
+async def main(latency: float, total: int, concurrency: int):
+    import httpx
+
+    stub, stub_url = start_stub_server(latency)
+    print(f"{os.cpu_count()} CPUs, stub latency {latency * 1000:.0f} ms, {total} requests at concurrency {concurrency}\n")
+    print(f"{'workers':>7} {'preload':>7} {'phase':>6} {'req/s':>7} {'p50 ms':>7} {'p99 ms':>7} "
+          f"{'upstream/req':>12} {'RSS MB':>7} {'PSS MB':>7}")
+
+    seed = 0
+    for workers, preload in RUNS:
+        data_dir = tempfile.mkdtemp(prefix="workers-bench-")
+        proc, url = start_server(workers, preload, stub_url, data_dir)
+        try:
+            async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+                await wait_ready(client, proc, workers)
+
+                unique = [make_label_image(seed + i) for i in range(total)]
+                shared = [make_label_image(-1 - i) for i in range(SHARED_IMAGES)]
+                seed += total
+                for phase, images in (("miss", unique), ("shared", shared)):
+                    before = stub.calls
+                    stats = await drive(client, images, total, concurrency)
+                    rss, pss = memory_mb([proc.pid] + worker_pids(proc.pid))
+                    print(f"{workers:>7} {'on' if preload else 'off':>7} {phase:>6} {stats['rps']:>7.1f} "
+                          f"{stats['p50_ms']:>7.0f} {stats['p99_ms']:>7.0f} {(stub.calls - before) / total:>12.2f} "
+                          f"{rss:>7.0f} {pss:>7.0f}")
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=60)
+
+    stub.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput and memory of the gunicorn profile at 1/2/4 workers")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per stubbed upstream call")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per phase")
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(main(args.latency, args.requests, args.concurrency))
@@ -3,28 +3,53 @@ CORRECT REFINED CONVERSION SCRIPT
 --------------------------------
 Uses ingredients_text (correct field for 'reduced' config)
 
+Streams products from Open Food Facts (Hugging Face, or a local dump file
+for offline runs), splits and labels ingredients in a process pool,
+drops duplicates with a disk-backed seen-set and writes sharded output.
+Runs are resumable: a checkpoint is committed together with the seen-set
+each time a shard is closed.
+
 Output:
-data/processed/ingredient_risk.json
+data/processed/ingredient_risk/part-00000.jsonl, part-00001.jsonl, ...
+(or .parquet with --format parquet, requires pyarrow)
 
 Labels:
 0 = Safe
 1 = Moderate
 2 = Harmful
+
+Usage:
+python generate_ingredient_risk_dataset.py
+python generate_ingredient_risk_dataset.py --input en.openfoodfacts.org.products.csv.gz --workers 8
 """
 
+import argparse
+import csv
+import gzip
+import hashlib
+import itertools
 import json
+import multiprocessing as mp
 import os
-from datasets import load_dataset
+import shutil
+import sqlite3
+import sys
+import time
+
 from tqdm import tqdm
 
+from backend.ml.matcher import KeywordMatcher
+
 # =========================
 # CONFIG
 # =========================
 
-OUTPUT_PATH = "data/processed/ingredient_risk.json"
-MAX_INGREDIENTS = 100000  # demo-safe
-
-os.makedirs("data/processed", exist_ok=True)
+OUTPUT_DIR = "data/processed/ingredient_risk"
+MAX_INGREDIENTS = 0  # 0 = no cap
+SHARD_SIZE = 200000  # rows per shard (shards close on chunk boundaries)
+CHUNK_SIZE = 2000  # products per worker task
+HOT_SET_SIZE = 500000  # in-memory front of the disk-backed seen-set (~40 MB)
+WORKERS = os.cpu_count() or 1
 
 # =========================
 # RISK RULES
@@ -48,6 +73,13 @@ SAFE_KEYWORDS = [
     "salt", "water", "milk", "jaggery", "honey"
 ]
 
+# One pass over each ingredient instead of three keyword loops
+LABEL_MATCHER = KeywordMatcher(
+    [(k, 2) for k in HARMFUL_KEYWORDS] +
+    [(k, 1) for k in MODERATE_KEYWORDS] +
+    [(k, 0) for k in SAFE_KEYWORDS]
+)
+
 # =========================
 # HELPERS
 # =========================
@@ -59,81 +91,315 @@ def split_ingredients(text):
     return [i.strip() for i in text.split(",") if len(i.strip()) > 1]
 
 def assign_label(ingredient):
-    for h in HARMFUL_KEYWORDS:
-        if h in ingredient:
-            return 2
-    for m in MODERATE_KEYWORDS:
-        if m in ingredient:
-            return 1
-    for s in SAFE_KEYWORDS:
-        if s in ingredient:
-            return 0
+    hits = LABEL_MATCHER.find_tagged(ingredient)
+    for label in (2, 1, 0):
+        if label in hits:
+            return label
     return 1  # unknown → moderate
 
+def ingredient_hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+def label_chunk(task):
+    """
+    Worker task: parse (for raw JSONL lines), split, label and hash a chunk of
+    products. Duplicates within the chunk are dropped here so less data
+    crosses the process boundary. Rows are (hash, text, label, product index
+    within the chunk), in product order.
+    """
+    items, raw_jsonl = task
+    rows = []
+    local_seen = set()
+    for index, item in enumerate(items):
+        text = json.loads(item).get("ingredients_text") if raw_jsonl else item
+        for ingredient in split_ingredients(text):
+            if ingredient not in local_seen:
+                local_seen.add(ingredient)
+                rows.append((ingredient_hash(ingredient), ingredient, assign_label(ingredient), index))
+    return len(items), rows
+
 # =========================
-# LOAD DATASET (CORRECT)
+# SOURCES
 # =========================
 
-print("Loading Open Food Facts (reduced, streaming)...")
-
-dataset = load_dataset(
-    "HC-85/open-food-facts",
-    "reduced",
-    split="train",
-    streaming=True
-)
+def _open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace", newline="")
+    return open(path, "r", encoding="utf-8", errors="replace", newline="")
+
+def is_jsonl(path):
+    return path.removesuffix(".gz").endswith((".jsonl", ".json"))
+
+def iter_local_dump(path):
+    """
+    ingredients_text from a local Open Food Facts dump: JSONL, CSV/TSV
+    (the official products.csv is tab-separated) or Parquet, optionally gzipped.
+    JSONL lines are yielded raw and parsed in the workers.
+    """
+    name = path.removesuffix(".gz")
+
+    if name.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(columns=["ingredients_text"]):
+            yield from batch.column(0).to_pylist()
+        return
+
+    with _open_text(path) as f:
+        if is_jsonl(path):
+            for line in f:
+                if line.strip():
+                    yield line
+        else:
+            csv.field_size_limit(sys.maxsize)
+            delimiter = "," if name.endswith(".csv") and "\t" not in f.readline() else "\t"
+            f.seek(0)
+            for row in csv.DictReader(f, delimiter=delimiter):
+                yield row.get("ingredients_text")
+
+def iter_hf_dataset(skip):
+    from datasets import load_dataset
+
+    print("Loading Open Food Facts (reduced, streaming)...")
+    dataset = load_dataset(
+        "HC-85/open-food-facts",
+        "reduced",
+        split="train",
+        streaming=True
+    )
+    if skip:
+        dataset = dataset.skip(skip)
+    for item in dataset:
+        yield item.get("ingredients_text")
+
+def iter_products(source, skip=0):
+    if source:
+        return itertools.islice(iter_local_dump(source), skip, None)
+    return iter_hf_dataset(skip)
+
+def iter_chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
 
 # =========================
-# CONVERSION
+# DEDUP + CHECKPOINT STORE
 # =========================
 
-output = []
-seen = set()
+class SeenStore:
+    """
+    Disk-backed set of 64-bit ingredient hashes plus the run checkpoint, in one
+    SQLite file. Memory stays flat however many unique ingredients there are;
+    new hashes and the checkpoint are committed in the same transaction so a
+    resumed run never loses or duplicates rows.
+    """
+
+    def __init__(self, path, hot_size=HOT_SET_SIZE):
+        # Recently confirmed hashes; common ingredients ("salt", "sugar") never reach SQLite
+        self._hot = set()
+        self._hot_size = hot_size
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS seen (h INTEGER PRIMARY KEY) WITHOUT ROWID")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+
+    def filter_new(self, rows):
+        """
+        The (hash, ...) rows whose hash was not seen before. Nothing is
+        recorded; call mark_seen() with the rows actually written.
+        """
+        hot = self._hot
+        if len(hot) >= self._hot_size:
+            hot.clear()
+        new = []
+        for row in rows:
+            if row[0] in hot:
+                continue
+            if self.conn.execute("SELECT 1 FROM seen WHERE h = ?", (row[0],)).fetchone() is None:
+                new.append(row)
+            else:
+                hot.add(row[0])
+        return new
+
+    def mark_seen(self, rows):
+        """
+        Records the (hash, ...) rows as seen. Uncommitted until checkpoint().
+        """
+        self.conn.executemany("INSERT OR IGNORE INTO seen (h) VALUES (?)", [(r[0],) for r in rows])
+        self._hot.update(r[0] for r in rows)
+
+    def load_checkpoint(self):
+        row = self.conn.execute("SELECT value FROM state WHERE key = 'checkpoint'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def checkpoint(self, state):
+        self.conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('checkpoint', ?)", (json.dumps(state),))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
 
-print("Processing ingredients_text...")
-
-for item in tqdm(dataset):
-    if len(output) >= MAX_INGREDIENTS:
-        break
-
-    ingredients_text = item.get("ingredients_text")
-
-    for ingredient in split_ingredients(ingredients_text):
-        if ingredient in seen:
-            continue
-
-        label = assign_label(ingredient)
-
-        output.append({
-            "text": ingredient,
-            "label": label
-        })
-
-        seen.add(ingredient)
+# =========================
+# SHARD WRITERS
+# =========================
 
-        if len(output) >= MAX_INGREDIENTS:
-            break
+class ShardWriter:
+    """
+    Writes rows to part-NNNNN.<fmt>. JSONL streams to disk; Parquet buffers
+    one shard (bounded by SHARD_SIZE) and writes it on close.
+    """
+
+    def __init__(self, output_dir, index, fmt):
+        self.path = os.path.join(output_dir, f"part-{index:05d}.{fmt}")
+        self.fmt = fmt
+        self.rows = 0
+        self._buffer = []
+        self._file = open(self.path, "w", encoding="utf-8") if fmt == "jsonl" else None
+
+    def write(self, text, label):
+        if self._file is not None:
+            self._file.write(json.dumps({"text": text, "label": label}, ensure_ascii=False) + "\n")
+        else:
+            self._buffer.append((text, label))
+        self.rows += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.table({
+                "text": [t for t, _ in self._buffer],
+                "label": pa.array([l for _, l in self._buffer], type=pa.int8())
+            })
+            pq.write_table(table, self.path)
+            self._buffer = []
+
+    def discard(self):
+        if self._file is not None:
+            self._file.close()
+        os.remove(self.path)
 
 # =========================
-# SAVE
+# CONVERSION
 # =========================
 
-with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-    json.dump(output, f, indent=2)
-
-print("\n✅ DATASET GENERATION COMPLETE")
-print(f"Total unique ingredients labeled: {len(output)}")
-print(f"Saved to: {OUTPUT_PATH}")
+def generate(source=None, output_dir=OUTPUT_DIR, fmt="jsonl", workers=WORKERS,
+             max_ingredients=MAX_INGREDIENTS, shard_size=SHARD_SIZE, chunk_size=CHUNK_SIZE, fresh=False):
+    if fresh and os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    store = SeenStore(os.path.join(output_dir, "_seen.sqlite3"))
+    state = store.load_checkpoint() or {
+        "source": source, "products": 0, "rows": 0, "shards": 0, "counts": {"0": 0, "1": 0, "2": 0}
+    }
+    if state["products"]:
+        if state["source"] != source:
+            sys.exit(f"Checkpoint in {output_dir} is for source {state['source']!r}; use --fresh to start over.")
+        print(f"Resuming after {state['products']} products, {state['rows']} rows, {state['shards']} shards")
+
+    writer = ShardWriter(output_dir, state["shards"], fmt)
+    pending = {"products": 0, "counts": {"0": 0, "1": 0, "2": 0}}
+    done = max_ingredients and state["rows"] >= max_ingredients
+
+    def commit_shard():
+        writer.close()
+        state["products"] += pending["products"]
+        state["rows"] += writer.rows
+        state["shards"] += 1
+        for k, v in pending["counts"].items():
+            state["counts"][k] += v
+        store.checkpoint(state)
+        pending["products"] = 0
+        pending["counts"] = {"0": 0, "1": 0, "2": 0}
+
+    start = time.perf_counter()
+    products = 0
+    raw_jsonl = bool(source) and is_jsonl(source)
+    chunks = ((chunk, raw_jsonl) for chunk in iter_chunks(iter_products(source, state["products"]), chunk_size))
+
+    with mp.get_context("spawn").Pool(workers) as pool, tqdm(unit=" products") as progress:
+        for n_products, rows in (pool.imap(label_chunk, chunks) if not done else ()):
+            new = store.filter_new(rows)
+            if max_ingredients and state["rows"] + writer.rows + len(new) >= max_ingredients:
+                keep = max_ingredients - state["rows"] - writer.rows
+                if keep < len(new):
+                    # Only products whose new rows were all written count as consumed;
+                    # a resume with a higher cap re-reads the rest
+                    n_products = new[keep][3]
+                    new = new[:keep]
+                done = True
+            for _, text, label, _ in new:
+                writer.write(text, label)
+                pending["counts"][str(label)] += 1
+            store.mark_seen(new)
+
+            pending["products"] += n_products
+            products += n_products
+            progress.update(n_products)
+            progress.set_postfix(rows=state["rows"] + writer.rows)
+
+            if done:
+                break
+            if writer.rows >= shard_size:
+                commit_shard()
+                writer = ShardWriter(output_dir, state["shards"], fmt)
+
+    if writer.rows:
+        commit_shard()
+    else:
+        writer.discard()
+        store.checkpoint(state)
+    store.close()
+
+    elapsed = time.perf_counter() - start
+    return state, products, elapsed
 
 # =========================
-# LABEL DISTRIBUTION
+# MAIN
 # =========================
 
-counts = {0: 0, 1: 0, 2: 0}
-for x in output:
-    counts[x["label"]] += 1
-
-print("\nLabel Distribution:")
-print(f"Safe (0): {counts[0]}")
-print(f"Moderate (1): {counts[1]}")
-print(f"Harmful (2): {counts[2]}")
+def main():
+    parser = argparse.ArgumentParser(description="Generate the ingredient risk dataset from Open Food Facts")
+    parser.add_argument("--input", help="Local dump (.jsonl/.csv/.tsv/.parquet, optionally .gz); default streams from Hugging Face")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--max-ingredients", type=int, default=MAX_INGREDIENTS, help="Stop after N unique ingredients (0 = all)")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--fresh", action="store_true", help="Ignore any checkpoint and start over")
+    args = parser.parse_args()
+
+    state, products, elapsed = generate(
+        args.input, args.output_dir, args.format, args.workers,
+        args.max_ingredients, args.shard_size, args.chunk_size, args.fresh
+    )
+
+    print("\n✅ DATASET GENERATION COMPLETE")
+    print(f"Total unique ingredients labeled: {state['rows']}")
+    print(f"Saved to: {args.output_dir} ({state['shards']} shards)")
+    print(f"Throughput: {products / elapsed if elapsed else 0:.0f} products/s ({products} products in {elapsed:.1f}s)")
+
+    # =========================
+    # LABEL DISTRIBUTION
+    # =========================
+
+    counts = state["counts"]
+    print("\nLabel Distribution:")
+    print(f"Safe (0): {counts['0']}")
+    print(f"Moderate (1): {counts['1']}")
+    print(f"Harmful (2): {counts['2']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Production serving profile: gunicorn managing uvicorn workers.
+
+    gunicorn backend.main:app -c gunicorn.conf.py
+
+The app is imported once in the master (preload_app) and the workers fork
+from it, so the keyword automaton, risk tables, similarity index and any
+preloaded model weights are shared copy-on-write. Caches and the job queue
+default to SQLite so every worker sees the same entries. Workers are
+recycled gracefully after a bounded number of requests.
+"""
+
+import gc
+import os
+import sys
+
+# =========================
+# CONFIG
+# =========================
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+# WEB_CONCURRENCY is what Render/Heroku set from the instance size
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Recycle each worker after ~max_requests requests (jittered so they don't
+# all restart together); in-flight requests get graceful_timeout to finish
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", str(max_requests // 10)))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+# Per-process caches would be duplicated (and disagree) across workers;
+# /jobs/{id} must be answerable by any worker
+if workers > 1:
+    os.environ.setdefault("RESULT_CACHE_BACKEND", "sqlite")
+    os.environ.setdefault("JOB_QUEUE_BACKEND", "sqlite")
+
+# PyTorch's OpenMP pool does not survive fork(): a model loaded with several
+# threads in the master deadlocks in the workers. Load single-threaded and
+# give each worker its share of the cores after the fork. ONNX Runtime can't
+# be resized: an onnx session preloaded in the master keeps 1 thread per
+# worker (set GUNICORN_PRELOAD=0 or ML_WARMUP=0 to load it per worker instead).
+WORKER_THREADS = int(os.getenv("ML_NUM_THREADS", "0")) or max(1, (os.cpu_count() or 1) // workers)
+if preload_app:
+    os.environ["ML_NUM_THREADS"] = "1"
+
+# =========================
+# HOOKS
+# =========================
+
+def when_ready(server):
+    if preload_app:
+        from backend.main import preload_models
+
+        preload_models()
+        # Keep the collector from touching (and un-sharing) the preloaded objects' pages
+        gc.collect()
+        gc.freeze()
+    server.log.info("Serving with %d workers (preload=%s)", workers, preload_app)
+
+def post_fork(server, worker):
+    # Models loaded lazily in the worker (after a failed or skipped preload) get its share too
+    os.environ["ML_NUM_THREADS"] = str(WORKER_THREADS)
+    if "backend.ml.inference" in sys.modules:
+        sys.modules["backend.ml.inference"].ML_NUM_THREADS = WORKER_THREADS
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(WORKER_THREADS)
@@ -2,6 +2,14 @@ import React, { useState, useRef, useEffect } from "react";
 import axios from "axios";
 import "./App.css";
 
+// Shown in the explanation panel while Gemini is still writing it
+const PENDING_EXPLANATION = {
+  harm_explanation: "Generating a personalized explanation...",
+  risk_factors: [],
+  alternatives: [],
+  commercial_alternatives: [],
+};
+
 function App() {
   const [image, setImage] = useState(null);
   const [imagePreview, setImagePreview] = useState(null);
@@ -41,17 +49,21 @@ function App() {
 
         try {
           setIsPersonalizing(true);
+          // The label text lets the server re-score for the new profile too
           const payload = {
             ingredients_analysis: result.ingredients_analysis,
+            ingredients_text: result.extracted_text,
             profile: profile
           };
 
           const response = await axios.post(`${API_URL}/re-explain`, payload);
 
           if (response.data && response.data.explanation) {
+            const { explanation, risk_score, risk_level, risk_breakdown } = response.data;
             setResult(prev => ({
               ...prev,
-              explanation: response.data.explanation
+              explanation,
+              ...(risk_score !== undefined && { risk_score, risk_level, risk_breakdown })
             }));
           }
         } catch (err) {
@@ -89,23 +101,63 @@ function App() {
 
     try {
       const API_URL = getApiUrl();
-      const response = await axios.post(`${API_URL}/analyze`, formData, {
-        headers: {
-          "Content-Type": "multipart/form-data",
-        },
+      // NDJSON stream: risk results render first, the Gemini explanation fills in when ready
+      const response = await fetch(`${API_URL}/analyze/stream`, {
+        method: "POST",
+        body: formData,
       });
-
-      if (response.data.error) {
-        setError(`Analysis failed: ${response.data.error}`);
+      const contentType = response.headers.get("content-type") || "";
+
+      if (!contentType.includes("ndjson")) {
+        const data = await response.json().catch(() => ({}));
+        if (response.status === 503 && data.error) {
+          setError(data.error);
+        } else if (data.error) {
+          setError(`Analysis failed: ${data.error}`);
+        } else {
+          setError("Analysis failed. Please check if the backend is running.");
+        }
         return;
       }
 
-      setResult(response.data);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let partial = {};
+
+      const handleEvent = (message) => {
+        const { event, ...data } = message;
+        if (event === "error") {
+          setError(`Analysis failed: ${data.error}`);
+          return;
+        }
+        if (event === "explanation_delta") {
+          return;
+        }
+        partial = { ...partial, ...data };
+        if (event === "analysis") {
+          setResult({ ...partial, explanation: PENDING_EXPLANATION });
+          setLoading(false);
+          // Smooth scroll to results
+          setTimeout(() => {
+            resultsRef.current?.scrollIntoView({ behavior: "smooth" });
+          }, 100);
+        } else if (event === "explanation") {
+          setResult({ ...partial });
+        }
+      };
 
-      // Smooth scroll to results
-      setTimeout(() => {
-        resultsRef.current?.scrollIntoView({ behavior: "smooth" });
-      }, 100);
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop();
+        lines.filter((line) => line.trim()).forEach((line) => handleEvent(JSON.parse(line)));
+      }
+      if (buffer.trim()) {
+        handleEvent(JSON.parse(buffer));
+      }
 
     } catch (err) {
       console.error("Error analyzing snack:", err);